@@ -0,0 +1,298 @@
+import argparse
+import asyncio
+import gc
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional
+
+from loadtest import build_accounts
+from main import ActionScheduler, ApiResponse, ERROR_BODY_LIMIT, NaorisProtocolAutomation, RouteManager, decode_body
+from simulate import StubResponse
+
+# Microbenchmark jalur panas bot tanpa jaringan: bagian _request sebelum/sesudah transport,
+# format log, pemilihan rute proxy, pembacaan file akun dan dispatch scheduler. Hasilnya ops/detik
+# dan alokasi per operasi; simpan dengan --json lalu bandingkan dengan --compare supaya perubahan
+# di jalur ini bisa ditolak jika angkanya turun.
+
+PING_BODY = b"Ping Success!!"
+WALLET_BODY = json.dumps({"message": {"walletAddress": "0x" + "ab" * 20, "totalEarnings": 1234.5}}).encode()
+CONFLICT_BODY = json.dumps({"message": "url already exists"}).encode()
+ERROR_BODY = b"<html><body><h1>502 Bad Gateway</h1>" + b"x" * 100_000 + b"</body></html>"
+
+
+class CannedTransport:
+    # Pengganti HttpEngine: tiap endpoint langsung menjawab respons tetap, jadi yang terukur di
+    # _request hanya overhead bot (header, breaker, decode, klasifikasi, metrik)
+    def __init__(self, responses: Dict[str, StubResponse]) -> None:
+        self.responses = responses
+        self.sessions: Dict[str, Any] = {}
+        self.in_flight = 0
+
+    async def request(self, method: str, url: str, headers: Dict[str, str], data: Optional[Any] = None,
+                      json_payload: Optional[Dict] = None, proxy: Optional[str] = None,
+                      impersonate: Optional[str] = None, timeout: int = 60) -> StubResponse:
+        return self.responses[url.rsplit("/", 1)[-1]]
+
+    async def close_route(self, proxy: Optional[str]) -> None:
+        pass
+
+    async def close(self):
+        pass
+
+
+class Benchmark:
+    # op dipanggil berulang; jika is_async, op adalah fungsi coroutine yang dijalankan di loop.
+    # units = jumlah item yang diproses satu op (mis. akun per file), hasil dilaporkan per item.
+    def __init__(self, name: str, op: Callable[[], Any], units: int = 1, is_async: bool = False) -> None:
+        self.name = name
+        self.op = op
+        self.units = units
+        self.is_async = is_async
+
+
+def _run_batch(bench: Benchmark, loop: asyncio.AbstractEventLoop, number: int) -> float:
+    op = bench.op
+    if bench.is_async:
+        async def batch() -> float:
+            started = time.perf_counter()
+            for _ in range(number):
+                await op()
+            return time.perf_counter() - started
+        return loop.run_until_complete(batch())
+    started = time.perf_counter()
+    for _ in range(number):
+        op()
+    return time.perf_counter() - started
+
+
+def _measure_allocations(bench: Benchmark, loop: asyncio.AbstractEventLoop, samples: int) -> Dict[str, float]:
+    # Puncak memori baru selama satu op (median beberapa sampel) dan sisa memori yang tertahan
+    # setelah semua sampel, keduanya dibagi units
+    op = bench.op
+    peaks: List[int] = []
+
+    async def sample_async():
+        for _ in range(samples):
+            before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            await op()
+            peaks.append(tracemalloc.get_traced_memory()[1] - before)
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        start = tracemalloc.get_traced_memory()[0]
+        if bench.is_async:
+            loop.run_until_complete(sample_async())
+        else:
+            for _ in range(samples):
+                before = tracemalloc.get_traced_memory()[0]
+                tracemalloc.reset_peak()
+                op()
+                peaks.append(tracemalloc.get_traced_memory()[1] - before)
+        gc.collect()
+        retained = tracemalloc.get_traced_memory()[0] - start
+    finally:
+        tracemalloc.stop()
+    return {
+        "alloc_bytes_per_op": round(statistics.median(peaks) / bench.units, 1),
+        "retained_bytes_per_op": round(max(0, retained) / samples / bench.units, 1),
+    }
+
+
+def run_benchmark(bench: Benchmark, loop: asyncio.AbstractEventLoop, min_time: float, repeat: int) -> Dict[str, Any]:
+    # Kalibrasi seperti timeit: gandakan jumlah op sampai satu batch memakan min_time
+    number = 1
+    while True:
+        elapsed = _run_batch(bench, loop, number)
+        if elapsed >= min_time or number >= 1 << 24:
+            break
+        number = number * 2 if elapsed <= 0 else max(number * 2, min(number * 10, int(number * min_time / elapsed) + 1))
+    best = elapsed
+    gc_was_enabled = gc.isenabled()
+    for _ in range(repeat):
+        gc.collect()
+        gc.disable() # Sama dengan timeit: jeda GC tidak ikut terukur sebagai waktu op
+        try:
+            best = min(best, _run_batch(bench, loop, number))
+        finally:
+            if gc_was_enabled:
+                gc.enable()
+    result = {
+        "name": bench.name,
+        "ops": number * bench.units,
+        "ops_per_sec": round(number * bench.units / best, 1) if best > 0 else float("inf"),
+        "us_per_op": round(best / (number * bench.units) * 1e6, 3),
+    }
+    result.update(_measure_allocations(bench, loop, max(1, min(number, 200))))
+    return result
+
+
+def build_benchmarks(workdir: str, account_sizes: List[int]) -> List[Benchmark]:
+    bot = NaorisProtocolAutomation(state_db_file=None, user_agent_file=None, log_level="INFO")
+    bot.logger.console = False # Writer thread tetap berjalan, hanya tidak menulis ke terminal
+    bot.base_api_url = bot.ping_api_url = "http://bench.invalid"
+    bot.http = CannedTransport({
+        "ping": StubResponse(200, PING_BODY),
+        "wallet-details": StubResponse(200, WALLET_BODY),
+        # Error 4xx, bukan 5xx: 5xx beruntun membuka circuit breaker sehingga yang terukur hanya jalur tolak cepat
+        "addWhitelist": StubResponse(409, CONFLICT_BODY),
+    })
+    address = "0x" + "ab" * 20
+    masked = bot._mask_address(address)
+    auth_headers = {"Authorization": "Bearer " + "x" * 400}
+    switch_payload = {"walletAddress": address, "state": "ON", "deviceHash": 1234567890}
+    ping_url = f"{bot.ping_api_url}/api/ping"
+    wallet_url = f"{bot.base_api_url}/sec-api/api/wallet-details"
+    whitelist_url = f"{bot.base_api_url}/sec-api/api/addWhitelist"
+    switch_data = json.dumps(switch_payload)
+
+    def classify_error():
+        response = ApiResponse(500, decode_body(ERROR_BODY[:ERROR_BODY_LIMIT]), error="HTTP Error 500: Error")
+        bot._is_retryable(response)
+        return bot._error_message(response)
+
+    benchmarks = [
+        Benchmark("request.header_merge", lambda: bot._merge_headers(auth_headers, switch_data, None)),
+        Benchmark("request.payload_dumps", lambda: json.dumps(switch_payload)),
+        Benchmark("request.classify_ping_text", lambda: ApiResponse(200, decode_body(PING_BODY))),
+        Benchmark("request.classify_wallet_json", lambda: ApiResponse(200, decode_body(WALLET_BODY))),
+        Benchmark("request.classify_error_500", classify_error),
+        Benchmark("request.full_ping", lambda: bot._request("POST", ping_url, headers=auth_headers, json_payload={}), is_async=True),
+        Benchmark("request.full_wallet", lambda: bot._request("GET", wallet_url, headers=auth_headers), is_async=True),
+        Benchmark("request.full_whitelist_409", lambda: bot._request("POST", whitelist_url, headers=auth_headers, data=switch_data), is_async=True),
+        Benchmark("log.info", lambda: bot.log("Renewal token: 20 dijalankan, 0 panggilan redundan dihemat.", level="INFO")),
+        Benchmark("log.account_success", lambda: bot.log_account_specific(masked, "", level="SUCCESS", proxy_info="Tidak Digunakan", status_msg="Ping Berhasil.")),
+        Benchmark("log.account_debug_filtered", lambda: bot.log_account_specific(masked, "Melakukan ping...", level="DEBUG")),
+    ]
+
+    # Rute lengket: 10k akun dibagi ke 100 proxy, akun dipanggil bergiliran
+    route_bot = NaorisProtocolAutomation(state_db_file=None, user_agent_file=None, log_level="INFO")
+    route_bot.logger.console = False
+    route_bot.routes = RouteManager(f"http://10.0.{i // 250}.{i % 250}:8080" for i in range(100))
+    route_accounts = [route_bot.accounts.add(acc["Address"], route_bot._mask_address(acc["Address"]), acc["deviceHash"])
+                      for acc in build_accounts(10_000)]
+    route_cursor = [0]
+
+    def next_route():
+        account = route_accounts[route_cursor[0]]
+        route_cursor[0] = (route_cursor[0] + 1) % len(route_accounts)
+        return route_bot.get_next_proxy_for_account(account)
+
+    benchmarks.append(Benchmark("proxy.next_route", next_route))
+
+    for size in account_sizes:
+        path = os.path.join(workdir, f"accounts_{size}.json")
+        with open(path, "w") as f:
+            json.dump(build_accounts(size, seed=size), f, indent=2)
+        loader = NaorisProtocolAutomation(state_db_file=None, user_agent_file=None, log_level="WARNING")
+        loader.accounts_file = path
+        label = f"{size // 1000}k" if size % 1000 == 0 else str(size)
+        benchmarks.append(Benchmark(f"accounts.load_{label}", loader.load_accounts_from_file, units=size))
+
+    benchmarks.append(build_scheduler_benchmark())
+    return benchmarks
+
+
+def build_scheduler_benchmark(batch: int = 1000, keys: int = 10_000) -> Benchmark:
+    # Satu op = batch aksi dengan delay 0 dijadwalkan lalu ditunggu sampai semuanya sampai di handler
+    state: Dict[str, Any] = {"scheduler": None, "remaining": 0, "done": None, "next_key": 0}
+
+    async def handler(key: int, action: str) -> Optional[float]:
+        state["remaining"] -= 1
+        if state["remaining"] == 0:
+            state["done"].set()
+        return None
+
+    async def dispatch_batch():
+        scheduler = state["scheduler"]
+        if scheduler is None:
+            scheduler = state["scheduler"] = ActionScheduler(handler, workers=200)
+            asyncio.get_running_loop().create_task(scheduler.run())
+        state["remaining"] = batch
+        state["done"] = asyncio.Event()
+        key = state["next_key"]
+        for _ in range(batch):
+            scheduler.schedule(key, "ping", 0)
+            key = (key + 1) % keys
+        state["next_key"] = key
+        await state["done"].wait()
+
+    return Benchmark("scheduler.dispatch", dispatch_batch, units=batch, is_async=True)
+
+
+def compare_results(results: List[Dict[str, Any]], baseline: Dict[str, Dict[str, Any]], max_regression: float) -> List[str]:
+    regressions = []
+    for result in results:
+        base = baseline.get(result["name"])
+        if not base or not base.get("ops_per_sec"):
+            result["change"] = None
+            continue
+        change = result["ops_per_sec"] / base["ops_per_sec"] - 1
+        result["change"] = round(change, 4)
+        if change < -max_regression:
+            regressions.append(f"{result['name']}: {base['ops_per_sec']:,.0f} -> {result['ops_per_sec']:,.0f} ops/s ({change:+.1%})")
+    return regressions
+
+
+def print_results(results: List[Dict[str, Any]]) -> None:
+    print(f"{'Benchmark':<30}{'ops/s':>14}{'us/op':>11}{'alloc B/op':>12}{'tertahan B/op':>15}{'vs baseline':>13}")
+    for result in results:
+        change = result.get("change")
+        change_text = f"{change:+.1%}" if change is not None else "-"
+        print(f"{result['name']:<30}{result['ops_per_sec']:>14,.0f}{result['us_per_op']:>11.3f}"
+              f"{result['alloc_bytes_per_op']:>12,.0f}{result['retained_bytes_per_op']:>15,.1f}{change_text:>13}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Microbenchmark jalur panas NaorisProtocolAutomation (tanpa jaringan).")
+    parser.add_argument("--filter", action="append", default=[], help="Hanya jalankan benchmark yang namanya mengandung teks ini (bisa diulang)")
+    parser.add_argument("--min-time", type=float, default=0.2, help="Lama minimal satu batch pengukuran (detik, default: 0.2)")
+    parser.add_argument("--repeat", type=int, default=3, help="Jumlah pengulangan; yang tercepat dilaporkan (default: 3)")
+    parser.add_argument("--account-sizes", default="1000,10000,100000", help="Ukuran file akun untuk accounts.load_* (default: 1000,10000,100000)")
+    parser.add_argument("--json", dest="json_path", help="Simpan hasil ke file JSON (bisa dipakai sebagai --compare berikutnya)")
+    parser.add_argument("--compare", help="File JSON hasil sebelumnya sebagai baseline")
+    parser.add_argument("--max-regression", type=float, default=0.15,
+                        help="Keluar dengan kode 1 jika ops/s turun lebih dari fraksi ini dibanding baseline (default: 0.15)")
+    args = parser.parse_args()
+
+    account_sizes = [int(size) for size in args.account_sizes.split(",") if size.strip()]
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    results: List[Dict[str, Any]] = []
+    with tempfile.TemporaryDirectory(prefix="naoris_bench_") as workdir:
+        for bench in build_benchmarks(workdir, account_sizes):
+            if args.filter and not any(text in bench.name for text in args.filter):
+                continue
+            results.append(run_benchmark(bench, loop, args.min_time, args.repeat))
+            print(f"  {bench.name} selesai", file=sys.stderr, flush=True)
+    pending = asyncio.all_tasks(loop)
+    for task in pending:
+        task.cancel()
+    loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+    loop.close()
+
+    regressions: List[str] = []
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = {entry["name"]: entry for entry in json.load(f)["results"]}
+        regressions = compare_results(results, baseline, args.max_regression)
+    print_results(results)
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump({"python": sys.version.split()[0], "created_at": time.time(), "results": results}, f, indent=2)
+        print(f"Hasil disimpan ke {os.path.abspath(args.json_path)}")
+    if regressions:
+        print(f"Regresi di atas {args.max_regression:.0%}:")
+        for line in regressions:
+            print(f"  {line}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
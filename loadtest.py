@@ -0,0 +1,208 @@
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import random
+import threading
+import time
+from collections import Counter, defaultdict
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlparse
+
+from main import ApiResponse, NaorisProtocolAutomation
+from mock_server import MockConfig, MockNaorisServer, add_mock_arguments
+
+# Harness beban: menjalankan NaorisProtocolAutomation melawan mock_server.py dengan N akun
+# sintetis lalu melaporkan throughput, latensi request, lag event loop, RSS dan jumlah thread.
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def read_process_status() -> Dict[str, int]:
+    # RSS (KB) dan jumlah thread OS, termasuk thread native milik libcurl
+    status = {"rss_kb": 0, "threads": threading.active_count()}
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    status["rss_kb"] = int(line.split()[1])
+                elif line.startswith("Threads:"):
+                    status["threads"] = int(line.split()[1])
+    except OSError:
+        import resource
+        status["rss_kb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return status
+
+
+class LoadTestBot(NaorisProtocolAutomation):
+    def __init__(self, show_logs: bool = False, **kwargs) -> None:
+        super().__init__(state_db_file=None, user_agent_file=None, **kwargs)
+        self.show_logs = show_logs
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.outcomes: Counter = Counter()
+        self.log_lines: Counter = Counter()
+
+    def log(self, message: str, level: str = "INFO", account_context: Optional[str] = None):
+        self.log_lines[level.upper()] += 1
+        if self.show_logs:
+            super().log(message, level=level, account_context=account_context)
+
+    def log_account_specific(self, masked_address: str, message: str, level: str = "INFO", proxy_info: Optional[str] = None, status_msg: Optional[str] = None):
+        self.log_lines[level.upper()] += 1
+        if self.show_logs:
+            super().log_account_specific(masked_address, message, level=level, proxy_info=proxy_info, status_msg=status_msg)
+
+    async def _request(self, method: str, url: str, *args, **kwargs) -> ApiResponse:
+        endpoint = urlparse(url).path.rsplit("/", 1)[-1]
+        started = time.perf_counter()
+        response = await super()._request(method, url, *args, **kwargs)
+        self.latencies[endpoint].append(time.perf_counter() - started)
+        if response.ok:
+            self.outcomes[f"{endpoint} ok"] += 1
+        else:
+            self.outcomes[f"{endpoint} {response.status_code or 'N/A'}"] += 1
+        return response
+
+
+class LoopLagMonitor:
+    def __init__(self, interval: float = 0.05) -> None:
+        self.interval = interval
+        self.samples: List[float] = []
+        self.peak_rss_kb = 0
+        self.peak_threads = 0
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, loop.time() - expected))
+            status = read_process_status()
+            self.peak_rss_kb = max(self.peak_rss_kb, status["rss_kb"])
+            self.peak_threads = max(self.peak_threads, status["threads"])
+
+
+def _serve_mock(config_kwargs: Dict[str, Any], port_queue) -> None:
+    async def serve():
+        server = MockNaorisServer(MockConfig(**config_kwargs))
+        port_queue.put(await server.start())
+        await asyncio.Event().wait()
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+def build_accounts(count: int, seed: int = 1) -> List[Dict[str, Any]]:
+    rng = random.Random(seed)
+    return [{"Address": "0x" + "%040x" % rng.getrandbits(160), "deviceHash": rng.getrandbits(32)} for _ in range(count)]
+
+
+async def run_load_test(args: argparse.Namespace, base_url: str) -> Dict[str, Any]:
+    bot = LoadTestBot(show_logs=args.show_logs, max_concurrency=args.max_concurrency, scheduler_workers=args.workers,
+                      start_rate=args.start_rate, start_burst=args.start_burst)
+    bot.base_api_url = base_url
+    bot.ping_api_url = base_url
+    if args.time_scale != 1:
+        for name in ("ping_interval_seconds", "initiate_msg_interval_seconds", "activation_check_interval_seconds",
+                     "refresh_initial_delay_seconds", "refresh_interval_seconds", "refresh_margin_seconds",
+                     "refresh_min_delay_seconds", "wallet_initial_delay_seconds", "wallet_interval_seconds",
+                     "token_retry_delay_seconds", "cycle_retry_seconds", "session_evidence_max_age_seconds",
+                     "wallet_max_interval_seconds", "wallet_wakeup_seconds", "wallet_after_ping_failure_seconds"):
+            setattr(bot, name, getattr(bot, name) / args.time_scale)
+
+    monitor = LoopLagMonitor()
+    monitor_task = asyncio.create_task(monitor.run())
+    baseline = read_process_status()
+    started = time.perf_counter()
+    output = contextlib.nullcontext() if args.show_logs else contextlib.redirect_stdout(io.StringIO())
+    with output:
+        try:
+            await asyncio.wait_for(bot.run_accounts(build_accounts(args.accounts)), timeout=args.duration)
+        except asyncio.TimeoutError:
+            pass
+    elapsed = time.perf_counter() - started
+    monitor_task.cancel()
+    await asyncio.gather(monitor_task, return_exceptions=True)
+
+    all_latencies = [value for values in bot.latencies.values() for value in values]
+    return {
+        "accounts": args.accounts,
+        "duration_s": round(elapsed, 2),
+        "requests": len(all_latencies),
+        "throughput_rps": round(len(all_latencies) / elapsed, 1) if elapsed else 0.0,
+        "latency_ms": {
+            endpoint: {"count": len(values), "p50": round(percentile(values, 50) * 1000, 2), "p99": round(percentile(values, 99) * 1000, 2)}
+            for endpoint, values in sorted(bot.latencies.items())
+        },
+        "latency_all_ms": {"p50": round(percentile(all_latencies, 50) * 1000, 2), "p99": round(percentile(all_latencies, 99) * 1000, 2)},
+        "loop_lag_ms": {"p50": round(percentile(monitor.samples, 50) * 1000, 2), "p99": round(percentile(monitor.samples, 99) * 1000, 2),
+                        "max": round(max(monitor.samples, default=0.0) * 1000, 2)},
+        "rss_mb": {"start": round(baseline["rss_kb"] / 1024, 1), "peak": round(monitor.peak_rss_kb / 1024, 1)},
+        "threads": {"start": baseline["threads"], "peak": monitor.peak_threads},
+        "outcomes": dict(sorted(bot.outcomes.items())),
+        "log_lines": dict(bot.log_lines),
+    }
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    print(f"Akun: {report['accounts']} | Durasi: {report['duration_s']}s | Request: {report['requests']} | Throughput: {report['throughput_rps']} req/s")
+    print(f"Latensi semua request: p50 {report['latency_all_ms']['p50']} ms, p99 {report['latency_all_ms']['p99']} ms")
+    for endpoint, stats in report["latency_ms"].items():
+        print(f"  {endpoint:<16} n={stats['count']:<8} p50={stats['p50']:>8} ms  p99={stats['p99']:>8} ms")
+    lag = report["loop_lag_ms"]
+    print(f"Lag event loop: p50 {lag['p50']} ms, p99 {lag['p99']} ms, max {lag['max']} ms")
+    print(f"RSS: {report['rss_mb']['start']} MB -> puncak {report['rss_mb']['peak']} MB | Thread: {report['threads']['start']} -> puncak {report['threads']['peak']}")
+    print("Hasil per endpoint:", ", ".join(f"{k}={v}" for k, v in report["outcomes"].items()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Uji beban NaorisProtocolAutomation terhadap mock server lokal.")
+    parser.add_argument("--accounts", type=int, default=100, help="Jumlah akun sintetis")
+    parser.add_argument("--duration", type=float, default=60.0, help="Lama pengujian (detik)")
+    parser.add_argument("--time-scale", type=float, default=1.0, help="Percepat semua interval bot dengan faktor ini")
+    parser.add_argument("--start-rate", type=float, default=0.0, help="Laju start akun per detik; 0 = semua sekaligus")
+    parser.add_argument("--start-burst", type=float, default=1.0, help="Burst token bucket start akun")
+    parser.add_argument("--max-concurrency", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=200, help="Jumlah worker scheduler")
+    parser.add_argument("--server", help="URL mock server yang sudah berjalan (default: jalankan di proses terpisah)")
+    parser.add_argument("--show-logs", action="store_true", help="Tampilkan log bot selama pengujian")
+    parser.add_argument("--json", dest="json_path", help="Simpan laporan ke file JSON")
+    add_mock_arguments(parser)
+    args = parser.parse_args()
+
+    mock_process = None
+    base_url = args.server
+    if not base_url:
+        # Mock berjalan di proses sendiri supaya CPU server tidak ikut terukur sebagai overhead bot
+        port_queue = multiprocessing.Queue()
+        config_kwargs = vars(MockConfig.from_args(args))
+        mock_process = multiprocessing.Process(target=_serve_mock, args=(config_kwargs, port_queue), daemon=True)
+        mock_process.start()
+        base_url = f"http://127.0.0.1:{port_queue.get(timeout=10)}"
+
+    try:
+        report = asyncio.run(run_load_test(args, base_url))
+    finally:
+        if mock_process is not None:
+            mock_process.terminate()
+            mock_process.join(timeout=5)
+
+    print_report(report)
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Laporan disimpan ke {os.path.abspath(args.json_path)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,97 @@
+import time
+_IMPORT_STARTED_AT = time.perf_counter() # Titik awal pengukuran --startup-timing
+
+import argparse
 import asyncio
+import atexit
+import base64
+import bisect
+import concurrent.futures
+import contextlib
+import enum
+import gc
+import hashlib
+import heapq
+import io
+import itertools
 import json
+import math
+import multiprocessing
 import os
-import pytz
+import queue
+import random
+import re
+import signal
+import sqlite3
+import sys
+import threading
+import tracemalloc
 import uuid
-from datetime import datetime
-from typing import List, Optional, Dict, Any
+import zlib
+from collections import Counter, deque
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Dict, Any, Callable, Awaitable, Tuple, Hashable, Iterable, Iterator, TYPE_CHECKING
+from urllib.parse import urlparse
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 
 from colorama import init, Fore, Style
-from curl_cffi import requests
-from fake_useragent import FakeUserAgent
+
+if TYPE_CHECKING:
+    from curl_cffi import requests
+
+try:
+    import orjson
+except ImportError: # Opsional: tanpa orjson respons di-decode dengan json bawaan
+    orjson = None
+json_loads = orjson.loads if orjson is not None else json.loads
 
 # Initialize colorama
 init(autoreset=True)
-wib = pytz.timezone('Asia/Jakarta')
+try:
+    wib = ZoneInfo("Asia/Jakarta")
+except ZoneInfoNotFoundError: # Tanpa database tz (misal Windows tanpa paket tzdata)
+    wib = timezone(timedelta(hours=7), "WIB")
+_IMPORTS_DONE_AT = time.perf_counter()
+
+# curl_cffi dan fake_useragent berat untuk di-import; keduanya dimuat saat pertama kali dibutuhkan
+_curl_requests = None
+
+def curl_requests():
+    global _curl_requests
+    if _curl_requests is None:
+        from curl_cffi import requests as curl_requests_module
+        _curl_requests = curl_requests_module
+    return _curl_requests
+
+
+FALLBACK_USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36"
+
+
+def load_user_agent(cache_file: Optional[str] = None) -> Tuple[str, str]:
+    # User-Agent dipilih sekali lalu disimpan, supaya start berikutnya (dan proses worker) tidak memuat
+    # dataset fake_useragent lagi. Nilai kembali: (user_agent, sumber).
+    if cache_file:
+        try:
+            with open(cache_file, "r", encoding="utf-8") as f:
+                cached = f.readline().strip()
+            if cached:
+                return cached, "cache"
+        except OSError:
+            pass
+    try:
+        from fake_useragent import FakeUserAgent
+        user_agent, source = FakeUserAgent().random, "fake_useragent"
+    except Exception: # Dataset rusak/tidak tersedia tidak boleh menghentikan bot
+        user_agent, source = FALLBACK_USER_AGENT, "fallback"
+    if cache_file:
+        try:
+            tmp_path = f"{cache_file}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(user_agent + "\n")
+            os.replace(tmp_path, cache_file) # Atomik: beberapa worker bisa menulis bersamaan
+        except OSError:
+            pass
+    return user_agent, source
 
 # Definisikan warna utama
 C_SUCCESS = Fore.LIGHTGREEN_EX
@@ -26,8 +105,1676 @@ C_TEXT = Fore.LIGHTYELLOW_EX
 C_SEPARATOR = Fore.LIGHTYELLOW_EX
 
 
-class NaorisProtocolAutomation:
+LOG_LEVELS = {"DEBUG": 10, "INFO": 20, "INPUT": 20, "SUCCESS": 25, "WARNING": 30, "ERROR": 40}
+LEVEL_COLOR_MAP = {
+    "SUCCESS": C_SUCCESS, "INFO": C_INFO, "WARNING": C_WARNING,
+    "ERROR": C_ERROR, "DEBUG": C_DEBUG, "INPUT": C_INPUT
+}
+ANSI_ESCAPE_RE = re.compile(r"\x1b\[[0-9;]*m")
+
+
+SESSION_UNKNOWN = "unknown"
+SESSION_ACTIVE = "active"
+SESSION_LOST = "lost"
+
+
+class LogPipeline:
+    # Log diformat di thread event loop (setelah filter level) lalu dikirim lewat antrean ke
+    # thread penulis yang menulis per batch, jadi print() tidak lagi memblokir event loop.
+    def __init__(self, min_level: str = "DEBUG", json_path: Optional[str] = None,
+                 batch_size: int = 512, flush_interval: float = 0.1) -> None:
+        self.min_level_no = LOG_LEVELS.get(min_level.upper(), 10)
+        self.json_path = json_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.dropped_by_level: int = 0
+        self.console = True # False: baris tidak ditulis ke stdout (mode --live di terminal), JSON tetap
+        self._queue: queue.Queue = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._ts_second: int = -1
+        self._ts_text: str = ""
+        self._ts_iso: str = ""
+
+    def set_level(self, min_level: str) -> None:
+        self.min_level_no = LOG_LEVELS.get(min_level.upper(), self.min_level_no)
+
+    def enabled(self, level: str) -> bool:
+        return LOG_LEVELS.get(level, 20) >= self.min_level_no
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    def _timestamps(self) -> Tuple[str, str]:
+        # Format waktu cukup dihitung sekali per detik
+        now = int(time.time())
+        if now != self._ts_second:
+            moment = datetime.fromtimestamp(now, wib)
+            self._ts_text = moment.strftime('%Y-%m-%d %H:%M:%S %Z')
+            self._ts_iso = moment.isoformat()
+            self._ts_second = now
+        return self._ts_text, self._ts_iso
+
+    def emit(self, level: str, message: str, **fields: Any) -> None:
+        level = level.upper()
+        if not self.enabled(level):
+            self.dropped_by_level += 1
+            return
+        timestamp, timestamp_iso = self._timestamps()
+        log_color = LEVEL_COLOR_MAP.get(level, C_INFO)
+        line = f"{C_TEXT}[{timestamp}]{Style.RESET_ALL} {log_color}[{level.ljust(5)}]{Style.RESET_ALL} {log_color}{message}{Style.RESET_ALL}\n"
+        record = None
+        if self.json_path:
+            record = {"ts": timestamp_iso, "level": level, "message": ANSI_ESCAPE_RE.sub("", message)}
+            record.update({key: value for key, value in fields.items() if value is not None})
+        self._put((line, record))
+
+    def write_raw(self, text: str, level: str = "INFO") -> None:
+        if not self.enabled(level):
+            self.dropped_by_level += 1
+            return
+        self._put((text + "\n", None))
+
+    def write_block(self, text: str) -> None:
+        # Blok status --live selalu ditulis, tidak ikut filter level
+        self._put((text + "\n", None))
+
+    def _put(self, item: Tuple[str, Optional[Dict[str, Any]]]) -> None:
+        if self._thread is None:
+            self._start()
+        self._queue.put(item)
+
+    def _start(self) -> None:
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._writer, name="log-writer", daemon=True)
+                self._thread.start()
+                atexit.register(self.close)
+
+    def _writer(self) -> None:
+        json_file = open(self.json_path, "a", encoding="utf-8") if self.json_path else None
+        try:
+            while True:
+                item = self._queue.get()
+                batch = [item]
+                # Ambil sisa antrean sekaligus agar satu write/flush melayani banyak baris
+                while len(batch) < self.batch_size:
+                    try:
+                        batch.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                stop = False
+                lines = []
+                records = []
+                for entry in batch:
+                    if entry is None:
+                        stop = True
+                        continue
+                    lines.append(entry[0])
+                    if entry[1] is not None:
+                        records.append(json.dumps(entry[1], ensure_ascii=False) + "\n")
+                try:
+                    if lines and self.console:
+                        sys.stdout.write("".join(lines))
+                        sys.stdout.flush()
+                    if json_file is not None and records:
+                        json_file.write("".join(records))
+                        json_file.flush()
+                except (OSError, ValueError):
+                    pass
+                for _ in batch:
+                    self._queue.task_done()
+                if stop:
+                    return
+                if self.flush_interval and self._queue.qsize() < self.batch_size:
+                    time.sleep(self.flush_interval) # Kumpulkan baris berikutnya menjadi satu batch
+        finally:
+            if json_file is not None:
+                json_file.close()
+
+    def flush(self) -> None:
+        # Tunggu sampai semua baris yang sudah diantre tertulis (misal sebelum prompt input())
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.join()
+
+    def close(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join(timeout=5)
+
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _format_labels(label_names: Tuple[str, ...], label_values: Tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{name}="{value}"' for name, value in zip(label_names, label_values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class MetricCounter:
+    def __init__(self, name: str, help_text: str, label_names: Tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, *label_values: str) -> None:
+        self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        for label_values, value in self.values.items():
+            lines.append(f"{self.name}{_format_labels(self.label_names, label_values)} {value}")
+        return lines
+
+
+class MetricGauge:
+    # Nilai gauge dibaca lewat callback saat di-scrape, jadi tidak perlu di-update di jalur panas
+    TYPE = "gauge"
+
+    def __init__(self, name: str, help_text: str, read: Callable[[], float]) -> None:
+        self.name = name
+        self.help_text = help_text
+        self.read = read
+
+    def render(self) -> List[str]:
+        try:
+            value = self.read()
+        except Exception:
+            value = float("nan")
+        return [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.TYPE}", f"{self.name} {value}"]
+
+
+class MetricCallbackCounter(MetricGauge):
+    # Penghitung monoton yang sudah disimpan di tempat lain (atribut bot); dibaca lewat callback seperti gauge
+    TYPE = "counter"
+
+
+class MetricHistogram:
+    def __init__(self, name: str, help_text: str, label_names: Tuple[str, ...] = (), buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> None:
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        # label -> [hitungan per bucket (non-kumulatif)..., +Inf, sum]
+        self.values: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, *label_values: str) -> None:
+        slots = self.values.get(label_values)
+        if slots is None:
+            slots = self.values[label_values] = [0] * (len(self.buckets) + 2)
+        slots[bisect.bisect_left(self.buckets, value)] += 1
+        slots[-1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for label_values, slots in self.values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, slots):
+                cumulative += count
+                le_label = 'le="%s"' % bound
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, label_values, le_label)} {cumulative}")
+            cumulative += slots[len(self.buckets)]
+            le_label = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{_format_labels(self.label_names, label_values, le_label)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.label_names, label_values)} {slots[-1]}")
+            lines.append(f"{self.name}_count{_format_labels(self.label_names, label_values)} {cumulative}")
+        return lines
+
+
+class BotMetrics:
+    def __init__(self) -> None:
+        self.request_duration = MetricHistogram("naoris_request_duration_seconds", "Latensi request HTTP per endpoint dan rute egress", ("endpoint", "route"))
+        self.requests = MetricCounter("naoris_requests_total", "Jumlah request HTTP per endpoint, rute dan status", ("endpoint", "route", "status"))
+        self.retries = MetricCounter("naoris_retries_total", "Jumlah retry per endpoint", ("endpoint",))
+        self.actions = MetricCounter("naoris_actions_total", "Jumlah aksi scheduler yang dijalankan", ("action",))
+        self.scheduler_lag = MetricHistogram("naoris_scheduler_lag_seconds", "Selisih waktu antara tenggat aksi dan saat aksi dikirim ke worker", ("action",))
+        self.action_duration = MetricHistogram("naoris_action_duration_seconds", "Wall time aksi scheduler per jenis aksi", ("action",))
+        self.metrics: List[Any] = [self.request_duration, self.requests, self.retries, self.actions, self.scheduler_lag, self.action_duration]
+        self._route_labels: Dict[Optional[str], str] = {}
+
+    def add_gauge(self, name: str, help_text: str, read: Callable[[], float]) -> None:
+        self.metrics.append(MetricGauge(name, help_text, read))
+
+    def add_counter(self, name: str, help_text: str, read: Callable[[], float]) -> None:
+        self.metrics.append(MetricCallbackCounter(name, help_text, read))
+
+    def route_label(self, proxy: Optional[str]) -> str:
+        # host:port saja, kredensial proxy tidak boleh muncul di metrik
+        label = self._route_labels.get(proxy)
+        if label is None:
+            if not proxy:
+                label = "direct"
+            else:
+                parsed = urlparse(proxy)
+                label = f"{parsed.hostname}:{parsed.port}" if parsed.port else str(parsed.hostname)
+            self._route_labels[proxy] = label
+        return label
+
+    def observe_request(self, url: str, proxy: Optional[str], status: str, duration: float) -> None:
+        endpoint = url.rsplit("/", 1)[-1]
+        route = self.route_label(proxy)
+        self.request_duration.observe(duration, endpoint, route)
+        self.requests.inc(1, endpoint, route, status)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    async def serve(self, host: str, port: int) -> asyncio.AbstractServer:
+        async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+            try:
+                request_line = await reader.readline()
+                while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    pass
+                parts = request_line.decode("latin-1").split(" ")
+                if len(parts) >= 2 and parts[1].split("?", 1)[0] in ("/metrics", "/"):
+                    status, body = "200 OK", self.render().encode()
+                else:
+                    status, body = "404 Not Found", b"not found\n"
+                writer.write(
+                    f"HTTP/1.1 {status}\r\nContent-Type: text/plain; version=0.0.4\r\n"
+                    f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body
+                )
+                await writer.drain()
+            except (ConnectionError, asyncio.IncompleteReadError):
+                pass
+            finally:
+                writer.close()
+        return await asyncio.start_server(handle, host, port)
+
+
+def _executor_queue_introspectable() -> bool:
+    # Cek sekali saat import: ThreadPoolExecutor._work_queue adalah detail internal CPython
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+    try:
+        return callable(getattr(getattr(executor, "_work_queue", None), "qsize", None))
+    finally:
+        executor.shutdown(wait=False)
+
+
+EXECUTOR_QUEUE_INTROSPECTABLE = _executor_queue_introspectable()
+
+
+def executor_queue_depth(loop: asyncio.AbstractEventLoop) -> Optional[int]:
+    # Antrean default executor (asyncio.to_thread: penulisan SQLite); None jika atribut privatnya tidak ada
+    if not EXECUTOR_QUEUE_INTROSPECTABLE:
+        return None
+    executor = getattr(loop, "_default_executor", None)
+    work_queue = getattr(executor, "_work_queue", None)
+    return work_queue.qsize() if work_queue is not None else 0
+
+
+def read_rss_mb() -> float:
+    # RSS proses dari /proc (Linux); 0 jika tidak tersedia
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        return 0.0
+
+
+class MemoryWatchdog:
+    # Opt-in (--memory-watchdog): snapshot tracemalloc berkala dibandingkan dengan snapshot pertama
+    # (baseline) dan snapshot sebelumnya, ditambah jumlah objek GC per tipe per akun. Laporan ditulis
+    # ke file; memori per akun di atas anggaran memicu peringatan atau restart terkendali.
+    # tracemalloc menambah overhead CPU/memori selama aktif, jadi hanya untuk investigasi.
+    TRACE_FILTERS = (
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+        tracemalloc.Filter(False, "<unknown>"),
+    )
+
+    def __init__(self, interval: float = 600.0, report_path: str = "naoris_memory.log", budget_kb_per_account: Optional[float] = None,
+                 action: str = "warn", frames: int = 5, top: int = 15) -> None:
+        self.interval = interval
+        self.report_path = report_path
+        self.budget_kb_per_account = budget_kb_per_account
+        self.action = action # "warn" atau "restart"
+        self.frames = frames
+        self.top = top
+        self.checks = 0
+        self._started_tracing = False
+        self._baseline: Optional[tracemalloc.Snapshot] = None
+        self._previous: Optional[tracemalloc.Snapshot] = None
+        self._baseline_counts: Counter = Counter()
+        self._lock = threading.Lock() # stop() saat shutdown menunggu check() yang sedang berjalan di thread
+
+    def start(self) -> None:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+            self._started_tracing = True
+
+    def stop(self) -> None:
+        with self._lock:
+            if self._started_tracing:
+                tracemalloc.stop()
+                self._started_tracing = False
+            self._baseline = self._previous = None
+
+    def _format_diff(self, title: str, snapshot: tracemalloc.Snapshot, reference: tracemalloc.Snapshot) -> List[str]:
+        lines = [title]
+        growing = [stat for stat in snapshot.compare_to(reference, "traceback") if stat.size_diff > 0][:self.top]
+        for stat in growing:
+            frames = " <- ".join(f"{os.path.basename(frame.filename)}:{frame.lineno}" for frame in stat.traceback)
+            lines.append(f"  {stat.size_diff / 1024:+10.1f} KiB {stat.count_diff:+8d} blok (total {stat.size / 1024:.1f} KiB)  {frames}")
+        if not growing:
+            lines.append("  (tidak ada yang bertambah)")
+        return lines
+
+    def check(self, accounts: int, tasks: int) -> Dict[str, Any]:
+        # Berat (snapshot + gc.get_objects), dijalankan lewat asyncio.to_thread
+        with self._lock:
+            return self._check(accounts, tasks)
+
+    def _check(self, accounts: int, tasks: int) -> Dict[str, Any]:
+        self.checks += 1
+        snapshot = tracemalloc.take_snapshot().filter_traces(self.TRACE_FILTERS)
+        traced, peak = tracemalloc.get_traced_memory()
+        rss_mb = read_rss_mb()
+        counts = Counter(type(obj).__name__ for obj in gc.get_objects())
+        per_account_kb = (rss_mb * 1024 if rss_mb else traced / 1024) / accounts if accounts else 0.0
+        over_budget = bool(self.budget_kb_per_account and accounts and per_account_kb > self.budget_kb_per_account)
+
+        timestamp = datetime.now(wib).strftime('%Y-%m-%d %H:%M:%S %Z')
+        lines = [
+            f"=== {timestamp} | cek #{self.checks} | pid {os.getpid()} ===",
+            f"RSS {rss_mb:.1f} MB | tracemalloc {traced / 1048576:.1f} MB (puncak {peak / 1048576:.1f} MB) | akun {accounts} | "
+            f"{per_account_kb:.1f} KiB/akun" + (f" (anggaran {self.budget_kb_per_account:.0f})" if self.budget_kb_per_account else "") +
+            f" | task asyncio {tasks}",
+        ]
+        if self._baseline is None:
+            self._baseline = snapshot
+            self._baseline_counts = counts
+            lines.append("Baseline diambil; pertumbuhan dilaporkan mulai cek berikutnya.")
+        else:
+            lines.extend(self._format_diff("Pertumbuhan terbesar sejak baseline:", snapshot, self._baseline))
+            lines.extend(self._format_diff("Pertumbuhan terbesar sejak cek sebelumnya:", snapshot, self._previous))
+            lines.append("Objek GC per akun (tipe yang paling bertambah sejak baseline):")
+            growth = sorted(((count - self._baseline_counts.get(name, 0), name) for name, count in counts.items()), reverse=True)
+            for diff, name in growth[:self.top]:
+                if diff <= 0:
+                    break
+                per_account = counts[name] / accounts if accounts else float(counts[name])
+                lines.append(f"  {name:<32} {counts[name]:>10d} ({per_account:.2f}/akun, +{diff})")
+        self._previous = snapshot
+        with open(self.report_path, "a", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n\n")
+        return {"rss_mb": rss_mb, "traced_mb": traced / 1048576, "per_account_kb": per_account_kb, "over_budget": over_budget}
+
+
+class RuntimeProfiler:
+    # Profiling yang bisa dinyalakan/dimatikan saat bot berjalan (flag --profile atau SIGUSR1):
+    # lag event loop, callback lambat, wall time per aksi, dan sampling profiler berbasis thread
+    # yang membaca stack thread event loop lewat sys._current_frames() (format collapsed stack).
+    def __init__(self, output_dir: str = ".", lag_interval: float = 0.1, slow_callback_seconds: float = 0.05,
+                 sample_interval: float = 0.005, max_stack_depth: int = 48) -> None:
+        self.output_dir = output_dir
+        self.lag_interval = lag_interval
+        self.slow_callback_seconds = slow_callback_seconds
+        self.sample_interval = sample_interval
+        self.max_stack_depth = max_stack_depth
+        self.enabled = False
+        self._lag_task: Optional[asyncio.Task] = None
+        self._sampler: Optional[threading.Thread] = None
+        self._sampler_stop = threading.Event()
+        self._loop_thread_id: Optional[int] = None
+        self._original_handle_run: Optional[Callable] = None
+        # Keduanya bergantung pada detail internal CPython; jika tidak ada, bagian itu saja yang dimatikan
+        handle_type = getattr(asyncio.events, "Handle", None)
+        self.slow_callbacks_supported = callable(getattr(handle_type, "_run", None))
+        self.sampling_supported = callable(getattr(sys, "_current_frames", None))
+        self.reset()
+
+    def reset(self) -> None:
+        self.lag_samples: List[float] = []
+        self.slow_callbacks: Dict[str, List[float]] = {} # nama callback -> [jumlah, total detik, maks detik]
+        self.action_times: Dict[str, List[float]] = {}   # aksi -> [jumlah, total detik, maks detik]
+        self.stack_samples: Counter = Counter()
+        self.sample_count: int = 0
+
+    def enable(self) -> None:
+        if self.enabled:
+            return
+        self.enabled = True
+        self._loop_thread_id = threading.get_ident()
+        self._lag_task = asyncio.get_running_loop().create_task(self._monitor_lag())
+        if self.slow_callbacks_supported:
+            self._patch_handle_run()
+        if self.sampling_supported:
+            self._sampler_stop.clear()
+            self._sampler = threading.Thread(target=self._sample_stacks, name="naoris-profiler", daemon=True)
+            self._sampler.start()
+
+    def unsupported(self) -> List[str]:
+        parts = []
+        if not self.slow_callbacks_supported:
+            parts.append("callback lambat (asyncio.events.Handle._run)")
+        if not self.sampling_supported:
+            parts.append("sampling profiler (sys._current_frames)")
+        return parts
+
+    def disable(self) -> None:
+        if not self.enabled:
+            return
+        self.enabled = False
+        if self._lag_task is not None:
+            self._lag_task.cancel()
+            self._lag_task = None
+        if self._original_handle_run is not None:
+            asyncio.events.Handle._run = self._original_handle_run
+            self._original_handle_run = None
+        self._sampler_stop.set()
+        if self._sampler is not None:
+            self._sampler.join(timeout=1)
+            self._sampler = None
+
+    async def _monitor_lag(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.lag_interval
+            await asyncio.sleep(self.lag_interval)
+            self.lag_samples.append(max(0.0, loop.time() - expected))
+
+    def _patch_handle_run(self) -> None:
+        # Semua callback event loop (termasuk langkah Task) lewat Handle._run; dibungkus hanya selama profiling aktif
+        original = asyncio.events.Handle._run
+        profiler = self
+
+        def timed_run(handle):
+            started = time.perf_counter()
+            original(handle)
+            elapsed = time.perf_counter() - started
+            if elapsed >= profiler.slow_callback_seconds:
+                profiler._record(profiler.slow_callbacks, profiler._describe_callback(handle), elapsed)
+
+        try:
+            asyncio.events.Handle._run = timed_run
+        except (AttributeError, TypeError):
+            self.slow_callbacks_supported = False # Tipe tidak bisa di-patch (misal implementasi C)
+            return
+        self._original_handle_run = original
+
+    @staticmethod
+    def _describe_callback(handle) -> str:
+        callback = getattr(handle, "_callback", None)
+        owner = getattr(callback, "__self__", None)
+        if isinstance(owner, asyncio.Task):
+            coro = owner.get_coro()
+            return f"task {getattr(coro, '__qualname__', repr(coro))}"
+        return getattr(callback, "__qualname__", repr(callback))
+
+    @staticmethod
+    def _record(table: Dict[str, List[float]], key: str, elapsed: float) -> None:
+        entry = table.get(key)
+        if entry is None:
+            table[key] = [1, elapsed, elapsed]
+        else:
+            entry[0] += 1
+            entry[1] += elapsed
+            entry[2] = max(entry[2], elapsed)
+
+    def record_action(self, action: str, elapsed: float) -> None:
+        self._record(self.action_times, action, elapsed)
+
+    def _sample_stacks(self) -> None:
+        while not self._sampler_stop.wait(self.sample_interval):
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None and len(stack) < self.max_stack_depth:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            self.stack_samples[";".join(reversed(stack))] += 1
+            self.sample_count += 1
+
+    def dump(self) -> Optional[str]:
+        # Format collapsed stack ("a;b;c jumlah"), bisa dibuka dengan flamegraph.pl atau speedscope
+        if not self.stack_samples:
+            return None
+        path = os.path.join(self.output_dir, f"naoris_profile_{os.getpid()}_{int(time.time())}.folded")
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.stack_samples.most_common():
+                f.write(f"{stack} {count}\n")
+        return path
+
+    def summary(self, top: int = 5) -> List[str]:
+        lags = sorted(self.lag_samples)
+        lines = []
+        if lags:
+            p99 = lags[min(len(lags) - 1, int(len(lags) * 0.99))]
+            lines.append(f"Lag event loop: p50 {lags[len(lags) // 2] * 1000:.1f} ms, p99 {p99 * 1000:.1f} ms, maks {lags[-1] * 1000:.1f} ms ({len(lags)} sampel)")
+        slowest = sorted(self.slow_callbacks.items(), key=lambda item: -item[1][1])[:top]
+        for name, (count, total, longest) in slowest:
+            lines.append(f"Callback lambat: {name} {int(count)}x, total {total * 1000:.0f} ms, maks {longest * 1000:.0f} ms")
+        for action, (count, total, longest) in sorted(self.action_times.items()):
+            lines.append(f"Aksi {action}: {int(count)}x, rata-rata {total / count * 1000:.1f} ms, maks {longest * 1000:.0f} ms")
+        return lines
+
+
+def _jwt_expiry(token: str) -> Optional[float]:
+    # Ambil klaim "exp" (epoch detik) dari payload JWT tanpa verifikasi tanda tangan
+    try:
+        payload_part = token.split(".")[1]
+        payload_part += "=" * (-len(payload_part) % 4)
+        exp = json.loads(base64.urlsafe_b64decode(payload_part)).get("exp")
+        return float(exp) if exp is not None else None
+    except (IndexError, ValueError, TypeError, AttributeError):
+        return None
+
+
+class StateDatabase:
+    # Satu koneksi SQLite untuk semua store di file state yang sama (token, pendapatan, checkpoint,
+    # ledger setup). Koneksi dipakai dari event loop dan thread writer, jadi setiap akses memegang lock.
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._schemas: set = set()
+
+    def _connect(self, schema: Tuple[str, ...]) -> sqlite3.Connection:
+        if self._conn is None:
+            # timeout: beberapa proses worker bisa menulis ke file yang sama
+            self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+        missing = [statement for statement in schema if statement not in self._schemas]
+        if missing:
+            for statement in missing:
+                self._conn.execute(statement)
+            self._conn.commit()
+            self._schemas.update(missing)
+        return self._conn
+
+    def query(self, schema: Tuple[str, ...], sql: str, params: Tuple[Any, ...] = ()) -> List[Tuple[Any, ...]]:
+        with self.lock:
+            return [tuple(row) for row in self._connect(schema).execute(sql, params).fetchall()]
+
+    @contextlib.contextmanager
+    def transaction(self, schema: Tuple[str, ...]) -> Iterator[sqlite3.Connection]:
+        with self.lock:
+            conn = self._connect(schema)
+            with conn:
+                yield conn
+
+    def close(self) -> None:
+        with self.lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+                self._schemas.clear()
+
+
+class WriteBehindStore:
+    # Basis store di StateDatabase: perubahan ditampung di memori lalu ditulis per batch (write-behind)
+    # oleh run_writer. Subclass cukup mendefinisikan SCHEMA, wadah batch dan _apply_batch.
+    SCHEMA: Tuple[str, ...] = ()
+
+    def __init__(self, db: StateDatabase, flush_interval: float = 5.0) -> None:
+        self.db = db
+        self.path = db.path
+        self.flush_interval = flush_interval
+        self._pending = self._new_batch()
+
+    def _new_batch(self) -> Any:
+        return {}
+
+    def _query(self, sql: str, params: Tuple[Any, ...] = ()) -> List[Tuple[Any, ...]]:
+        return self.db.query(self.SCHEMA, sql, params)
+
+    def _apply_batch(self, conn: sqlite3.Connection, batch: Any) -> None:
+        raise NotImplementedError
+
+    def _take_batch(self) -> Any:
+        batch, self._pending = self._pending, self._new_batch()
+        return batch
+
+    def flush(self) -> int:
+        return self._write_batch(self._take_batch())
+
+    def _write_batch(self, batch: Any) -> int:
+        if not batch:
+            return 0
+        with self.db.transaction(self.SCHEMA) as conn:
+            self._apply_batch(conn, batch)
+        return len(batch)
+
+    async def run_writer(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            # Batch diambil di thread event loop, penulisan ke disk di thread terpisah
+            batch = self._take_batch()
+            if batch:
+                await asyncio.to_thread(self._write_batch, batch)
+
+    def close(self) -> None:
+        # Koneksi milik StateDatabase; di sini hanya sisa batch yang ditulis
+        self.flush()
+
+
+class TokenStore(WriteBehindStore):
+    # Token per akun; ditulis per batch supaya refresh token tidak memicu fsync setiap kali.
+    # Nilai None di batch berarti baris dihapus.
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS tokens ("
+        "address TEXT PRIMARY KEY, access_token TEXT NOT NULL, refresh_token TEXT NOT NULL, "
+        "expires_at REAL, updated_at REAL NOT NULL)",
+    )
+
+    def get(self, address: str) -> Optional[Tuple[str, str, Optional[float]]]:
+        if address in self._pending: # Perubahan yang belum di-flush lebih baru dari isi file
+            return self._pending[address]
+        rows = self._query("SELECT access_token, refresh_token, expires_at FROM tokens WHERE address = ?", (address,))
+        return rows[0] if rows else None
+
+    def load(self) -> Dict[str, Tuple[str, str, Optional[float]]]:
+        rows = self._query("SELECT address, access_token, refresh_token, expires_at FROM tokens")
+        return {address: (access, refresh, expires_at) for address, access, refresh, expires_at in rows}
+
+    def put(self, address: str, access_token: str, refresh_token: str, expires_at: Optional[float]) -> None:
+        self._pending[address] = (access_token, refresh_token, expires_at)
+
+    def delete(self, address: str) -> None:
+        self._pending[address] = None
+
+    def _apply_batch(self, conn: sqlite3.Connection, batch: Dict[str, Optional[Tuple[str, str, Optional[float]]]]) -> None:
+        now = time.time()
+        upserts = [(address, *entry, now) for address, entry in batch.items() if entry is not None]
+        deletes = [(address,) for address, entry in batch.items() if entry is None]
+        if upserts:
+            conn.executemany(
+                "INSERT INTO tokens (address, access_token, refresh_token, expires_at, updated_at) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(address) DO UPDATE SET access_token=excluded.access_token, "
+                "refresh_token=excluded.refresh_token, expires_at=excluded.expires_at, updated_at=excluded.updated_at",
+                upserts
+            )
+        if deletes:
+            conn.executemany("DELETE FROM tokens WHERE address = ?", deletes)
+
+
+class EarningsStore(WriteBehindStore):
+    # Deret waktu totalEarnings per akun. Sampel hanya ditambahkan, jadi batch-nya berupa list. Total yang
+    # tidak berubah hanya disimpan sekali per heartbeat_seconds (cukup untuk deteksi akun macet), dan baris
+    # yang lebih tua dari retention_seconds dihapus berkala.
+    # WITHOUT ROWID: baris disimpan langsung di B-tree (address, ts), tanpa indeks terpisah
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS earnings ("
+        "address TEXT NOT NULL, ts INTEGER NOT NULL, total REAL NOT NULL, "
+        "PRIMARY KEY (address, ts)) WITHOUT ROWID",
+    )
+
+    def __init__(self, db: StateDatabase, flush_interval: float = 30.0, heartbeat_seconds: float = 3600.0,
+                 retention_seconds: Optional[float] = 30 * 24 * 3600, prune_interval: float = 3600.0) -> None:
+        super().__init__(db, flush_interval)
+        self.heartbeat_seconds = heartbeat_seconds
+        self.retention_seconds = retention_seconds # None = simpan semua
+        self.prune_interval = prune_interval
+        self.deduped: int = 0
+        self._last_stored: Dict[str, Tuple[float, int]] = {} # alamat -> (total, ts) sampel terakhir yang disimpan
+        self._pruned_at = 0.0
+
+    def _new_batch(self) -> List[Tuple[str, int, float]]:
+        return []
+
+    def append(self, address: str, total: float, timestamp: Optional[float] = None) -> None:
+        ts = int(timestamp if timestamp is not None else time.time())
+        last = self._last_stored.get(address)
+        if last is not None and last[0] == total and ts - last[1] < self.heartbeat_seconds:
+            self.deduped += 1
+            return
+        self._last_stored[address] = (total, ts)
+        self._pending.append((address, ts, total))
+
+    def forget(self, address: str) -> None:
+        self._last_stored.pop(address, None)
+
+    def _apply_batch(self, conn: sqlite3.Connection, batch: List[Tuple[str, int, float]]) -> None:
+        conn.executemany("INSERT OR REPLACE INTO earnings (address, ts, total) VALUES (?, ?, ?)", batch)
+        now = time.time()
+        if self.retention_seconds and now - self._pruned_at >= self.prune_interval:
+            # Tanpa indeks pada ts saja ini memindai tabel, jadi dijalankan paling sering tiap prune_interval
+            conn.execute("DELETE FROM earnings WHERE ts < ?", (int(now - self.retention_seconds),))
+            self._pruned_at = now
+
+    def summary(self, window_start: float) -> List[Tuple[str, int, float, int, float, int]]:
+        # Per akun: (alamat, ts terakhir, total terakhir, ts awal jendela, total awal jendela, ts total terakhir pertama kali terlihat)
+        return self._query(
+            "WITH latest AS ("
+            "  SELECT e.address, e.ts, e.total FROM earnings e"
+            "  JOIN (SELECT address, MAX(ts) AS ts FROM earnings GROUP BY address) m USING (address, ts)"
+            "), first_in_window AS ("
+            "  SELECT e.address, e.ts, e.total FROM earnings e"
+            "  JOIN (SELECT address, MIN(ts) AS ts FROM earnings WHERE ts >= ? GROUP BY address) m USING (address, ts)"
+            "), changed AS ("
+            "  SELECT e.address, MIN(e.ts) AS ts FROM earnings e"
+            "  JOIN latest l ON e.address = l.address AND e.total = l.total GROUP BY e.address"
+            ") "
+            "SELECT l.address, l.ts, l.total, COALESCE(f.ts, l.ts), COALESCE(f.total, l.total), c.ts "
+            "FROM latest l LEFT JOIN first_in_window f USING (address) JOIN changed c USING (address) "
+            "ORDER BY l.address",
+            (int(window_start),)
+        )
+
+
+class CheckpointStore:
+    # Snapshot state per akun yang ditulis saat shutdown dan dibaca saat start berikutnya,
+    # supaya back-off polling wallet dan laju pendapatan tidak mulai dari nol.
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS account_state ("
+        "address TEXT PRIMARY KEY, wallet_interval REAL, wallet_next_poll_at REAL, "
+        "earnings_ts REAL, earnings_total REAL, earnings_rate REAL, saved_at REAL NOT NULL)",
+    )
+
+    def __init__(self, db: StateDatabase) -> None:
+        self.db = db
+        self.path = db.path
+
+    def save(self, rows: List[Tuple[str, Optional[float], Optional[float], Optional[float], Optional[float], Optional[float]]]) -> int:
+        if not rows:
+            return 0
+        now = time.time()
+        with self.db.transaction(self.SCHEMA) as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO account_state (address, wallet_interval, wallet_next_poll_at, earnings_ts, "
+                "earnings_total, earnings_rate, saved_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(*row, now) for row in rows]
+            )
+        return len(rows)
+
+    def load(self) -> Dict[str, Tuple[Optional[float], Optional[float], Optional[float], Optional[float], Optional[float]]]:
+        rows = self.db.query(
+            self.SCHEMA, "SELECT address, wallet_interval, wallet_next_poll_at, earnings_ts, earnings_total, earnings_rate FROM account_state"
+        )
+        return {row[0]: row[1:] for row in rows}
+
+
+class SetupLedger(WriteBehindStore):
+    # Langkah setup sekali-jalan (addWhitelist) yang sudah selesai per (alamat, deviceHash). Bot
+    # memverifikasi ulang entri yang lebih tua dari TTL atau yang dibatalkan respons API.
+    # device_hash disimpan sebagai teks: deviceHash dari file akun bisa melebihi INTEGER 64-bit
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS setup_steps ("
+        "address TEXT NOT NULL, device_hash TEXT NOT NULL, step TEXT NOT NULL, completed_at REAL NOT NULL, "
+        "PRIMARY KEY (address, device_hash, step))",
+    )
+
+    def get(self, address: str, device_hash: int, step: str) -> Optional[float]:
+        key = (address, str(device_hash), step)
+        if key in self._pending:
+            return self._pending[key]
+        rows = self._query("SELECT completed_at FROM setup_steps WHERE address = ? AND device_hash = ? AND step = ?", key)
+        return rows[0][0] if rows else None
+
+    def load(self, step: str) -> Dict[Tuple[str, int], float]:
+        rows = self._query("SELECT address, device_hash, completed_at FROM setup_steps WHERE step = ?", (step,))
+        return {(address, int(device_hash)): completed_at for address, device_hash, completed_at in rows}
+
+    def mark(self, address: str, device_hash: int, step: str, completed_at: float) -> None:
+        self._pending[(address, str(device_hash), step)] = completed_at
+
+    def forget(self, address: str, device_hash: int, step: str) -> None:
+        self._pending[(address, str(device_hash), step)] = None
+
+    def _apply_batch(self, conn: sqlite3.Connection, batch: Dict[Tuple[str, str, str], Optional[float]]) -> None:
+        upserts = [(*key, completed_at) for key, completed_at in batch.items() if completed_at is not None]
+        deletes = [key for key, completed_at in batch.items() if completed_at is None]
+        if upserts:
+            conn.executemany("INSERT OR REPLACE INTO setup_steps (address, device_hash, step, completed_at) VALUES (?, ?, ?, ?)", upserts)
+        if deletes:
+            conn.executemany("DELETE FROM setup_steps WHERE address = ? AND device_hash = ? AND step = ?", deletes)
+
+
+class SingleFlight:
+    # Menggabungkan pemanggilan bersamaan dengan key yang sama: pemanggil pertama menjalankan
+    # fungsi, pemanggil lain menunggu hasil yang sama alih-alih memanggil API lagi.
+    def __init__(self) -> None:
+        self._in_flight: Dict[Hashable, asyncio.Future] = {}
+        self.executed: int = 0
+        self.saved: int = 0
+
+    def is_running(self, key: Hashable) -> bool:
+        return key in self._in_flight
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        future = self._in_flight.get(key)
+        if future is not None:
+            self.saved += 1
+            return await asyncio.shield(future)
+
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        self.executed += 1
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception() # Tandai sudah dibaca agar tidak muncul warning jika tidak ada penunggu
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            self._in_flight.pop(key, None)
+
+
+class ApiOutcome(enum.Enum):
+    # Balasan teks yang dikenal dari API Naoris; diklasifikasikan sekali di _request
+    UNKNOWN = "unknown"
+    PING_SUCCESS = "Ping Success!!"
+    SESSION_STARTED = "Session started"
+    SESSION_ALREADY_ACTIVE = "Session already active for this device"
+    SESSION_ENDED = "Session ended and daily usage updated"
+    NO_ACTION_NEEDED = "No action needed"
+    SESSION_NOT_FOUND = "Session not found to end"
+    MESSAGE_PRODUCTION_INITIATED = "Message production initiated"
+    WHITELIST_SAVED = "url saved successfully"
+    INVALID_TOKEN = "Invalid token"
+
+
+KNOWN_REPLIES = {outcome.value: outcome for outcome in ApiOutcome if outcome is not ApiOutcome.UNKNOWN}
+SESSION_OFF_OUTCOMES = (ApiOutcome.SESSION_ENDED, ApiOutcome.NO_ACTION_NEEDED, ApiOutcome.SESSION_NOT_FOUND)
+SESSION_ON_OUTCOMES = (ApiOutcome.SESSION_STARTED, ApiOutcome.SESSION_ALREADY_ACTIVE)
+SETUP_WHITELIST = "whitelist" # Nama langkah di SetupLedger
+SETUP_UNDONE_STATUSES = (403,) # Switch/ping/htb-event ditolak: whitelist/izin perangkat kemungkinan dicabut
+RATE_SPARK_CHARS = " ▁▂▃▄▅▆▇█"
+ERROR_BODY_LIMIT = 2048 # Halaman error HTML dari gateway bisa ratusan KB; cukup awalnya saja yang disimpan
+
+
+def decode_body(content: bytes) -> Any:
+    try:
+        return json_loads(content)
+    except ValueError: # orjson.JSONDecodeError dan json.JSONDecodeError sama-sama turunan ValueError
+        return content.decode("utf-8", "replace")
+
+
+class ApiResponse:
+    # Hasil _request: status, body yang sudah di-decode, dan outcome dari balasan teks yang dikenal
+    # (baik teks polos maupun {"message": ...}). error None berarti HTTP 2xx/3xx.
+    __slots__ = ("status_code", "data", "outcome", "error", "circuit_open")
+
+    def __init__(self, status_code: Optional[int], data: Any = None, error: Optional[str] = None, circuit_open: bool = False) -> None:
+        self.status_code = status_code # None = tidak ada respons HTTP (transport gagal, breaker terbuka)
+        self.data = data
+        self.error = error
+        self.circuit_open = circuit_open
+        message = data.get("message") if isinstance(data, dict) else data
+        self.outcome = KNOWN_REPLIES.get(message.strip(), ApiOutcome.UNKNOWN) if isinstance(message, str) else ApiOutcome.UNKNOWN
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    def preview(self, limit: int = 200) -> str:
+        text = self.data if isinstance(self.data, str) else json.dumps(self.data)
+        return text if len(text) <= limit else text[:limit] + "..."
+
+
+class HttpEngine:
+    # Satu AsyncSession yang hidup lama per rute egress (proxy atau koneksi langsung),
+    # supaya koneksi TLS dan stream HTTP/2 bisa dipakai ulang antar request.
+    def __init__(self, max_concurrency: int = 200, max_clients_per_route: int = 20, impersonate: str = "chrome110") -> None:
+        self.max_concurrency = max_concurrency
+        self.max_clients_per_route = max_clients_per_route
+        self.impersonate = impersonate
+        self.sessions: Dict[str, "requests.AsyncSession"] = {}
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self.in_flight: int = 0
+
+    def _route_key(self, proxy: Optional[str]) -> str:
+        return proxy or "direct"
+
+    def get_session(self, proxy: Optional[str]) -> "requests.AsyncSession":
+        route_key = self._route_key(proxy)
+        session = self.sessions.get(route_key)
+        if session is None:
+            session = curl_requests().AsyncSession(
+                proxies={"http": proxy, "https": proxy} if proxy else None,
+                impersonate=self.impersonate,
+                max_clients=self.max_clients_per_route
+            )
+            self.sessions[route_key] = session
+        return session
+
+    async def request(self, method: str, url: str, headers: Dict[str, str], data: Optional[Any] = None,
+                      json_payload: Optional[Dict] = None, proxy: Optional[str] = None,
+                      impersonate: Optional[str] = None, timeout: int = 60):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        session = self.get_session(proxy)
+        async with self._semaphore:
+            self.in_flight += 1
+            try:
+                # discard_cookies: session dipakai bersama banyak akun, cookie tidak boleh bocor antar akun
+                return await session.request(
+                    method, url, headers=headers, data=data, json=json_payload,
+                    timeout=timeout, impersonate=impersonate or self.impersonate, discard_cookies=True
+                )
+            finally:
+                self.in_flight -= 1
+
+    async def close_route(self, proxy: Optional[str]) -> None:
+        # Rute dikarantina: koneksi di pool-nya kemungkinan sudah mati
+        session = self.sessions.pop(self._route_key(proxy), None)
+        if session is not None:
+            try:
+                await session.close()
+            except Exception:
+                pass
+
+    async def close(self):
+        sessions = list(self.sessions.values())
+        self.sessions.clear()
+        for session in sessions:
+            try:
+                await session.close()
+            except Exception:
+                pass
+
+
+class RetryPolicy:
+    # Backoff eksponensial dengan full jitter: akun yang gagal bersamaan tidak retry serentak
+    def __init__(self, base_delay: float = 2.0, max_delay: float = 30.0, multiplier: float = 2.0) -> None:
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.multiplier = multiplier
+
+    def backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_delay, self.base_delay * self.multiplier ** attempt))
+
+
+class RetryBudget:
+    # Batas retry global: setiap request pertama menambah saldo `ratio`, setiap retry memakai 1.
+    # Saat host bermasalah, retry berhenti sendiri begitu saldo habis (plus jatah minimum per detik).
+    def __init__(self, ratio: float = 0.2, min_per_second: float = 5.0, max_balance: float = 500.0) -> None:
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.max_balance = max_balance
+        self.balance = max_balance
+        self.exhausted: int = 0
+        self._updated = time.monotonic()
+
+    def record_request(self) -> None:
+        self.balance = min(self.max_balance, self.balance + self.ratio)
+
+    def try_spend(self) -> bool:
+        now = time.monotonic()
+        self.balance = min(self.max_balance, self.balance + (now - self._updated) * self.min_per_second)
+        self._updated = now
+        if self.balance >= 1:
+            self.balance -= 1
+            return True
+        self.exhausted += 1
+        return False
+
+
+class CircuitBreaker:
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    # Per host: terbuka jika rasio kegagalan di jendela terakhir melewati ambang. Selama terbuka
+    # request langsung ditolak; setelah open_seconds beberapa probe dibiarkan lewat (half-open).
+    def __init__(self, window: int = 50, min_calls: int = 20, failure_ratio: float = 0.5,
+                 open_seconds: float = 30.0, max_open_seconds: float = 300.0, half_open_probes: int = 3) -> None:
+        self.window = window
+        self.min_calls = min_calls
+        self.failure_ratio = failure_ratio
+        self.open_seconds = open_seconds
+        self.max_open_seconds = max_open_seconds
+        self.half_open_probes = half_open_probes
+        self.state = self.CLOSED
+        self.short_circuited: int = 0
+        self._outcomes: deque = deque(maxlen=window)
+        self._failures: int = 0
+        self._open_until: float = 0.0
+        self._current_open_seconds = open_seconds
+        self._probes_in_flight: int = 0
+        self._probe_successes: int = 0
+
+    def before_call(self) -> Optional[bool]:
+        # None = ditolak; selain itu True jika panggilan ini adalah probe half-open
+        if self.state == self.OPEN:
+            if time.monotonic() < self._open_until:
+                self.short_circuited += 1
+                return None
+            self.state = self.HALF_OPEN
+            self._probes_in_flight = 0
+            self._probe_successes = 0
+        if self.state == self.HALF_OPEN:
+            if self._probes_in_flight >= self.half_open_probes:
+                self.short_circuited += 1
+                return None
+            self._probes_in_flight += 1
+            return True
+        return False
+
+    def after_call(self, success: bool, is_probe: bool) -> None:
+        if is_probe:
+            self._probes_in_flight = max(0, self._probes_in_flight - 1)
+            if self.state != self.HALF_OPEN:
+                return
+            if not success:
+                self._trip(escalate=True)
+                return
+            self._probe_successes += 1
+            if self._probe_successes >= self.half_open_probes:
+                self.state = self.CLOSED
+                self._current_open_seconds = self.open_seconds
+                self._outcomes.clear()
+                self._failures = 0
+            return
+        if self.state != self.CLOSED:
+            return
+        if len(self._outcomes) == self._outcomes.maxlen and not self._outcomes[0]:
+            self._failures -= 1
+        self._outcomes.append(success)
+        if not success:
+            self._failures += 1
+            if len(self._outcomes) >= self.min_calls and self._failures / len(self._outcomes) >= self.failure_ratio:
+                self._trip(escalate=False)
+
+    def _trip(self, escalate: bool) -> None:
+        if escalate: # Probe gagal: buka lebih lama (maksimal max_open_seconds)
+            self._current_open_seconds = min(self.max_open_seconds, self._current_open_seconds * 2)
+        self.state = self.OPEN
+        self._open_until = time.monotonic() + self._current_open_seconds
+        self._outcomes.clear()
+        self._failures = 0
+
+
+class RouteStats:
+    __slots__ = ("latency", "error_rate", "samples", "consecutive_failures", "quarantines", "quarantined_until", "accounts")
+
+    def __init__(self) -> None:
+        self.latency: Optional[float] = None # EWMA detik
+        self.error_rate: float = 0.0         # EWMA 0..1
+        self.samples: int = 0
+        self.consecutive_failures: int = 0
+        self.quarantines: int = 0
+        self.quarantined_until: float = 0.0
+        self.accounts: int = 0
+
+
+class RouteManager:
+    # Rute egress (proxy) yang lengket per akun. Akun tetap di rutenya selama rute sehat, supaya
+    # koneksi di pool HttpEngine benar-benar dipakai ulang. Rute baru dipilih dengan power-of-two-choices:
+    # dua rute sehat diambil acak, dipilih yang beban tertimbangnya (akun x biaya latensi/error) lebih kecil.
+    def __init__(self, routes: Iterable[str], failure_threshold: int = 5, quarantine_seconds: float = 120.0,
+                 max_quarantine_seconds: float = 1800.0, ewma_alpha: float = 0.2, default_latency: float = 1.0) -> None:
+        self.failure_threshold = failure_threshold
+        self.quarantine_seconds = quarantine_seconds
+        self.max_quarantine_seconds = max_quarantine_seconds
+        self.ewma_alpha = ewma_alpha
+        self.default_latency = default_latency
+        self.stats: Dict[str, RouteStats] = {route: RouteStats() for route in dict.fromkeys(routes)}
+        self.assignments: Dict[int, str] = {}
+        self.reassignments: int = 0
+        self._healthy: List[str] = list(self.stats)
+        self._healthy_index: Dict[str, int] = {route: i for i, route in enumerate(self._healthy)}
+        self._quarantine_heap: List[Tuple[float, str]] = []
+        self._rng = random.Random()
+
+    def __len__(self) -> int:
+        return len(self.stats)
+
+    @property
+    def quarantined(self) -> int:
+        return len(self.stats) - len(self._healthy)
+
+    def _cost(self, route: str) -> float:
+        stats = self.stats[route]
+        latency = stats.latency if stats.latency is not None else self.default_latency
+        return (stats.accounts + 1) * max(latency, 0.01) * (1.0 + 4.0 * stats.error_rate)
+
+    def _release_expired(self, now: float) -> None:
+        while self._quarantine_heap and self._quarantine_heap[0][0] <= now:
+            until, route = heapq.heappop(self._quarantine_heap)
+            stats = self.stats[route]
+            if stats.quarantined_until != until or route in self._healthy_index:
+                continue
+            stats.consecutive_failures = 0
+            self._healthy_index[route] = len(self._healthy)
+            self._healthy.append(route)
+
+    def _pick(self) -> Optional[str]:
+        if not self._healthy:
+            # Semua rute dikarantina: pakai yang paling cepat keluar karantina daripada berhenti total
+            return min(self.stats, key=lambda route: self.stats[route].quarantined_until, default=None)
+        if len(self._healthy) == 1:
+            return self._healthy[0]
+        first, second = self._rng.sample(self._healthy, 2)
+        return first if self._cost(first) <= self._cost(second) else second
+
+    def assign(self, account: int) -> Optional[str]:
+        now = time.monotonic()
+        self._release_expired(now)
+        route = self.assignments.get(account)
+        if route is not None:
+            if route in self._healthy_index or not self._healthy:
+                return route
+            self.stats[route].accounts -= 1
+            self.reassignments += 1
+        route = self._pick()
+        if route is not None:
+            self.assignments[account] = route
+            self.stats[route].accounts += 1
+        return route
+
+    def release(self, account: int) -> None:
+        route = self.assignments.pop(account, None)
+        if route is not None:
+            self.stats[route].accounts -= 1
+
+    def record(self, route: str, success: bool, latency: Optional[float]) -> bool:
+        # Mengembalikan True jika rute baru saja masuk karantina
+        stats = self.stats.get(route)
+        if stats is None:
+            return False
+        alpha = self.ewma_alpha
+        stats.samples += 1
+        stats.error_rate += alpha * ((0.0 if success else 1.0) - stats.error_rate)
+        if success:
+            stats.consecutive_failures = 0
+            if latency is not None:
+                stats.latency = latency if stats.latency is None else stats.latency + alpha * (latency - stats.latency)
+            return False
+        stats.consecutive_failures += 1
+        if stats.consecutive_failures < self.failure_threshold or route not in self._healthy_index:
+            return False
+        self._quarantine(route, stats)
+        return True
+
+    def _quarantine(self, route: str, stats: RouteStats) -> None:
+        # Lama karantina berlipat tiap kali rute yang sama gagal lagi
+        duration = min(self.max_quarantine_seconds, self.quarantine_seconds * (2 ** stats.quarantines))
+        stats.quarantines += 1
+        stats.quarantined_until = time.monotonic() + duration
+        heapq.heappush(self._quarantine_heap, (stats.quarantined_until, route))
+        index = self._healthy_index.pop(route)
+        last = self._healthy.pop()
+        if last != route:
+            self._healthy[index] = last
+            self._healthy_index[last] = index
+
+
+class TokenBucket:
+    # Token bucket async: rate token per detik dengan kapasitas burst. rate <= 0 berarti tanpa batas.
+    def __init__(self, rate: float, burst: float = 1.0) -> None:
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self._tokens = self.burst
+        self._updated: Optional[float] = None
+
+    async def acquire(self, amount: float = 1.0) -> float:
+        # Mengembalikan lama menunggu (detik)
+        if self.rate <= 0:
+            return 0.0
+        # Reservasi: saldo boleh negatif dan tiap pemanggil tidur tepat sampai gilirannya (FIFO),
+        # jadi ratusan penunggu tidak saling membangunkan setiap kali satu token tersedia
+        now = asyncio.get_running_loop().time()
+        if self._updated is not None:
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        self._tokens -= amount
+        if self._tokens >= 0:
+            return 0.0
+        wait = -self._tokens / self.rate
+        await asyncio.sleep(wait)
+        return wait
+
+
+def ask_use_proxy(logger: LogPipeline, proxy_file: str) -> bool:
+    # Fungsi modul supaya mode supervisor bisa bertanya sebelum membuat bot apa pun
+    while True:
+        logger.flush() # Pastikan log sebelumnya sudah tampil sebelum prompt
+        timestamp = datetime.now(wib).strftime('%Y-%m-%d %H:%M:%S %Z')
+        print(f"{C_TEXT}[{timestamp}]{Style.RESET_ALL} {C_INPUT}[INPUT]{Style.RESET_ALL} {C_INPUT}Apakah Anda ingin menggunakan proxy dari '{proxy_file}'? (y/n): {Style.RESET_ALL}", end="")
+        choice = input().strip().lower()
+        if choice == 'y':
+            logger.emit("INFO", "Menggunakan proxy.")
+            return True
+        elif choice == 'n':
+            logger.emit("INFO", "Tidak menggunakan proxy.")
+            return False
+        else:
+            logger.emit("WARNING", "Input tidak valid. Harap masukkan 'y' untuk Ya atau 'n' untuk Tidak.")
+
+
+PROXY_FILE = "proxies.txt"
+# Aksi yang digeser --shape -> atribut interval tunaknya. Hanya delay yang sama dengan interval itu yang
+# digeser; retry, back-off dan sisa blokir dikembalikan apa adanya. Refresh tidak digeser: jadwalnya mengikuti exp JWT
+SHAPED_ACTIONS = {
+    "activation": "activation_check_interval_seconds",
+    "initiate": "initiate_msg_interval_seconds",
+    "ping": "ping_interval_seconds",
+    "wallet": "wallet_wakeup_seconds",
+}
+
+
+class LoadShaper:
+    # Penyebaran fase (--shape): tiap (akun, aksi) mendapat offset fase deterministik dari hash alamat,
+    # dan jadwal berikutnya dibulatkan ke slot grid waktu dinding dengan periode = interval aksi itu.
+    # Jarak antar slot tetap satu interval, jadi laju per akun tidak berubah; yang hilang hanya
+    # keselarasan antar akun yang start bersamaan (restart, --start-rate 0, burst).
+    def __init__(self, min_period: float = 5.0) -> None:
+        self.min_period = min_period # Delay lebih pendek (retry cepat) tidak digeser
+
+    @staticmethod
+    def phase(address: str, action: str) -> float:
+        return zlib.crc32(f"{address}:{action}".encode()) / 4294967296.0
+
+    def initial_delay(self, address: str, period: float) -> float:
+        return self.phase(address, "start") * period
+
+    def align(self, address: str, action: str, delay: float, now: float) -> float:
+        if delay < self.min_period:
+            return delay
+        offset = self.phase(address, action) * delay
+        # Slot pertama setelah now + delay/2: di keadaan tunak jatuh tepat satu interval kemudian
+        slot = offset + delay * math.ceil((now + 0.5 * delay - offset) / delay)
+        return slot - now
+
+
+class RequestRateCurve:
+    # Jumlah request yang dimulai per detik (jendela bergulir) dengan EWMA dan puncak in-flight,
+    # untuk melihat apakah beban datang rata atau berdenyut
+    def __init__(self, window_seconds: int = 3600, half_life_seconds: float = 10.0) -> None:
+        self.half_life_seconds = half_life_seconds
+        self.smoothed = 0.0
+        self.peak_in_flight = 0
+        self._counts: deque = deque(maxlen=window_seconds) # (detik, jumlah), hanya detik yang ada request
+        self._second: Optional[int] = None
+        self._current = 0
+
+    def record(self, now: float, in_flight: int) -> None:
+        second = int(now)
+        if second != self._second:
+            self._roll(second)
+        self._current += 1
+        if in_flight > self.peak_in_flight:
+            self.peak_in_flight = in_flight
+
+    def _roll(self, second: int) -> None:
+        if self._second is not None:
+            self._counts.append((self._second, self._current))
+            decay = 0.5 ** (1.0 / self.half_life_seconds)
+            self.smoothed = (self.smoothed * decay + self._current * (1 - decay)) * decay ** max(0, second - self._second - 1)
+        self._second, self._current = second, 0
+
+    def per_second(self, now: float, span: int) -> List[int]:
+        # Deret jumlah per detik untuk [now - span, now), detik tanpa request diisi 0
+        end = int(now)
+        if self._second is not None and self._second < end:
+            self._roll(end)
+        start = end - span
+        series = [0] * span
+        for second, count in reversed(self._counts):
+            if second < start:
+                break
+            if second < end:
+                series[second - start] = count
+        return series
+
+    def summary(self, now: float, span: int, columns: int = 60) -> Dict[str, Any]:
+        series = self.per_second(now, span)
+        ordered = sorted(series)
+        mean = sum(series) / span if span else 0.0
+        stdev = math.sqrt(sum((count - mean) ** 2 for count in series) / span) if span else 0.0
+        width = max(1, math.ceil(span / columns))
+        curve = [sum(series[i:i + width]) / len(series[i:i + width]) for i in range(0, span, width)]
+        return {
+            "avg": mean, "smoothed": self.smoothed, "peak": ordered[-1] if ordered else 0,
+            "p99": ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))] if ordered else 0,
+            "cv": stdev / mean if mean else 0.0, "peak_in_flight": self.peak_in_flight,
+            "bucket_seconds": width, "curve": curve,
+        }
+
+
+class ActionScheduler:
+    # Satu heap berisi tenggat berikutnya per (akun, aksi). Dispatcher hanya bangun saat ada
+    # aksi yang jatuh tempo, lalu menyerahkannya ke pool worker yang jumlahnya dibatasi.
+    def __init__(self, handler: Callable[[int, str], Awaitable[Optional[float]]], workers: int = 200,
+                 error_retry_delay: float = 60) -> None:
+        self.handler = handler
+        self.workers = workers
+        self.error_retry_delay = error_retry_delay
+        self.on_error: Optional[Callable[[int, str, BaseException], None]] = None
+        self.on_dispatch: Optional[Callable[[int, str, float], None]] = None # (key, aksi, lag detik)
+        self.shape_delay: Optional[Callable[[int, str, float], float]] = None # (key, aksi, delay) -> delay yang digeser; tidak untuk error_retry_delay
+        self._heap: List[Tuple[float, int, int, str, int]] = []
+        self._seq: int = 0
+        # Generasi per key; entri heap dari generasi lama (akun sudah dibatalkan) diabaikan
+        self._generations: Dict[int, int] = {}
+        self._wakeup = asyncio.Event()
+        self._queue: asyncio.Queue = asyncio.Queue()
+        # Akun yang sedang punya aksi berjalan -> aksi jatuh tempo yang menunggu giliran.
+        # Aksi satu akun selalu dijalankan berurutan, sama seperti loop per akun sebelumnya.
+        self._busy: Dict[int, List[Tuple[str, int]]] = {}
+        self.draining = False
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def schedule(self, key: int, action: str, delay: float) -> None:
+        due = asyncio.get_event_loop().time() + max(0.0, delay)
+        self._seq += 1
+        heapq.heappush(self._heap, (due, self._seq, key, action, self._generations.get(key, 0)))
+        if self._heap[0][1] == self._seq:
+            self._wakeup.set() # Tenggat baru lebih awal dari yang ditunggu dispatcher
+
+    def cancel_account(self, key: int) -> None:
+        # Semua aksi terjadwal untuk key ini gugur; aksi yang sedang berjalan selesai tanpa dijadwalkan ulang
+        self._generations[key] = self._generations.get(key, 0) + 1
+        pending = self._busy.get(key)
+        if pending:
+            pending.clear()
+
+    def _dispatch(self, key: int, action: str, generation: int) -> None:
+        if self.draining:
+            return
+        pending = self._busy.get(key)
+        if pending is not None:
+            pending.append((action, generation))
+            return
+        self._busy[key] = []
+        self._queue.put_nowait((key, action, generation))
+
+    async def _worker(self):
+        while True:
+            key, action, generation = await self._queue.get()
+            if self.draining: # Sudah antre tapi belum mulai: tidak dijalankan lagi
+                self._busy.pop(key, None)
+                continue
+            failed = False
+            try:
+                next_delay = await self.handler(key, action)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if self.on_error:
+                    self.on_error(key, action, e)
+                next_delay = self.error_retry_delay
+                failed = True
+            if next_delay is not None and generation == self._generations.get(key, 0) and not self.draining:
+                if self.shape_delay and not failed:
+                    next_delay = self.shape_delay(key, action, next_delay)
+                self.schedule(key, action, next_delay)
+            pending = self._busy.get(key)
+            if pending and not self.draining:
+                next_action, next_generation = pending.pop(0)
+                self._queue.put_nowait((key, next_action, next_generation))
+            else:
+                self._busy.pop(key, None)
+
+    async def drain(self, timeout: float) -> int:
+        # Berhenti menjadwalkan, lalu tunggu aksi yang sedang berjalan selesai sampai batas waktu.
+        # Mengembalikan jumlah akun yang aksinya masih berjalan saat batas waktu habis.
+        self.draining = True
+        self._heap.clear()
+        for pending in self._busy.values():
+            pending.clear()
+        self._wakeup.set()
+        deadline = asyncio.get_running_loop().time() + timeout
+        while self._busy and asyncio.get_running_loop().time() < deadline:
+            await asyncio.sleep(0.1)
+        return len(self._busy)
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        workers = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        try:
+            while True:
+                self._wakeup.clear()
+                if not self._heap:
+                    await self._wakeup.wait()
+                    continue
+                delay = self._heap[0][0] - loop.time()
+                if delay > 0:
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                due, _, key, action, generation = heapq.heappop(self._heap)
+                if generation != self._generations.get(key, 0):
+                    continue
+                if self.on_dispatch:
+                    self.on_dispatch(key, action, loop.time() - due)
+                self._dispatch(key, action, generation)
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+
+class ConsistentHashRing:
+    # Pembagian akun ke worker berdasarkan hash alamat; node virtual membuat sebaran merata
+    # dan menambah/mengurangi worker hanya memindahkan sebagian kecil akun.
+    def __init__(self, node_count: int, virtual_nodes: int = 160) -> None:
+        self.node_count = node_count
+        points = []
+        for node in range(node_count):
+            for replica in range(virtual_nodes):
+                points.append((self._hash(f"worker-{node}#{replica}"), node))
+        points.sort()
+        self._hashes = [point for point, _ in points]
+        self._nodes = [node for _, node in points]
+
+    @staticmethod
+    def _hash(value: str) -> int:
+        return int.from_bytes(hashlib.md5(value.encode()).digest()[:8], "big")
+
+    def node_for(self, address: str) -> int:
+        index = bisect.bisect(self._hashes, self._hash(address.lower()))
+        return self._nodes[index % len(self._nodes)]
+
+
+class AccountState:
+    # Seluruh state satu akun dalam satu objek ber-__slots__: tanpa __dict__ per instance,
+    # jadi ukuran per akun kecil dan tetap walau jumlah akun ratusan ribu.
+    __slots__ = (
+        "account_id", "address", "masked", "device_hash",
+        "access_token", "refresh_token", "token_expiry", "proxy",
+        "session_state", "session_confirmed_at", "activation_blocked_until",
+        "earnings_ts", "earnings_total", "earnings_rate", "wallet_interval", "wallet_next_poll_at",
+        "started_at", "last_action_at", "actions_run", "action_errors",
+        "token_issued_at", "last_ok_at", "failures", "last_error", "whitelisted_at", "wallet_polled_at",
+    )
+
+    def __init__(self, account_id: int, address: str, masked: str, device_hash: int) -> None:
+        self.account_id = account_id
+        self.address = address
+        self.masked = masked
+        self.device_hash = device_hash
+        self.access_token: Optional[str] = None
+        self.refresh_token: Optional[str] = None
+        self.token_expiry: Optional[float] = None # Klaim exp JWT (epoch)
+        self.proxy: Optional[str] = None
+        self.session_state = SESSION_UNKNOWN
+        self.session_confirmed_at: Optional[float] = None # monotonic
+        self.activation_blocked_until = 0.0 # loop.time(); ping/initiate ditunda sampai waktu ini
+        self.earnings_ts: Optional[float] = None # monotonic saat sampel totalEarnings terakhir
+        self.earnings_total: Optional[float] = None
+        self.earnings_rate: Optional[float] = None # PTS per detik (EWMA)
+        self.wallet_interval: Optional[float] = None # None = interval dasar
+        self.wallet_next_poll_at: Optional[float] = None # monotonic
+        self.started_at = time.time()
+        self.last_action_at: Optional[float] = None
+        self.actions_run = 0
+        self.action_errors = 0
+        self.token_issued_at: Optional[float] = None
+        self.last_ok_at: Optional[float] = None # Ping/initiate sukses terakhir (epoch)
+        self.failures = 0 # Kegagalan ping/initiate/aktivasi berturut-turut
+        self.last_error: Optional[str] = None
+        self.whitelisted_at: Optional[float] = None # Epoch addWhitelist terakhir sukses (dari ledger setup)
+        self.wallet_polled_at: Optional[float] = None # monotonic saat wallet-details terakhir dikirim di proses ini
+
+    def snapshot(self) -> Dict[str, Any]:
+        # Untuk dashboard/checkpoint; token tidak ikut dikeluarkan
+        data = {slot: getattr(self, slot) for slot in self.__slots__ if slot not in ("access_token", "refresh_token")}
+        data["has_access_token"] = self.access_token is not None
+        data["has_refresh_token"] = self.refresh_token is not None
+        return data
+
+
+class AccountTable:
+    # Tabel akun berindeks id integer (posisi di list) dengan indeks alamat -> id. Id tidak dipakai
+    # ulang, supaya aksi yang masih berjalan untuk akun yang sudah dihapus tidak mengenai akun lain.
     def __init__(self) -> None:
+        self._rows: List[Optional[AccountState]] = []
+        self._ids: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __contains__(self, address: str) -> bool:
+        return address in self._ids
+
+    def __iter__(self) -> Iterator[AccountState]:
+        return (self._rows[account_id] for account_id in self._ids.values())
+
+    def add(self, address: str, masked: str, device_hash: int) -> AccountState:
+        self.remove(address) # Alamat ganda di file akun: baris terakhir yang dipakai
+        account = AccountState(len(self._rows), address, masked, device_hash)
+        self._rows.append(account)
+        self._ids[address] = account.account_id
+        return account
+
+    def remove(self, address: str) -> Optional[AccountState]:
+        account_id = self._ids.pop(address, None)
+        if account_id is None:
+            return None
+        account, self._rows[account_id] = self._rows[account_id], None
+        return account
+
+    def get(self, address: str) -> Optional[AccountState]:
+        account_id = self._ids.get(address)
+        return self._rows[account_id] if account_id is not None else None
+
+    def by_id(self, account_id: int) -> Optional[AccountState]:
+        return self._rows[account_id] if 0 <= account_id < len(self._rows) else None
+
+    def count(self, predicate: Callable[[AccountState], bool]) -> int:
+        return sum(1 for account in self if predicate(account))
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        return [account.snapshot() for account in self]
+
+
+class LiveStatusView:
+    # Mode --live: satu tabel ringkas digambar ulang tiap interval, menggantikan baris log sukses per
+    # akun. Di terminal (TTY) layar ditulis ulang di tempat dan kejadian terakhir (transisi dan error)
+    # tampil di bawah tabel; tanpa TTY tabel dicetak sebagai blok dan kejadian tetap baris log biasa.
+    CLEAR_SCREEN = "\x1b[H\x1b[2J"
+
+    def __init__(self, interval: float = 5.0, redraw: Optional[bool] = None, max_events: int = 12) -> None:
+        self.interval = interval
+        self.redraw = sys.stdout.isatty() if redraw is None else redraw
+        self.events: deque = deque(maxlen=max_events)
+        self.suppressed = 0 # Baris log per akun yang tidak ditulis
+        self.started_at = time.time()
+        self._last_counts: Dict[str, Tuple[float, float]] = {}
+        self._last_render_at = time.monotonic()
+
+    def record_event(self, level: str, message: str) -> None:
+        color = LEVEL_COLOR_MAP.get(level, C_INFO)
+        self.events.append(f"{datetime.fromtimestamp(time.time(), wib).strftime('%H:%M:%S')} {color}[{level.ljust(5)}] {message}{Style.RESET_ALL}")
+
+    def _endpoint_rates(self, requests: "MetricCounter", elapsed: float) -> List[Tuple[str, float, float]]:
+        counts: Dict[str, List[float]] = {}
+        for (endpoint, _, status), value in requests.values.items():
+            entry = counts.setdefault(endpoint, [0.0, 0.0])
+            entry[0 if status[:1] in ("2", "3") else 1] += value
+        rates = []
+        for endpoint, (ok, failed) in sorted(counts.items()):
+            last_ok, last_failed = self._last_counts.get(endpoint, (0.0, 0.0))
+            rates.append((endpoint, (ok - last_ok) / elapsed, (failed - last_failed) / elapsed))
+            self._last_counts[endpoint] = (ok, failed)
+        return rates
+
+    def render(self, accounts: "AccountTable", requests: "MetricCounter", pings_in_flight: int) -> List[str]:
+        now = time.time()
+        now_mono = time.monotonic()
+        elapsed = max(1e-6, now_mono - self._last_render_at)
+        self._last_render_at = now_mono
+        healthy = failing = starting = 0
+        sessions: Counter = Counter()
+        token_ages: List[float] = []
+        without_token = 0
+        total_earnings = 0.0
+        earnings_rate = 0.0
+        last_earnings_ts: Optional[float] = None
+        worst: List[AccountState] = []
+        for account in accounts:
+            if account.failures:
+                failing += 1
+                worst.append(account)
+            elif account.last_ok_at is not None:
+                healthy += 1
+            else:
+                starting += 1
+            sessions[account.session_state] += 1
+            if account.access_token is None:
+                without_token += 1
+            elif account.token_issued_at is not None:
+                token_ages.append(now - account.token_issued_at)
+            if account.earnings_total is not None:
+                total_earnings += account.earnings_total
+                if account.earnings_rate is not None:
+                    earnings_rate += account.earnings_rate
+                if account.earnings_ts is not None and (last_earnings_ts is None or account.earnings_ts > last_earnings_ts):
+                    last_earnings_ts = account.earnings_ts
+        token_ages.sort()
+
+        def minutes(seconds: float) -> str:
+            return f"{seconds / 60:.0f}m"
+
+        timestamp = datetime.fromtimestamp(now, wib).strftime('%Y-%m-%d %H:%M:%S %Z')
+        uptime = int(now - self.started_at)
+        lines = [
+            f"{Style.BRIGHT}{C_BANNER}Naoris Live{Style.RESET_ALL} | {timestamp} | uptime {uptime // 3600:02d}:{uptime % 3600 // 60:02d}:{uptime % 60:02d} | akun {len(accounts)}",
+            f"Akun      : {C_SUCCESS}sehat {healthy}{Style.RESET_ALL} | ping berjalan {pings_in_flight} | "
+            f"{C_ERROR if failing else C_TEXT}gagal {failing}{Style.RESET_ALL} | belum siap {starting}",
+            f"Sesi      : aktif {sessions[SESSION_ACTIVE]} | hilang {sessions[SESSION_LOST]} | belum diketahui {sessions[SESSION_UNKNOWN]}",
+            f"Token     : umur p50 {minutes(token_ages[len(token_ages) // 2]) if token_ages else '-'} | "
+            f"maks {minutes(token_ages[-1]) if token_ages else '-'} | tanpa token {without_token}",
+            f"Pendapatan: total {total_earnings:,.2f} PTS | laju {earnings_rate * 3600:,.2f} PTS/jam | update terakhir "
+            f"{minutes(now_mono - last_earnings_ts) + ' lalu' if last_earnings_ts is not None else '-'}",
+            f"{Style.BRIGHT}{'Endpoint':<16}{'ok/s':>10}{'gagal/s':>10}{Style.RESET_ALL}",
+        ]
+        for endpoint, ok_rate, failed_rate in self._endpoint_rates(requests, elapsed):
+            lines.append(f"{endpoint:<16}{ok_rate:>10.2f}{(C_ERROR if failed_rate else '') + f'{failed_rate:>10.2f}' + Style.RESET_ALL}")
+        if worst:
+            worst.sort(key=lambda account: -account.failures)
+            lines.append(f"{Style.BRIGHT}Akun gagal terbanyak:{Style.RESET_ALL}")
+            for account in worst[:5]:
+                lines.append(f"  {account.masked}  gagal {account.failures}x berturut-turut: {account.last_error or '-'}")
+        lines.append(f"Baris log sukses yang ditahan: {self.suppressed}")
+        if self.redraw and self.events:
+            lines.append(f"{Style.BRIGHT}Kejadian terakhir:{Style.RESET_ALL}")
+            lines.extend(f"  {event}" for event in self.events)
+        return lines
+
+
+class NaorisProtocolAutomation:
+    def __init__(self, max_concurrency: int = 200, scheduler_workers: int = 200, state_db_file: Optional[str] = "naoris_state.db",
+                 log_level: str = "DEBUG", log_json_file: Optional[str] = None, metrics_port: Optional[int] = None,
+                 start_rate: float = 1.0, start_burst: float = 1.0, shard: Optional[Tuple[int, int]] = None,
+                 worker: Optional[Tuple[int, int]] = None, watch_accounts_interval: Optional[float] = None,
+                 user_agent_file: Optional[str] = "naoris_user_agent.txt") -> None:
+        self.logger = LogPipeline(min_level=log_level, json_path=log_json_file)
+        user_agent, self.user_agent_source = load_user_agent(user_agent_file)
         self.headers = {
             "Accept": "application/json, text/plain, */*",
             "Accept-Language": "id-ID,id;q=0.9,en-US;q=0.8,en;q=0.7",
@@ -35,21 +1782,158 @@ class NaorisProtocolAutomation:
             "Sec-Fetch-Dest": "empty",
             "Sec-Fetch-Mode": "cors",
             "Sec-Fetch-Site": "none",
-            "User-Agent": FakeUserAgent().random
+            "User-Agent": user_agent
         }
         self.base_api_url = "https://naorisprotocol.network"
         self.ping_api_url = "https://beat.naorisprotocol.network"
 
         self.proxies: List[str] = []
-        self.proxy_index: int = 0
-        self.account_proxies: Dict[str, Optional[str]] = {}
-        self.access_tokens: Dict[str, str] = {}
-        self.refresh_tokens: Dict[str, str] = {}
+        self.routes: Optional[RouteManager] = None
+        # State per akun (token, rute, sesi, polling wallet, counter) dalam satu tabel berindeks id
+        self.accounts = AccountTable()
+        # Renewal token per akun (generate/refresh) hanya berjalan satu kali pada satu waktu
+        self.token_renewal = SingleFlight()
 
         self.accounts_file = "accounts.json"
-        self.proxy_file = "proxies.txt"
-
-    def display_banner(self):
+        self.proxy_file = PROXY_FILE
+
+        # Batas jumlah request yang berjalan bersamaan di seluruh akun
+        self.http = HttpEngine(max_concurrency=max_concurrency)
+
+        # Kebijakan retry bersama untuk semua endpoint + circuit breaker per host
+        self.retry_policy = RetryPolicy()
+        self.retry_budget = RetryBudget()
+        self.circuit_breakers: Dict[str, CircuitBreaker] = {}
+        self._url_hosts: Dict[str, str] = {}
+
+        # state_db_file=None -> token tidak disimpan ke disk. Semua store berbagi satu koneksi SQLite.
+        self.state_db: Optional[StateDatabase] = StateDatabase(state_db_file) if state_db_file else None
+        self.token_store: Optional[TokenStore] = TokenStore(self.state_db) if self.state_db else None
+        self.earnings_store: Optional[EarningsStore] = EarningsStore(self.state_db) if self.state_db else None
+        self.checkpoint_store: Optional[CheckpointStore] = CheckpointStore(self.state_db) if self.state_db else None
+        self._checkpoint: Dict[str, Tuple[Optional[float], ...]] = {}
+        # Ledger setup: addWhitelist tidak diulang tiap start selama entri lebih muda dari TTL
+        self.setup_ledger: Optional[SetupLedger] = SetupLedger(self.state_db) if self.state_db else None
+        self._setup_done: Dict[Tuple[str, int], float] = {}
+        self.setup_ttl_seconds = 7 * 24 * 60 * 60
+        self.whitelist_calls: int = 0
+        self.whitelist_skipped: int = 0
+        # Shutdown bertahap (SIGTERM/SIGINT): berhenti menjadwalkan, tunggu aksi berjalan, kirim switch OFF, checkpoint
+        self.shutdown_event: Optional[asyncio.Event] = None
+        self.drain_timeout_seconds = 30.0
+        self.shutdown_concurrency = 20
+        self.shutdown_off_timeout_seconds = 30.0
+        # Polling wallet-details adaptif (state per akun ada di AccountState)
+        self.wallet_polls: int = 0
+        self.wallet_polls_skipped: int = 0
+
+        self.use_proxy_flag: bool = False
+        # State sesi perangkat per akun diisi dari respons switch, ping dan htb-event
+        self.switch_calls: int = 0
+        self.toggles_performed: int = 0
+        self.toggles_skipped: int = 0
+
+        # Interval aksi per akun (detik)
+        self.ping_interval_seconds = 60
+        self.initiate_msg_interval_seconds = 10 * 60
+        self.activation_check_interval_seconds = 5 * 60
+        self.refresh_initial_delay_seconds = 25 * 60
+        self.refresh_interval_seconds = 30 * 60 # Dipakai jika token tidak punya klaim exp
+        self.refresh_margin_seconds = 5 * 60 # Refresh sekian detik sebelum JWT kedaluwarsa
+        self.refresh_min_delay_seconds = 60
+        self.wallet_initial_delay_seconds = 60
+        self.wallet_interval_seconds = 15 * 60
+        self.wallet_max_interval_seconds = 4 * 60 * 60 # Batas back-off untuk akun yang pendapatannya bisa ditebak
+        self.wallet_wakeup_seconds = 5 * 60 # Aksi wallet bangun sesering ini untuk cek jadwal poll (tanpa request)
+        self.wallet_after_ping_failure_seconds = 60
+        self.wallet_stable_tolerance = 0.1 # Selisih relatif maks kenaikan teramati vs tebakan agar dianggap stabil
+        self.token_retry_delay_seconds = 60
+        self.cycle_retry_seconds = 30
+        self.session_evidence_max_age_seconds = 5 * 60 # Bukti sesi aktif lebih tua dari ini -> toggle ulang
+        # Laju start akun: token bucket (akun per detik, burst); rate 0 = tanpa jeda
+        self.start_ramp = TokenBucket(rate=start_rate, burst=start_burst)
+        self.shard: Optional[Tuple[int, int]] = shard # (indeks, jumlah) untuk membagi file akun antar proses
+        # Mode worker (supervisor): akun dibagi lewat consistent hashing pada alamat
+        self.worker_index: Optional[int] = worker[0] if worker else None
+        self.worker_ring: Optional[ConsistentHashRing] = ConsistentHashRing(worker[1]) if worker else None
+        self._stored_tokens: Dict[str, Tuple[str, str, Optional[float]]] = {}
+        # Hot reload file akun: cek mtime/ukuran tiap N detik (None = nonaktif)
+        self.watch_accounts_interval: Optional[float] = watch_accounts_interval
+        self._accounts_file_signature: Optional[Tuple[int, int]] = None
+
+        self.account_actions: Dict[str, Callable[[AccountState], Awaitable[Optional[float]]]] = {
+            "setup": self.setup_account_action,
+            "whitelist": self.whitelist_action,
+            "activation": self.activation_action,
+            "initiate": self.initiate_action,
+            "ping": self.ping_action,
+            "refresh": self.refresh_token_action,
+            "wallet": self.wallet_details_action,
+        }
+        self.scheduler = ActionScheduler(self.run_account_action, workers=scheduler_workers)
+        self.scheduler.on_error = self._on_action_error
+        self.scheduler.shape_delay = self._shape_delay
+
+        # Profiling runtime: aktif sejak start dengan --profile, atau dinyalakan/dimatikan lewat SIGUSR1 (SIGUSR2 = dump)
+        self.profiler = RuntimeProfiler()
+        self.profile_on_start = False
+        self.profile_report_interval_seconds = 30.0
+        self._profile_report_task: Optional[asyncio.Task] = None
+
+        # Tampilan status --live (None = log per event seperti biasa)
+        self.live_status: Optional[LiveStatusView] = None
+        self.pings_in_flight = 0
+
+        # Pembentukan beban --shape: fase per akun, batas laju per host, kurva req/s
+        self.load_shaper: Optional[LoadShaper] = None
+        self.host_rps = 0.0 # 0 = tanpa batas
+        self.host_burst = 1.0
+        self.host_limiters: Dict[str, TokenBucket] = {}
+        self.host_rate_limited: int = 0
+        self.rate_curve = RequestRateCurve()
+        self.rps_report_interval_seconds: Optional[float] = None
+
+        # Watchdog memori --memory-watchdog (None = nonaktif); restart_requested dibaca entry point setelah shutdown
+        self.memory_watchdog: Optional[MemoryWatchdog] = None
+        self.restart_requested = False
+
+        # Endpoint metrik Prometheus di 127.0.0.1:<metrics_port> (None = nonaktif)
+        self.metrics_port = metrics_port
+        self.metrics = BotMetrics()
+        self.scheduler.on_dispatch = self._on_action_dispatch
+        self.metrics.add_gauge("naoris_log_queue_depth", "Baris log yang menunggu ditulis thread penulis", lambda: self.logger.queue_depth)
+        if EXECUTOR_QUEUE_INTROSPECTABLE:
+            self.metrics.add_gauge("naoris_executor_queue_depth", "Pekerjaan yang menunggu di default executor (to_thread)",
+                                   lambda: executor_queue_depth(asyncio.get_event_loop()))
+        self.metrics.add_gauge("naoris_http_sessions", "Jumlah AsyncSession aktif (satu per rute egress)", lambda: len(self.http.sessions))
+        self.metrics.add_gauge("naoris_http_in_flight", "Request HTTP yang sedang berjalan", lambda: self.http.in_flight)
+        self.metrics.add_gauge("naoris_scheduler_pending", "Aksi terjadwal di heap scheduler", lambda: len(self.scheduler))
+        self.metrics.add_gauge("naoris_scheduler_busy_accounts", "Akun yang sedang menjalankan aksi", lambda: len(self.scheduler._busy))
+        self.metrics.add_gauge("naoris_accounts", "Akun yang sedang berjalan", lambda: len(self.accounts))
+        self.metrics.add_gauge("naoris_accounts_with_token", "Akun yang memiliki access token", lambda: self.accounts.count(lambda account: account.access_token is not None))
+        self.metrics.add_counter("naoris_token_renewals_executed_total", "Renewal token yang benar-benar dijalankan", lambda: self.token_renewal.executed)
+        self.metrics.add_gauge("naoris_retry_budget_balance", "Saldo retry budget global", lambda: self.retry_budget.balance)
+        self.metrics.add_counter("naoris_retry_budget_exhausted_total", "Retry yang dibatalkan karena budget habis", lambda: self.retry_budget.exhausted)
+        self.metrics.add_gauge("naoris_circuit_breakers_open", "Jumlah host dengan circuit breaker tidak tertutup",
+                               lambda: sum(1 for breaker in self.circuit_breakers.values() if breaker.state != CircuitBreaker.CLOSED))
+        self.metrics.add_counter("naoris_circuit_short_circuited_total", "Request yang ditolak breaker tanpa menyentuh jaringan",
+                               lambda: sum(breaker.short_circuited for breaker in self.circuit_breakers.values()))
+        self.metrics.add_counter("naoris_switch_calls_total", "Panggilan /sec-api/api/switch dari pengecekan aktivasi", lambda: self.switch_calls)
+        self.metrics.add_counter("naoris_activation_toggles_skipped_total", "Pengecekan aktivasi yang dilewati karena sesi terbukti aktif", lambda: self.toggles_skipped)
+        self.metrics.add_gauge("naoris_sessions_active", "Akun dengan sesi perangkat aktif", lambda: self.accounts.count(lambda account: account.session_state == SESSION_ACTIVE))
+        self.metrics.add_gauge("naoris_routes_total", "Jumlah rute egress (proxy)", lambda: len(self.routes) if self.routes else 0)
+        self.metrics.add_gauge("naoris_routes_quarantined", "Rute egress yang sedang dikarantina", lambda: self.routes.quarantined if self.routes else 0)
+        self.metrics.add_counter("naoris_route_reassignments_total", "Akun yang dipindah karena rutenya dikarantina", lambda: self.routes.reassignments if self.routes else 0)
+        self.metrics.add_counter("naoris_wallet_polls_total", "Request wallet-details yang dikirim", lambda: self.wallet_polls)
+        self.metrics.add_counter("naoris_wallet_polls_skipped_total", "Poll wallet-details yang dilewati back-off polling adaptif (dibanding interval dasar)", lambda: self.wallet_polls_skipped)
+        self.metrics.add_gauge("naoris_request_rate_smoothed", "Laju request yang dimulai (EWMA, req/detik)", lambda: self.rate_curve.smoothed)
+        self.metrics.add_counter("naoris_host_rate_limited_total", "Request yang menunggu batas laju per host (--host-rps)", lambda: self.host_rate_limited)
+        self.metrics.add_counter("naoris_whitelist_calls_total", "Request addWhitelist yang dikirim", lambda: self.whitelist_calls)
+        self.metrics.add_counter("naoris_whitelist_skipped_total", "addWhitelist yang dilewati karena tercatat di ledger setup", lambda: self.whitelist_skipped)
+        self.metrics.add_counter("naoris_token_renewals_saved_total", "Renewal token redundan yang digabung (single-flight)", lambda: self.token_renewal.saved)
+
+    @staticmethod
+    def display_banner():
         banner_lines = [
             "+------------------------------------------------------------+",
             "|                                                            |",
@@ -66,70 +1950,149 @@ class NaorisProtocolAutomation:
         os.system('cls' if os.name == 'nt' else 'clear')
 
     def log(self, message: str, level: str = "INFO", account_context: Optional[str] = None):
-        timestamp = datetime.now(wib).strftime('%Y-%m-%d %H:%M:%S %Z')
-        
-        level_color_map = {
-            "SUCCESS": C_SUCCESS, "INFO": C_INFO, "WARNING": C_WARNING,
-            "ERROR": C_ERROR, "DEBUG": C_DEBUG, "INPUT": C_INPUT
-        }
-        log_color = level_color_map.get(level.upper(), C_INFO)
-        
-        level_str = level.upper().ljust(5)
-
-        print(f"{C_TEXT}[{timestamp}]{Style.RESET_ALL} {log_color}[{level_str}]{Style.RESET_ALL} {log_color}{message}{Style.RESET_ALL}", flush=True)
+        if self.live_status and self.live_status.redraw and self.logger.enabled(level.upper()):
+            self.live_status.record_event(level.upper(), f"{account_context}: {message}" if account_context else message)
+        self.logger.emit(level, message, account=account_context)
 
     def log_account_specific(self, masked_address: str, message: str, level: str = "INFO", proxy_info: Optional[str] = None, status_msg: Optional[str] = None):
-        timestamp = datetime.now(wib).strftime('%Y-%m-%d %H:%M:%S %Z')
-        level_color_map = {
-            "SUCCESS": C_SUCCESS, "INFO": C_INFO, "WARNING": C_WARNING,
-            "ERROR": C_ERROR, "DEBUG": C_DEBUG
-        }
-        log_color = level_color_map.get(level.upper(), C_INFO)
-        level_str = level.upper().ljust(5)
+        if not self.logger.enabled(level.upper()): # Filter level sebelum string apa pun dibentuk
+            self.logger.dropped_by_level += 1
+            return
+        if self.live_status and LOG_LEVELS.get(level.upper(), 20) < LOG_LEVELS["WARNING"]:
+            self.live_status.suppressed += 1 # Sukses/info per akun sudah terangkum di tabel --live
+            return
 
         full_message = message
         if proxy_info and status_msg:
             full_message = f"Proxy: {proxy_info} | Status: {status_msg}"
         elif status_msg:
              full_message = f"Status: {status_msg}"
-        
-        print(f"{C_TEXT}[{timestamp}]{Style.RESET_ALL} {log_color}[{level_str}]{Style.RESET_ALL} {log_color}{full_message}{Style.RESET_ALL}", flush=True)
+
+        if self.live_status and self.live_status.redraw:
+            self.live_status.record_event(level.upper(), f"{masked_address}: {full_message}")
+        self.logger.emit(level, full_message, account=masked_address, proxy=proxy_info)
 
 
     def generate_device_hash(self) -> str:
         return str(int(uuid.uuid4().hex.replace("-", "")[:10], 16))
 
-    def load_accounts_from_file(self) -> List[Dict[str, Any]]:
+    def _account_in_shard(self, address: str) -> bool:
+        if self.shard is not None:
+            shard_index, shard_count = self.shard
+            if zlib.crc32(address.lower().encode()) % shard_count != shard_index:
+                return False
+        if self.worker_ring is not None and self.worker_ring.node_for(address) != self.worker_index:
+            return False
+        return True
+
+    def _iter_raw_accounts(self, file, chunk_size: int = 64 * 1024) -> Iterator[Any]:
+        # JSON array dibaca bertahap dengan raw_decode; selain itu dianggap JSON Lines
+        decoder = json.JSONDecoder()
+        buffer = file.read(chunk_size)
+        eof = not buffer
+        index = 0
+        while True:
+            while index < len(buffer) and buffer[index].isspace():
+                index += 1
+            if index < len(buffer) or eof:
+                break
+            buffer, index = file.read(chunk_size), 0
+            eof = not buffer
+        if index >= len(buffer):
+            return
+
+        if buffer[index] != "[":
+            for line in itertools.chain(io.StringIO(buffer[index:]), file):
+                # Baris terakhir chunk pertama bisa terpotong; gabungkan dengan sisa baris dari file
+                if not line.endswith("\n"):
+                    line += file.readline()
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+            return
+
+        index += 1
+        while True:
+            while index < len(buffer) and (buffer[index].isspace() or buffer[index] == ","):
+                index += 1
+            if index >= len(buffer):
+                if eof:
+                    raise json.JSONDecodeError("Array JSON tidak ditutup", buffer, index)
+                buffer, index = file.read(chunk_size), 0
+                eof = not buffer
+                continue
+            if buffer[index] == "]":
+                return
+            try:
+                item, end = decoder.raw_decode(buffer, index)
+                if end >= len(buffer) and not eof:
+                    raise json.JSONDecodeError("Elemen mungkin terpotong", buffer, end)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                more = file.read(chunk_size)
+                eof = not more
+                buffer, index = buffer[index:] + more, 0
+                continue
+            yield item
+            index = end
+            if index > chunk_size: # Buang bagian yang sudah diproses agar buffer tetap kecil
+                buffer, index = buffer[index:], 0
+
+    def iter_accounts_from_file(self, strict: bool = False) -> Iterator[Dict[str, Any]]:
+        # strict (hot reload): error baca/dekode diteruskan ke pemanggil dan signature file baru dicatat
+        # setelah seluruh file terbaca, supaya file yang sedang disimpan tidak menghentikan akun yang berjalan
+        if not os.path.exists(self.accounts_file):
+            if strict:
+                raise FileNotFoundError(f"File akun '{self.accounts_file}' tidak ditemukan")
+            self.log(f"File akun '{self.accounts_file}' tidak ditemukan.", level="ERROR")
+            return
+        valid_count = 0
+        signature = self._file_signature(self.accounts_file)
         try:
-            if not os.path.exists(self.accounts_file):
-                self.log(f"File akun '{self.accounts_file}' tidak ditemukan.", level="ERROR")
-                return []
+            if not strict:
+                self._accounts_file_signature = signature
             with open(self.accounts_file, 'r') as file:
-                accounts_data = json.load(file)
-            if not isinstance(accounts_data, list):
-                self.log(f"Format data di '{self.accounts_file}' tidak valid. Harusnya list.", level="ERROR")
-                return []
-            
-            valid_accounts = []
-            for acc_idx, acc in enumerate(accounts_data):
-                if isinstance(acc, dict) and "Address" in acc and "deviceHash" in acc:
-                    try:
-                        acc["deviceHash"] = int(str(acc["deviceHash"]))
-                        valid_accounts.append(acc)
-                    except ValueError:
-                        self.log(f"Akun ke-{acc_idx+1} memiliki deviceHash tidak valid (harus integer): {C_WARNING}{acc.get('deviceHash')}{C_ERROR}", level="ERROR")
-                else:
-                    self.log(f"Akun ke-{acc_idx+1} di '{self.accounts_file}' tidak memiliki format yang benar (membutuhkan 'Address' dan 'deviceHash').", level="WARNING")
-            
-            if valid_accounts:
-                self.log(f"Berhasil memuat {len(valid_accounts)} akun valid dari '{self.accounts_file}'.", level="INFO")
-            return valid_accounts
-        except json.JSONDecodeError:
-            self.log(f"Gagal mendekode JSON dari '{self.accounts_file}'. Pastikan formatnya benar.", level="ERROR")
-            return []
+                acc_idx = -1
+                for acc_idx, acc in enumerate(self._iter_raw_accounts(file)):
+                    if isinstance(acc, dict) and "Address" in acc and "deviceHash" in acc:
+                        try:
+                            acc["deviceHash"] = int(str(acc["deviceHash"]))
+                        except ValueError:
+                            self.log(f"Akun ke-{acc_idx+1} memiliki deviceHash tidak valid (harus integer): {C_WARNING}{acc.get('deviceHash')}{C_ERROR}", level="ERROR")
+                            continue
+                        if not self._account_in_shard(str(acc["Address"])):
+                            continue
+                        valid_count += 1
+                        yield acc
+                    else:
+                        self.log(f"Akun ke-{acc_idx+1} di '{self.accounts_file}' tidak memiliki format yang benar (membutuhkan 'Address' dan 'deviceHash').", level="WARNING")
+                if strict and acc_idx < 0:
+                    # File kosong biasanya sedang ditulis ulang; "[]" tetap sah untuk menghapus semua akun
+                    file.seek(0)
+                    if not file.read().strip():
+                        raise ValueError(f"File akun '{self.accounts_file}' kosong")
         except Exception as e:
-            self.log(f"Error saat memuat akun: {e}", level="ERROR")
-            return []
+            if strict:
+                raise
+            # Akun sebelum error sudah dijalankan (file dibaca bertahap), jadi laporkan bahwa pemuatannya tidak lengkap
+            reason = f"JSON tidak valid ({e})" if isinstance(e, json.JSONDecodeError) else str(e)
+            if valid_count:
+                self.log(f"Gagal membaca '{self.accounts_file}' setelah {valid_count} akun valid: {reason}. "
+                         f"Hanya {valid_count} akun pertama yang dimuat; sisa file DILEWATI. Perbaiki file lalu restart "
+                         f"(atau simpan ulang jika --watch-accounts aktif).", level="ERROR")
+            else:
+                self.log(f"Gagal memuat akun dari '{self.accounts_file}': {reason}. Pastikan formatnya benar.", level="ERROR")
+            return
+        if strict:
+            self._accounts_file_signature = signature
+
+        if valid_count:
+            shard_info = f" (shard {self.shard[0]}/{self.shard[1]})" if self.shard else ""
+            self.log(f"Berhasil memuat {valid_count} akun valid dari '{self.accounts_file}'{shard_info}.", level="INFO")
+
+    def load_accounts_from_file(self) -> List[Dict[str, Any]]:
+        return list(self.iter_accounts_from_file())
 
     async def load_proxies_from_local_file(self):
         try:
@@ -144,6 +2107,7 @@ class NaorisProtocolAutomation:
                 self.log(f"Tidak ada proxy yang dimuat dari '{self.proxy_file}'.", level="WARNING")
             else:
                  self.log(f"Total proxy yang dimuat dari '{self.proxy_file}': {len(self.proxies)}", level="SUCCESS")
+                 self.routes = RouteManager(self._get_proxy_url(proxy_str) for proxy_str in self.proxies)
         except Exception as e:
             self.log(f"Gagal memuat proxy dari '{self.proxy_file}': {e}", level="ERROR")
             self.proxies = []
@@ -156,36 +2120,27 @@ class NaorisProtocolAutomation:
             return proxy_str
         return f"http://{proxy_str}"
 
-    def get_next_proxy_for_account(self, account_address: str) -> Optional[str]:
-        if not self.proxies:
+    def get_next_proxy_for_account(self, account: AccountState) -> Optional[str]:
+        # Rute lengket per akun; hanya berpindah jika rutenya dikarantina
+        if not self.routes:
             return None
-        current_proxy_str = self.proxies[self.proxy_index]
-        self.proxy_index = (self.proxy_index + 1) % len(self.proxies)
-        assigned_proxy = self._get_proxy_url(current_proxy_str)
-        self.account_proxies[account_address] = assigned_proxy
+        assigned_proxy = self.routes.assign(account.account_id)
+        if account.proxy is not None and assigned_proxy != account.proxy:
+            self.log_account_specific(account.masked, f"Rute dipindah dari {account.proxy} ke {assigned_proxy} (rute lama dikarantina).", level="DEBUG")
+        account.proxy = assigned_proxy
         return assigned_proxy
 
-    def _mask_address(self, address: str) -> str:
+    @staticmethod
+    def _mask_address(address: str) -> str:
         if len(address) > 12:
             return f"{address[:6]}...{address[-4:]}"
         return address
 
     def ask_use_proxy(self) -> bool:
-        timestamp = datetime.now(wib).strftime('%Y-%m-%d %H:%M:%S %Z')
-        while True:
-            print(f"{C_TEXT}[{timestamp}]{Style.RESET_ALL} {C_INPUT}[INPUT]{Style.RESET_ALL} {C_INPUT}Apakah Anda ingin menggunakan proxy dari '{self.proxy_file}'? (y/n): {Style.RESET_ALL}", end="")
-            choice = input().strip().lower()
-            if choice == 'y':
-                self.log("Menggunakan proxy.", level="INFO")
-                return True
-            elif choice == 'n':
-                self.log("Tidak menggunakan proxy.", level="INFO")
-                return False
-            else:
-                self.log("Input tidak valid. Harap masukkan 'y' untuk Ya atau 'n' untuk Tidak.", level="WARNING")
+        return ask_use_proxy(self.logger, self.proxy_file)
 
-    async def _request(self, method: str, url: str, headers: Optional[Dict] = None, data: Optional[Dict] = None, 
-                       json_payload: Optional[Dict] = None, proxy: Optional[str] = None, impersonate: str = "chrome110", timeout: int = 60) -> Optional[Any]:
+    def _merge_headers(self, headers: Optional[Dict], data: Optional[Any], json_payload: Optional[Dict]) -> Dict[str, str]:
+        # Header default + header per request; dipisah dari _request supaya bisa diukur bench.py
         effective_headers = {**self.headers, **(headers or {})}
         if data:
              effective_headers["Content-Length"] = str(len(data))
@@ -194,397 +2149,941 @@ class NaorisProtocolAutomation:
         elif json_payload is not None:
             if "Content-Type" not in effective_headers:
                  effective_headers["Content-Type"] = "application/json"
+        return effective_headers
+
+    async def _request(self, method: str, url: str, headers: Optional[Dict] = None, data: Optional[Dict] = None, 
+                       json_payload: Optional[Dict] = None, proxy: Optional[str] = None, impersonate: str = "chrome110", timeout: int = 60) -> ApiResponse:
+        effective_headers = self._merge_headers(headers, data, json_payload)
         
+        if method.upper() not in ("POST", "GET"):
+            return ApiResponse(None, error=f"Unsupported HTTP method: {method}")
+
+        host = self._url_host(url)
+        breaker = self.circuit_breakers.get(host)
+        if breaker is None:
+            breaker = self.circuit_breakers[host] = CircuitBreaker()
+        is_probe = breaker.before_call()
+        if is_probe is None:
+            self.metrics.requests.inc(1, url.rsplit("/", 1)[-1], self.metrics.route_label(proxy), "circuit_open")
+            return ApiResponse(None, error=f"Circuit breaker terbuka untuk {host}", circuit_open=True)
+        if self.host_rps > 0:
+            limiter = self.host_limiters.get(host)
+            if limiter is None:
+                limiter = self.host_limiters[host] = TokenBucket(self.host_rps, self.host_burst)
+            if await limiter.acquire() > 0:
+                self.host_rate_limited += 1
+        self.rate_curve.record(time.monotonic(), self.http.in_flight + 1)
+
+        started = time.perf_counter()
         try:
-            if method.upper() == "POST":
-                response = await asyncio.to_thread(
-                    requests.post, url, headers=effective_headers, data=data, json=json_payload, 
-                    proxies={"http": proxy, "https": proxy} if proxy else None, 
-                    timeout=timeout, impersonate=impersonate
-                )
-            elif method.upper() == "GET":
-                response = await asyncio.to_thread(
-                    requests.get, url, headers=effective_headers, 
-                    proxies={"http": proxy, "https": proxy} if proxy else None, 
-                    timeout=timeout, impersonate=impersonate
-                )
+            response = await self.http.request(
+                method.upper(), url, headers=effective_headers,
+                data=data if method.upper() == "POST" else None,
+                json_payload=json_payload if method.upper() == "POST" else None,
+                proxy=proxy, impersonate=impersonate, timeout=timeout
+            )
+            status_code = response.status_code
+            if 200 <= status_code < 400:
+                result = ApiResponse(status_code, decode_body(response.content))
+            elif status_code:
+                # Body error dipotong sebelum di-decode; yang dipakai hanya pesan singkat/teks yang dikenal
+                result = ApiResponse(status_code, decode_body(response.content[:ERROR_BODY_LIMIT]),
+                                     error=f"HTTP Error {status_code}: {response.reason}")
             else:
-                return {"error": True, "status_code": "N/A", "message": f"Unsupported HTTP method: {method}"}
-            response.raise_for_status()
-            try:
-                return response.json()
-            except json.JSONDecodeError:
-                return response.text
-        except requests.RequestsError as e:
-            status_code = e.response.status_code if e.response is not None else "N/A"
-            response_text = e.response.text if e.response is not None else None
-            error_message = str(e)
-            return {"error": True, "status_code": status_code, "message": error_message, "response_text": response_text}
+                result = ApiResponse(None, error="Tidak ada respons HTTP (status 0)")
+        except curl_requests().RequestsError as e:
+            # curl_cffi mengisi response dengan status 0 saat koneksi/proxy gagal: itu kegagalan transport
+            status_code = e.response.status_code if e.response is not None else None
+            result = ApiResponse(status_code or None, error=str(e))
         except Exception as e:
-            return {"error": True, "status_code": "N/A", "message": str(e)}
+            result = ApiResponse(None, error=str(e))
+        status_label = str(result.status_code) if result.status_code else "error"
+        elapsed = time.perf_counter() - started
+        self.metrics.observe_request(url, proxy, status_label, elapsed)
+        if proxy and self.routes:
+            # Hanya kegagalan transport dan 407 yang menjadi kesalahan rute; status lain berasal dari API
+            route_ok = status_label not in ("error", "407")
+            if self.routes.record(proxy, route_ok, elapsed if route_ok else None):
+                self.log(f"Rute {proxy} dikarantina setelah {self.routes.failure_threshold} kegagalan berturut-turut; akunnya dipindah ke rute lain.", level="WARNING")
+                asyncio.get_running_loop().create_task(self.http.close_route(proxy))
+        # Hanya kegagalan transport, 5xx dan 429 yang dihitung breaker; 4xx lain adalah jawaban normal API
+        breaker.after_call(not (status_label == "error" or status_label.startswith("5") or status_label == "429"), is_probe)
+        return result
+
+    def _url_host(self, url: str) -> str:
+        host = self._url_hosts.get(url)
+        if host is None:
+            host = self._url_hosts[url] = urlparse(url).netloc
+        return host
+
+    def _is_retryable(self, response: Any) -> bool:
+        # 4xx (selain 429) adalah jawaban final dari API; mengulang dengan input yang sama tidak membantu
+        if isinstance(response, ApiResponse) and not response.ok:
+            if response.circuit_open:
+                return False
+            status_code = response.status_code
+            if status_code is not None and 400 <= status_code < 500 and status_code != 429:
+                return False
+        return True
 
-    async def generate_token(self, masked_address: str, original_address: str, proxy: Optional[str], retries: int = 3) -> Optional[Dict]:
+    async def _call_with_retry(self, endpoint: str, label: str, masked_address: str,
+                               attempt_fn: Callable[[], Awaitable[Tuple[bool, Any, Optional[str]]]],
+                               failure_value: Any, retries: int = 3) -> Any:
+        # attempt_fn -> (selesai, nilai, pesan error). Jika selesai, nilai langsung dikembalikan;
+        # jika tidak, nilai = respons mentah yang dipakai untuk menentukan boleh retry atau tidak.
+        for attempt in range(retries):
+            if attempt == 0:
+                self.retry_budget.record_request() # Hanya request pertama yang menambah saldo, retry tidak
+            finished, value, error_msg = await attempt_fn()
+            if finished:
+                return value
+
+            will_retry = attempt < retries - 1 and self._is_retryable(value)
+            if will_retry and not self.retry_budget.try_spend():
+                will_retry = False
+                error_msg = f"{error_msg} (retry budget habis)"
+            if isinstance(value, ApiResponse) and value.circuit_open:
+                log_level = "WARNING"
+            else:
+                log_level = "WARNING" if will_retry else "ERROR"
+            self.log_account_specific(masked_address, "", level=log_level, status_msg=f"{label} Gagal (attempt {attempt+1}/{retries}): {error_msg}{'. Retry...' if will_retry else '. Gagal Final.'}")
+            if not will_retry:
+                return failure_value
+            self.metrics.retries.inc(1, endpoint)
+            await asyncio.sleep(self.retry_policy.backoff(attempt))
+        return failure_value
+
+    def _indicates_session_lost(self, response: ApiResponse) -> bool:
+        # 4xx selain 401 (token) dan 429 (rate limit) pada ping/htb-event, misal 410 tanpa "Ping Success!!"
+        if response.ok or response.status_code is None:
+            return False
+        return 400 <= response.status_code < 500 and response.status_code not in (401, 429)
+
+    def _error_message(self, response: ApiResponse) -> str:
+        if response.ok:
+            return f"Respons tidak terduga: {response.preview()}"
+        if response.data:
+            return f"{response.error} ({response.preview(120)})"
+        return response.error
+
+    async def generate_token(self, account: AccountState, proxy: Optional[str], retries: int = 3) -> Optional[Dict]:
         url = f"{self.base_api_url}/sec-api/auth/gt-event"
-        payload_dict = {"wallet_address": original_address}
+        payload_dict = {"wallet_address": account.address}
         payload_str = json.dumps(payload_dict)
-        
-        for attempt in range(retries):
+
+        async def attempt():
             response = await self._request("POST", url, data=payload_str, proxy=proxy)
-            if isinstance(response, dict) and not response.get("error"):
-                return response
-            elif isinstance(response, dict) and response.get("status_code") == 404:
-                 self.log_account_specific(masked_address, "", level="ERROR", status_msg=f"Generate Token Gagal (404): Pastikan akun terdaftar & selesaikan task.")
-                 return None
-            
-            error_msg = response.get("message", "Unknown error") if isinstance(response, dict) else "Non-dict/No response"
-            # Warning untuk retry, Error untuk final
-            log_level_retry = "WARNING" if attempt < retries - 1 else "ERROR"
-            self.log_account_specific(masked_address, "", level=log_level_retry, status_msg=f"Generate Token Gagal (attempt {attempt+1}/{retries}): {error_msg}{'. Retry...' if attempt < retries -1 else '. Gagal Final.'}")
-            if attempt < retries - 1:
-                await asyncio.sleep(5)
-            else: # Gagal setelah semua retry
-                return None
-        return None # Seharusnya tidak tercapai jika loop berjalan
+            if response.ok and isinstance(response.data, dict):
+                return True, response.data, None
+            elif response.status_code == 404:
+                 self.log_account_specific(account.masked, "", level="ERROR", status_msg=f"Generate Token Gagal (404): Pastikan akun terdaftar & selesaikan task.")
+                 return True, None, None
+            return False, response, self._error_message(response)
+
+        return await self._call_with_retry("gt-event", "Generate Token", account.masked, attempt, None, retries)
 
-    async def refresh_token_api(self, masked_address: str, original_address: str, current_refresh_token: str, proxy: Optional[str], use_proxy_flag: bool, retries: int = 3) -> Optional[Dict]:
+    async def refresh_token_api(self, account: AccountState, proxy: Optional[str], use_proxy_flag: bool, retries: int = 3) -> Optional[Dict]:
         url = f"{self.base_api_url}/sec-api/auth/refresh"
-        payload_dict = {"refreshToken": current_refresh_token}
+        payload_dict = {"refreshToken": account.refresh_token}
         payload_str = json.dumps(payload_dict)
 
-        for attempt in range(retries):
+        async def attempt():
             response = await self._request("POST", url, data=payload_str, proxy=proxy)
-            if isinstance(response, dict) and not response.get("error"):
-                return response
-            elif isinstance(response, dict) and response.get("status_code") == 401:
-                self.log_account_specific(masked_address, "", level="WARNING", status_msg="Refresh Token Gagal (401). Mencoba generate token baru...")
-                new_tokens = await self.process_generate_new_token(masked_address, original_address, use_proxy_flag, proxy_to_use=proxy)
-                if new_tokens:
-                    return new_tokens # Ini adalah dict sukses dari process_generate_new_token
-                else: # Gagal generate token baru
-                    self.log_account_specific(masked_address, "", level="ERROR", status_msg="Gagal generate token baru setelah refresh gagal (401).")
-                    return None # Error final untuk refresh ini
-            
-            error_msg = response.get("message", "Unknown error") if isinstance(response, dict) else "Non-dict/No response"
-            log_level_retry = "WARNING" if attempt < retries - 1 else "ERROR"
-            self.log_account_specific(masked_address, "", level=log_level_retry, status_msg=f"Refresh Token Gagal (attempt {attempt+1}/{retries}): {error_msg}{'. Retry...' if attempt < retries -1 else '. Gagal Final.'}")
-            if attempt < retries - 1:
-                await asyncio.sleep(5)
-            else:
-                return None
-        return None
-
-    async def get_wallet_details(self, masked_address: str, original_address: str, access_token: str, proxy: Optional[str], retries: int = 3) -> Optional[Dict]:
+            if response.ok and isinstance(response.data, dict):
+                return True, response.data, None
+            elif response.status_code == 401:
+                self.log_account_specific(account.masked, "", level="WARNING", status_msg="Refresh Token Gagal (401). Mencoba generate token baru...")
+                new_tokens = await self.process_generate_new_token(account, use_proxy_flag, proxy_to_use=proxy)
+                if not new_tokens: # Gagal generate token baru
+                    self.log_account_specific(account.masked, "", level="ERROR", status_msg="Gagal generate token baru setelah refresh gagal (401).")
+                return True, new_tokens, None # Dict sukses dari process_generate_new_token atau None
+            return False, response, self._error_message(response)
+
+        return await self._call_with_retry("refresh", "Refresh Token", account.masked, attempt, None, retries)
+
+    async def get_wallet_details(self, account: AccountState, proxy: Optional[str], retries: int = 3) -> Optional[ApiResponse]:
         url = f"{self.base_api_url}/sec-api/api/wallet-details"
-        headers = {"Authorization": f"Bearer {access_token}"}
-        for attempt in range(retries):
+        headers = {"Authorization": f"Bearer {account.access_token}"}
+
+        async def attempt():
             response = await self._request("GET", url, headers=headers, proxy=proxy)
-            if isinstance(response, dict) and not response.get("error"):
-                return response
-            error_msg = response.get("message", "Unknown error") if isinstance(response, dict) else "Non-dict/No response"
-            log_level_retry = "WARNING" if attempt < retries - 1 else "ERROR"
-            self.log_account_specific(masked_address, "", level=log_level_retry, status_msg=f"Get Wallet Details Gagal (attempt {attempt+1}/{retries}): {error_msg}{'. Retry...' if attempt < retries -1 else '. Gagal Final.'}")
-            if attempt < retries - 1:
-                await asyncio.sleep(5)
-            else:
-                 return None
-        return None
+            if response.ok and isinstance(response.data, dict):
+                return True, response, None
+            elif response.status_code == 401 or response.outcome is ApiOutcome.INVALID_TOKEN:
+                return True, response, None # Ditangani pemanggil: token dihapus lalu di-generate ulang
+            return False, response, self._error_message(response)
 
-    async def add_to_whitelist(self, masked_address: str, original_address: str, access_token: str, proxy: Optional[str], retries: int = 3) -> bool:
+        return await self._call_with_retry("wallet-details", "Get Wallet Details", account.masked, attempt, None, retries)
+
+    async def add_to_whitelist(self, account: AccountState, proxy: Optional[str], retries: int = 3) -> Optional[ApiResponse]:
         url = f"{self.base_api_url}/sec-api/api/addWhitelist"
-        payload_dict = {"walletAddress": original_address, "url": "naorisprotocol.network"}
+        payload_dict = {"walletAddress": account.address, "url": "naorisprotocol.network"}
         payload_str = json.dumps(payload_dict)
-        headers = {"Authorization": f"Bearer {access_token}"}
+        headers = {"Authorization": f"Bearer {account.access_token}"}
         proxy_info_str = proxy if proxy else "Tidak Digunakan"
 
-        for attempt in range(retries):
+        async def attempt():
             response = await self._request("POST", url, headers=headers, data=payload_str, proxy=proxy)
-            if isinstance(response, dict) and not response.get("error"):
-                if response.get("message") == "url saved successfully":
-                    return True # Sukses
-            elif isinstance(response, dict) and response.get("status_code") == 409:
-                self.log_account_specific(masked_address, "", level="INFO", proxy_info=proxy_info_str, status_msg="URL sudah ada di whitelist.")
-                return True # Dianggap sukses jika sudah ada
-
-            error_msg = response.get("message", "Unknown error") if isinstance(response, dict) else "Non-dict/No response"
-            log_level_retry = "WARNING" if attempt < retries - 1 else "ERROR"
-            self.log_account_specific(masked_address, "", level=log_level_retry, status_msg=f"Add Whitelist Gagal (attempt {attempt+1}/{retries}): {error_msg}{'. Retry...' if attempt < retries -1 else '. Gagal Final.'}")
-            if attempt < retries - 1:
-                await asyncio.sleep(5)
-            else: # Gagal setelah semua retry
-                 return False
-        return False # Default jika loop selesai tanpa sukses
-        
-    async def toggle_device_activation(self, masked_address: str, original_address: str, device_hash: int, access_token: str, state: str, proxy: Optional[str], retries: int = 3) -> Optional[str]:
+            if response.ok and response.outcome is ApiOutcome.WHITELIST_SAVED:
+                return True, response, None # Sukses
+            elif response.status_code == 409:
+                self.log_account_specific(account.masked, "", level="INFO", proxy_info=proxy_info_str, status_msg="URL sudah ada di whitelist.")
+                return True, response, None # Dianggap sukses jika sudah ada
+            return False, response, self._error_message(response)
+
+        return await self._call_with_retry("addWhitelist", "Add Whitelist", account.masked, attempt, None, retries)
+
+    async def toggle_device_activation(self, account: AccountState, state: str, proxy: Optional[str], retries: int = 3) -> Optional[ApiResponse]:
         url = f"{self.base_api_url}/sec-api/api/switch"
-        payload_dict = {"walletAddress": original_address, "state": state.upper(), "deviceHash": device_hash}
+        payload_dict = {"walletAddress": account.address, "state": state.upper(), "deviceHash": account.device_hash}
         payload_str = json.dumps(payload_dict)
-        headers = {"Authorization": f"Bearer {access_token}"}
+        headers = {"Authorization": f"Bearer {account.access_token}"}
 
-        for attempt in range(retries):
+        async def attempt():
             response = await self._request("POST", url, headers=headers, data=payload_str, proxy=proxy)
-            
-            if isinstance(response, str): # Sukses jika string
-                return response.strip()
-            # Jika bukan string, pasti ada masalah atau respons tidak diharapkan
-            elif isinstance(response, dict) and response.get("error"):
-                error_msg = response.get("message", "Unknown error")
-            elif isinstance(response,dict): # Dict tapi bukan error dari _request (misal, API mengembalikan JSON saat kita harapkan string)
-                error_msg = f"Unexpected dict response: {response}"
-            else: # None atau tipe lain
-                error_msg = "No response or unknown response type"
-
-            log_level_retry = "WARNING" if attempt < retries - 1 else "ERROR"
-            self.log_account_specific(masked_address, "", level=log_level_retry, status_msg=f"Toggle Activation ({state}) Gagal (attempt {attempt+1}/{retries}): {error_msg}{'. Retry...' if attempt < retries -1 else '. Gagal Final.'}")
-            if attempt < retries - 1:
-                await asyncio.sleep(5)
-            else: # Gagal setelah semua retry
-                return None
-        return None
+            if response.ok and isinstance(response.data, str): # Sukses jika teks; artinya dibaca pemanggil dari outcome
+                return True, response, None
+            self._check_setup_undone(account, response)
+            return False, response, self._error_message(response)
+
+        return await self._call_with_retry("switch", f"Toggle Activation ({state})", account.masked, attempt, None, retries)
 
-    async def initiate_message_production(self, masked_address: str, original_address: str, device_hash: int, access_token: str, proxy: Optional[str], retries: int = 3) -> bool:
+    async def initiate_message_production(self, account: AccountState, proxy: Optional[str], retries: int = 3) -> bool:
         url = f"{self.ping_api_url}/sec-api/api/htb-event"
-        payload_dict = {"inputData": {"walletAddress": original_address, "deviceHash": device_hash}}
+        payload_dict = {"inputData": {"walletAddress": account.address, "deviceHash": account.device_hash}}
         payload_str = json.dumps(payload_dict)
-        headers = {"Authorization": f"Bearer {access_token}"}
+        headers = {"Authorization": f"Bearer {account.access_token}"}
 
-        for attempt in range(retries):
+        async def attempt():
             response = await self._request("POST", url, headers=headers, data=payload_str, proxy=proxy)
-            if isinstance(response, dict) and not response.get("error") and response.get("message") == "Message production initiated":
-                return True
-            
-            error_msg = response.get("message", "Unknown error") if isinstance(response, dict) else "Non-dict/No response"
-            log_level_retry = "WARNING" if attempt < retries - 1 else "ERROR"
-            self.log_account_specific(masked_address, "", level=log_level_retry, status_msg=f"Initiate Message Prod. Gagal (attempt {attempt+1}/{retries}): {error_msg}{'. Retry...' if attempt < retries -1 else '. Gagal Final.'}")
-            if attempt < retries - 1:
-                await asyncio.sleep(5)
-            else:
-                return False
-        return False
+            if response.ok and response.outcome is ApiOutcome.MESSAGE_PRODUCTION_INITIATED:
+                self._note_session(account, SESSION_ACTIVE)
+                return True, True, None
+            if self._indicates_session_lost(response):
+                self._note_session(account, SESSION_LOST)
+            self._check_setup_undone(account, response)
+            return False, response, self._error_message(response)
+
+        return await self._call_with_retry("htb-event", "Initiate Message Prod.", account.masked, attempt, False, retries)
 
-    async def perform_ping(self, masked_address: str, original_address: str, access_token: str, proxy: Optional[str], retries: int = 3) -> bool:
+    async def perform_ping(self, account: AccountState, proxy: Optional[str], retries: int = 3) -> bool:
         url = f"{self.ping_api_url}/api/ping"
-        headers = {"Authorization": f"Bearer {access_token}", "Content-Type": "application/json"}
+        headers = {"Authorization": f"Bearer {account.access_token}", "Content-Type": "application/json"}
 
-        for attempt in range(retries):
+        async def attempt():
             response = await self._request("POST", url, headers=headers, json_payload={}, proxy=proxy)
-            
-            if isinstance(response, str) and response.strip() == "Ping Success!!": # Sukses jika string ini
-                return True
-            # Handle jika 410 adalah sukses (seperti di sc2)
-            elif isinstance(response, dict) and response.get("status_code") == 410 and \
-                 isinstance(response.get("response_text"), str) and \
-                 response.get("response_text","").strip() == "Ping Success!!":
-                return True
-            # Jika bukan string sukses, atau bukan 410 sukses, maka itu error atau respons tak dikenal
-            elif isinstance(response, dict) and response.get("error"):
-                error_msg = response.get("message", "Unknown error")
-                status_code = response.get("status_code")
-            elif isinstance(response,dict): # Dict tapi bukan error dari _request
-                 error_msg = f"Unexpected dict response: {response}"
-                 status_code = "N/A"
-            else: # None atau tipe lain
-                error_msg = "No response or unknown response type"
-                status_code = "N/A"
-
-
-            status_code_info = f"(status: {status_code})" if status_code != "N/A" else ""
-            log_level_retry = "WARNING" if attempt < retries - 1 else "ERROR"
-            self.log_account_specific(masked_address, "", level=log_level_retry, status_msg=f"Perform Ping Gagal (attempt {attempt+1}/{retries}){status_code_info}: {error_msg}{'. Retry...' if attempt < retries -1 else '. Gagal Final.'}")
-            if attempt < retries - 1:
-                await asyncio.sleep(5)
-            else: # Gagal setelah semua retry
-                return False
-        return False
+            # "Ping Success!!" juga dianggap sukses walau datang dengan status 410 (seperti di sc2)
+            if response.outcome is ApiOutcome.PING_SUCCESS and (response.ok or response.status_code == 410):
+                self._note_session(account, SESSION_ACTIVE)
+                return True, True, None
+            if self._indicates_session_lost(response):
+                self._note_session(account, SESSION_LOST)
+            self._check_setup_undone(account, response)
+            return False, response, self._error_message(response)
+
+        return await self._call_with_retry("ping", "Perform Ping", account.masked, attempt, False, retries)
+
+    def _store_tokens(self, account: AccountState, access_token: str, refresh_token: str):
+        account.access_token = access_token
+        account.refresh_token = refresh_token
+        account.token_expiry = _jwt_expiry(access_token)
+        account.token_issued_at = time.time()
+        if self.token_store:
+            self.token_store.put(account.address, access_token, refresh_token, account.token_expiry)
+
+    def _clear_tokens(self, account: AccountState, access_only: bool = False):
+        account.access_token = None
+        account.token_expiry = None
+        account.token_issued_at = None
+        if not access_only:
+            account.refresh_token = None
+        if self.token_store:
+            if account.refresh_token:
+                self.token_store.put(account.address, "", account.refresh_token, None)
+            else:
+                self.token_store.delete(account.address)
 
-    async def process_generate_new_token(self, masked_address: str, original_address: str, use_proxy_flag: bool, proxy_to_use: Optional[str] = None) -> Optional[Dict[str,str]]:
+    def load_persisted_tokens(self) -> int:
+        self._stored_tokens = {}
+        if not self.token_store:
+            return 0
+        try:
+            self._stored_tokens = self.token_store.load()
+        except sqlite3.Error as e:
+            self.log(f"Gagal membaca token tersimpan dari '{self.token_store.path}': {e}", level="WARNING")
+        return len(self._stored_tokens)
+
+    def _restore_tokens(self, account: AccountState, from_store: bool = False) -> bool:
+        entry = self._stored_tokens.pop(account.address, None)
+        if entry is None and from_store and self.token_store:
+            try:
+                entry = self.token_store.get(account.address)
+            except sqlite3.Error:
+                entry = None
+        if not entry:
+            return False
+        access_token, refresh_token, expires_at = entry
+        account.refresh_token = refresh_token
+        # Access token yang (hampir) kedaluwarsa tidak dipakai; setup akan refresh dulu
+        if access_token and (expires_at is None or expires_at - time.time() > self.refresh_margin_seconds):
+            account.access_token = access_token
+            account.token_expiry = expires_at
+        return True
+
+    def _refresh_delay(self, account: AccountState, initial: bool = False) -> float:
+        # Jadwal refresh mengikuti klaim exp JWT; tanpa exp kembali ke interval tetap lama
+        if account.token_expiry is None:
+            return self.refresh_initial_delay_seconds if initial else self.refresh_interval_seconds
+        return max(self.refresh_min_delay_seconds, account.token_expiry - time.time() - self.refresh_margin_seconds)
+
+    async def process_generate_new_token(self, account: AccountState, use_proxy_flag: bool, proxy_to_use: Optional[str] = None) -> Optional[Dict[str,str]]:
+        return await self.token_renewal.do(
+            ("generate", account.account_id),
+            lambda: self._generate_new_token_once(account, use_proxy_flag, proxy_to_use)
+        )
+
+    async def _generate_new_token_once(self, account: AccountState, use_proxy_flag: bool, proxy_to_use: Optional[str] = None) -> Optional[Dict[str,str]]:
         if proxy_to_use is None and use_proxy_flag:
-            proxy = self.get_next_proxy_for_account(original_address) if use_proxy_flag else None
+            proxy = self.get_next_proxy_for_account(account) if use_proxy_flag else None
         else:
             proxy = proxy_to_use if use_proxy_flag else None
         
         proxy_info_str = proxy if proxy else "Tidak Digunakan"
 
-        token_data = await self.generate_token(masked_address, original_address, proxy)
+        token_data = await self.generate_token(account, proxy)
         if token_data and "token" in token_data and "refreshToken" in token_data:
-            self.access_tokens[original_address] = token_data["token"]
-            self.refresh_tokens[original_address] = token_data["refreshToken"]
+            self._store_tokens(account, token_data["token"], token_data["refreshToken"])
             # Pesan sukses generate token akan dicetak oleh generate_token jika berhasil di sana,
             # atau kita bisa cetak di sini juga. Sesuai contoh, "Generate Token Berhasil" ada.
-            self.log_account_specific(masked_address, "", level="SUCCESS", proxy_info=proxy_info_str, status_msg="Generate Token Berhasil.")
+            self.log_account_specific(account.masked, "", level="SUCCESS", proxy_info=proxy_info_str, status_msg="Generate Token Berhasil.")
             return {"token": token_data["token"], "refreshToken": token_data["refreshToken"]}
         else:
             # Pesan error sudah dicetak oleh generate_token
-            if original_address in self.access_tokens: del self.access_tokens[original_address]
-            if original_address in self.refresh_tokens: del self.refresh_tokens[original_address]
+            self._clear_tokens(account)
             return None
 
-    async def periodic_refresh_token_task(self, masked_address: str, original_address: str, use_proxy_flag: bool, initial_delay_minutes: int = 25):
-        await asyncio.sleep(initial_delay_minutes * 60)
-        while True:
-            if original_address not in self.refresh_tokens:
-                self.log_account_specific(masked_address, "Refresh token tidak ada, mencoba generate token baru.", level="WARNING")
-                await self.process_generate_new_token(masked_address, original_address, use_proxy_flag)
-                if original_address not in self.refresh_tokens: # Jika masih gagal setelah coba generate
-                    self.log_account_specific(masked_address, "Gagal mendapatkan refresh token, skip periodic refresh untuk siklus ini.", level="ERROR")
-                    await asyncio.sleep(5 * 60) # Tunggu sebelum coba lagi dari awal
-                    continue # Lanjutkan loop while True
-            
-            proxy = self.get_next_proxy_for_account(original_address) if use_proxy_flag else None
-            proxy_info_str = proxy if proxy else "Tidak Digunakan"
-            
-            self.log_account_specific(masked_address, "Mencoba refresh token...", level="DEBUG")
-            refreshed_token_data = await self.refresh_token_api(masked_address, original_address, self.refresh_tokens[original_address], proxy, use_proxy_flag)
-            
-            if refreshed_token_data and "token" in refreshed_token_data and "refreshToken" in refreshed_token_data:
-                self.access_tokens[original_address] = refreshed_token_data["token"]
-                self.refresh_tokens[original_address] = refreshed_token_data["refreshToken"]
-                self.log_account_specific(masked_address, "", level="SUCCESS", proxy_info=proxy_info_str, status_msg="Refresh Token Berhasil.")
-            else:
-                # Pesan error/warning sudah dari refresh_token_api atau process_generate_new_token di dalamnya
-                # Pastikan token dihapus jika refresh gagal total agar siklus berikutnya coba generate dari awal
-                if original_address in self.access_tokens: del self.access_tokens[original_address]
-                if original_address in self.refresh_tokens: del self.refresh_tokens[original_address]
-                self.log_account_specific(masked_address, "Refresh token gagal dan token lama dihapus. Akan mencoba generate baru di siklus berikutnya.", level="WARNING")
-
-
-            await asyncio.sleep(30 * 60) # Interval refresh
-
-    async def periodic_wallet_details_task(self, masked_address: str, original_address: str, use_proxy_flag: bool, initial_delay_minutes: int = 1):
-        await asyncio.sleep(initial_delay_minutes * 60)
-        while True:
-            if original_address not in self.access_tokens:
-                self.log_account_specific(masked_address, "Access token tidak ada, skip get wallet details.", level="WARNING")
-                await asyncio.sleep(5 * 60)
-                continue
-
-            proxy = self.get_next_proxy_for_account(original_address) if use_proxy_flag else None
-            proxy_info_str = proxy if proxy else "Tidak Digunakan"
-            self.log_account_specific(masked_address, "Mengambil detail wallet...", level="DEBUG")
-            details = await self.get_wallet_details(masked_address, original_address, self.access_tokens[original_address], proxy)
-            
-            if isinstance(details, dict) and not details.get("error") and "message" in details :
-                total_earnings = details["message"].get("totalEarnings", "N/A")
-                self.log_account_specific(masked_address, "", level="INFO", proxy_info=proxy_info_str, status_msg=f"Total Pendapatan: {total_earnings} PTS")
-            elif isinstance(details, dict) and details.get("error"):
-                response_text = details.get("response_text", "")
-                status_code = details.get("status_code")
-                if status_code == 401 or (response_text and "Invalid token" in response_text): # Cek response_text jika ada
-                    self.log_account_specific(masked_address, "", level="WARNING", proxy_info=proxy_info_str, status_msg="Token tidak valid saat ambil detail wallet.")
-                    if original_address in self.access_tokens: del self.access_tokens[original_address] # Hapus token agar di-generate ulang
-                else: # Error lain
-                    self.log_account_specific(masked_address, "", level="ERROR", proxy_info=proxy_info_str, status_msg=f"Gagal ambil detail wallet: {details.get('message')}")
-            else: # Respons tidak dikenal
-                self.log_account_specific(masked_address, "", level="WARNING", proxy_info=proxy_info_str, status_msg="Gagal mengambil detail wallet (respons tidak dikenal).")
-            
-            await asyncio.sleep(15 * 60) # Interval cek detail
-
-    async def main_account_operations_task(self, original_address: str, device_hash: int, use_proxy_flag: bool):
-        masked_address = self._mask_address(original_address)
-        
-        print(C_SEPARATOR + Style.BRIGHT + "-" * 60 + Style.RESET_ALL)
-        # Header akun sekarang menggunakan self.log agar timestamp dan format levelnya konsisten
-        self.log(f"{C_INFO}[AKUN]{Style.RESET_ALL} {C_INFO}{masked_address}{Style.RESET_ALL}", level="INFO")
-        print(C_SEPARATOR + Style.BRIGHT + "-" * 60 + Style.RESET_ALL)
+    async def _ensure_access_token(self, account: AccountState) -> bool:
+        if account.access_token is not None:
+            return True
+        self.log_account_specific(account.masked, "Access token hilang, mencoba regenerate...", level="WARNING")
+        if await self.process_generate_new_token(account, self.use_proxy_flag):
+            return True
+        self.log_account_specific(account.masked, "Gagal regenerate token. Melewatkan siklus ini.", level="ERROR")
+        return False
 
-        if original_address not in self.access_tokens or original_address not in self.refresh_tokens:
+    def _on_action_dispatch(self, account_id: int, action: str, lag: float):
+        self.metrics.actions.inc(1, action)
+        self.metrics.scheduler_lag.observe(lag, action)
+
+    def _shape_delay(self, account_id: int, action: str, delay: float) -> float:
+        if self.load_shaper is None or action not in SHAPED_ACTIONS:
+            return delay
+        if delay != getattr(self, SHAPED_ACTIONS[action]):
+            return delay
+        account = self.accounts.by_id(account_id)
+        if account is None:
+            return delay
+        return self.load_shaper.align(account.address, action, delay, time.time())
+
+    def _on_action_error(self, account_id: int, action: str, error: BaseException):
+        account = self.accounts.by_id(account_id)
+        if account is None:
+            return # Akun sudah dihapus lewat hot reload saat aksinya masih berjalan
+        account.action_errors += 1
+        self.log_account_specific(account.masked, "", level="ERROR", status_msg=f"Aksi '{action}' error tak terduga: {error}. Dijadwalkan ulang.")
+
+    async def run_account_action(self, account_id: int, action: str) -> Optional[float]:
+        # Dipanggil oleh scheduler; nilai kembali = detik sampai aksi ini jatuh tempo lagi (None = berhenti)
+        account = self.accounts.by_id(account_id)
+        if account is None:
+            return None # Akun sudah dihapus lewat hot reload
+        handler = self.account_actions.get(action)
+        if handler is None:
+            self.log(f"Aksi tidak dikenal untuk scheduler: {action}", level="ERROR")
+            return None
+        started = time.perf_counter()
+        try:
+            return await handler(account)
+        finally:
+            elapsed = time.perf_counter() - started
+            account.actions_run += 1
+            account.last_action_at = time.time()
+            self.metrics.action_duration.observe(elapsed, action)
+            if self.profiler.enabled:
+                self.profiler.record_action(action, elapsed)
+
+    async def setup_account_action(self, account: AccountState) -> Optional[float]:
+        masked_address = account.masked
+
+        if not self.live_status:
+            self.logger.write_raw(C_SEPARATOR + Style.BRIGHT + "-" * 60 + Style.RESET_ALL)
+            # Header akun sekarang menggunakan self.log agar timestamp dan format levelnya konsisten
+            self.log(f"{C_INFO}[AKUN]{Style.RESET_ALL} {C_INFO}{masked_address}{Style.RESET_ALL}", level="INFO")
+            self.logger.write_raw(C_SEPARATOR + Style.BRIGHT + "-" * 60 + Style.RESET_ALL)
+
+        if account.access_token is None and account.refresh_token is not None:
+            # Access token tersimpan sudah kedaluwarsa, coba refresh sebelum generate ulang
+            self.log_account_specific(masked_address, "Access token tersimpan kedaluwarsa, mencoba refresh...", level="DEBUG")
+            await self.refresh_token_action(account)
+
+        if account.access_token is None or account.refresh_token is None:
             self.log_account_specific(masked_address, "Token tidak ditemukan. Memulai proses pembuatan token...", level="INFO")
-            if not await self.process_generate_new_token(masked_address, original_address, use_proxy_flag):
+            if not await self.process_generate_new_token(account, self.use_proxy_flag):
                 self.log_account_specific(masked_address, "Gagal total membuat token awal. Tidak dapat melanjutkan.", level="ERROR")
-                return # Hentikan task ini untuk akun ini
+                return None # Hentikan semua aksi untuk akun ini
 
         # Whitelist (setelah token dipastikan ada)
-        if original_address in self.access_tokens: # Pastikan token ada sebelum whitelist
-            proxy_for_whitelist = self.get_next_proxy_for_account(original_address) if use_proxy_flag else None
-            proxy_info_str_whitelist = proxy_for_whitelist if proxy_for_whitelist else "Tidak Digunakan"
-            self.log_account_specific(masked_address, "Menambahkan ke whitelist...", level="DEBUG")
-            
-            if await self.add_to_whitelist(masked_address, original_address, self.access_tokens[original_address], proxy_for_whitelist):
-                self.log_account_specific(masked_address, "", level="SUCCESS", proxy_info=proxy_info_str_whitelist, status_msg="Berhasil ditambahkan/sudah ada di whitelist.")
-            # else: # Pesan error/warning sudah dari add_to_whitelist
+        if account.access_token is not None: # Pastikan token ada sebelum whitelist
+            await self._ensure_whitelisted(account)
         else:
             self.log_account_specific(masked_address, "Token tidak tersedia, tidak dapat menambahkan ke whitelist.", level="WARNING")
 
+        # Urutan penjadwalan = urutan eksekusi untuk tenggat yang sama: aktivasi dulu, lalu initiate, lalu ping.
+        # Dengan --shape, siklus pertama digeser ke fase akun di dalam satu interval ping.
+        account_id = account.account_id
+        start_delay = self.load_shaper.initial_delay(account.address, self.ping_interval_seconds) if self.load_shaper else 0
+        self.scheduler.schedule(account_id, "activation", start_delay)
+        self.scheduler.schedule(account_id, "initiate", start_delay)
+        self.scheduler.schedule(account_id, "ping", start_delay)
+        self.scheduler.schedule(account_id, "wallet", self.wallet_initial_delay_seconds + start_delay)
+        refresh_delay = self._refresh_delay(account, initial=True)
+        if self.load_shaper:
+            # Token yang dibuat serentak kedaluwarsa serentak; refresh pertama hanya boleh dimajukan, tidak dimundurkan
+            refresh_delay = max(self.refresh_min_delay_seconds, refresh_delay - self.load_shaper.phase(account.address, "refresh") * self.refresh_margin_seconds)
+        self.scheduler.schedule(account_id, "refresh", refresh_delay)
+        return None
 
-        ping_interval_seconds = 60
-        initiate_msg_interval_seconds = 10 * 60
-        activation_check_interval_seconds = 5 * 60 
+    async def _ensure_whitelisted(self, account: AccountState) -> bool:
+        masked_address = account.masked
+        verified_at = account.whitelisted_at
+        if verified_at is not None and time.time() - verified_at < self.setup_ttl_seconds:
+            self.whitelist_skipped += 1
+            self.log_account_specific(masked_address, "Whitelist dilewati (sudah tercatat di ledger setup).", level="DEBUG")
+            return True
+
+        proxy_for_whitelist = self.get_next_proxy_for_account(account) if self.use_proxy_flag else None
+        proxy_info_str_whitelist = proxy_for_whitelist if proxy_for_whitelist else "Tidak Digunakan"
+        self.log_account_specific(masked_address, "Menambahkan ke whitelist..." if verified_at is None else "Verifikasi ulang whitelist (TTL ledger habis)...", level="DEBUG")
+        self.whitelist_calls += 1
+        response = await self.add_to_whitelist(account, proxy_for_whitelist)
+        if response is None: # Pesan error/warning sudah dari add_to_whitelist
+            return False
+        if verified_at is not None and response.outcome is ApiOutcome.WHITELIST_SAVED:
+            self.log_account_specific(masked_address, "Whitelist ternyata sudah hilang di server dan disimpan ulang.", level="WARNING")
+        self.log_account_specific(masked_address, "", level="SUCCESS", proxy_info=proxy_info_str_whitelist, status_msg="Berhasil ditambahkan/sudah ada di whitelist.")
+        account.whitelisted_at = time.time()
+        if self.setup_ledger:
+            self.setup_ledger.mark(account.address, account.device_hash, SETUP_WHITELIST, account.whitelisted_at)
+        return True
+
+    async def whitelist_action(self, account: AccountState) -> Optional[float]:
+        # Dijadwalkan saat respons API menunjukkan whitelist dibatalkan; sekali jalan jika berhasil
+        if not await self._ensure_access_token(account):
+            return self.token_retry_delay_seconds
+        if await self._ensure_whitelisted(account):
+            return None
+        return self.activation_check_interval_seconds
 
-        last_ping_time = 0
-        last_initiate_msg_time = 0
-        last_activation_check_time = 0
-        
-        while True: # Loop utama operasi akun
-            if original_address not in self.access_tokens: # Jika token hilang di tengah jalan
-                self.log_account_specific(masked_address, "Access token hilang, mencoba regenerate...", level="WARNING")
-                if not await self.process_generate_new_token(masked_address, original_address, use_proxy_flag):
-                    self.log_account_specific(masked_address, "Gagal regenerate token. Melewatkan siklus ini.", level="ERROR")
-                    await asyncio.sleep(60) # Tunggu sebelum coba lagi
-                    continue # Kembali ke awal loop while True
-            
-            current_time = asyncio.get_event_loop().time()
-            # Dapatkan proxy untuk siklus operasi ini
-            current_op_proxy = self.get_next_proxy_for_account(original_address) if use_proxy_flag else None
-            current_op_proxy_info = current_op_proxy if current_op_proxy else "Tidak Digunakan"
-            
-            perform_actions_after_activation = False # Flag apakah tindakan inti (ping/initiate) boleh dilakukan
-
-            # --- Pemeriksaan dan Proses Aktivasi ---
-            if current_time - last_activation_check_time > activation_check_interval_seconds:
-                self.log_account_specific(masked_address, "Memeriksa status aktivasi...", level="DEBUG")
-                # Selalu coba matikan dulu untuk memastikan state bersih, kecuali jika API tidak mengizinkan atau error
-                deactivate_response = await self.toggle_device_activation(masked_address, original_address, device_hash, self.access_tokens[original_address], "OFF", current_op_proxy)
-                
-                if deactivate_response is not None and deactivate_response in ["Session ended and daily usage updated", "No action needed", "Session not found to end"]:
-                    self.log_account_specific(masked_address, "", level="INFO", proxy_info=current_op_proxy_info, status_msg=f"Status Deaktivasi: {deactivate_response}. Mencoba aktivasi ON...")
-                    
-                    activate_response = await self.toggle_device_activation(masked_address, original_address, device_hash, self.access_tokens[original_address], "ON", current_op_proxy)
-                    if activate_response is not None and activate_response == "Session started":
-                        self.log_account_specific(masked_address, "", level="SUCCESS", proxy_info=current_op_proxy_info, status_msg="Aktivasi Perangkat (ON) Berhasil.")
-                        perform_actions_after_activation = True
-                    elif activate_response is not None and activate_response == "Session already active for this device":
-                         self.log_account_specific(masked_address, "", level="INFO", proxy_info=current_op_proxy_info, status_msg="Aktivasi Perangkat (ON): Sudah Aktif.")
-                         perform_actions_after_activation = True # Jika sudah aktif, tetap lakukan tindakan
-                    elif activate_response is not None: # Ada respons tapi bukan sukses
-                        self.log_account_specific(masked_address, "", level="ERROR", proxy_info=current_op_proxy_info, status_msg=f"Aktivasi Perangkat (ON) Gagal. Respons: {activate_response}")
-                    else: # activate_response is None (error parah)
-                         self.log_account_specific(masked_address, "", level="ERROR", proxy_info=current_op_proxy_info, status_msg="Aktivasi Perangkat (ON) Gagal (tidak ada respons).")
-
-                elif deactivate_response is not None: # Gagal matikan tapi ada respons
-                    self.log_account_specific(masked_address, "", level="ERROR", proxy_info=current_op_proxy_info, status_msg=f"Deaktivasi (OFF) Gagal: {deactivate_response}. Aktivasi ON tidak dilanjutkan.")
-                else: # Gagal matikan dan tidak ada respons
-                    self.log_account_specific(masked_address, "", level="ERROR", proxy_info=current_op_proxy_info, status_msg="Deaktivasi (OFF) Gagal (tidak ada respons). Aktivasi ON tidak dilanjutkan.")
-                last_activation_check_time = current_time
-            else: # Belum waktunya cek aktivasi, asumsikan state sebelumnya masih valid
-                 if original_address in self.access_tokens : # Minimal token ada
-                    perform_actions_after_activation = True
-
-
-            # --- Tindakan Inti (Ping & Initiate Message) ---
-            if perform_actions_after_activation:
-                # Initiate Message Production
-                if current_time - last_initiate_msg_time > initiate_msg_interval_seconds :
-                    self.log_account_specific(masked_address, "Mengirim initiate message production...", level="DEBUG")
-                    if await self.initiate_message_production(masked_address, original_address, device_hash, self.access_tokens[original_address], current_op_proxy):
-                        self.log_account_specific(masked_address, "", level="SUCCESS", proxy_info=current_op_proxy_info, status_msg="Initiate Message Production Berhasil.")
-                    # else: # Pesan error sudah dari fungsi initiate_message_production
-                    last_initiate_msg_time = current_time
-                
-                # Perform Ping
-                if current_time - last_ping_time > ping_interval_seconds:
-                    self.log_account_specific(masked_address, "Melakukan ping...", level="DEBUG")
-                    if await self.perform_ping(masked_address, original_address, self.access_tokens[original_address], current_op_proxy):
-                        self.log_account_specific(masked_address, "", level="SUCCESS", proxy_info=current_op_proxy_info, status_msg="Ping Berhasil.")
-                    # else: # Pesan error sudah dari fungsi perform_ping
-                    last_ping_time = current_time
-
-            await asyncio.sleep(30) # Jeda utama antar siklus pengecekan di loop utama
+    def _check_setup_undone(self, account: AccountState, response: ApiResponse) -> None:
+        if response.status_code not in SETUP_UNDONE_STATUSES:
+            return
+        if account.whitelisted_at is None:
+            return # Belum tercatat selesai, atau whitelist ulang sudah dijadwalkan
+        account.whitelisted_at = None
+        if self.setup_ledger:
+            self.setup_ledger.forget(account.address, account.device_hash, SETUP_WHITELIST)
+        self.log_account_specific(account.masked, f"HTTP {response.status_code}: whitelist kemungkinan dicabut, entri ledger setup dihapus dan whitelist dijalankan ulang.", level="WARNING")
+        self.scheduler.schedule(account.account_id, "whitelist", 0)
+
+    def _record_result(self, account: AccountState, ok: bool, error: Optional[str] = None) -> None:
+        # Status sehat/gagal per akun untuk --live; hanya perubahan status yang ditulis sebagai baris log
+        if ok:
+            if account.failures and self.live_status:
+                self.log(f"Pulih setelah {account.failures} kegagalan berturut-turut.", level="SUCCESS", account_context=account.masked)
+            account.failures = 0
+            account.last_ok_at = time.time()
+            return
+        account.failures += 1
+        account.last_error = error
+        if account.failures == 1 and self.live_status:
+            self.log(f"Mulai gagal: {error}.", level="WARNING", account_context=account.masked)
+
+    def _note_session(self, account: AccountState, state: str) -> None:
+        # Bukti status sesi dari respons switch/ping/htb-event
+        if state == SESSION_LOST and account.session_state == SESSION_ACTIVE and self.live_status:
+            self.log("Sesi perangkat terputus.", level="WARNING", account_context=account.masked)
+        account.session_state = state
+        account.session_confirmed_at = time.monotonic() if state == SESSION_ACTIVE else None
+
+    def _session_known_active(self, account: AccountState) -> bool:
+        if account.session_state != SESSION_ACTIVE or account.session_confirmed_at is None:
+            return False
+        return time.monotonic() - account.session_confirmed_at <= self.session_evidence_max_age_seconds
+
+    async def _toggle_session(self, account: AccountState, current_op_proxy: Optional[str]) -> bool:
+        masked_address = account.masked
+        current_op_proxy_info = current_op_proxy if current_op_proxy else "Tidak Digunakan"
+        activated = False
+        self.toggles_performed += 1
+
+        # Matikan dulu untuk memastikan state bersih, kecuali jika API tidak mengizinkan atau error
+        self.switch_calls += 1
+        deactivate_response = await self.toggle_device_activation(account, "OFF", current_op_proxy)
+
+        if deactivate_response is not None and deactivate_response.outcome in SESSION_OFF_OUTCOMES:
+            # OFF yang disengaja bukan sesi terputus: status jadi belum diketahui tanpa log transisi
+            self._note_session(account, SESSION_UNKNOWN)
+            self.log_account_specific(masked_address, "", level="INFO", proxy_info=current_op_proxy_info, status_msg=f"Status Deaktivasi: {deactivate_response.outcome.value}. Mencoba aktivasi ON...")
+
+            self.switch_calls += 1
+            activate_response = await self.toggle_device_activation(account, "ON", current_op_proxy)
+            if activate_response is not None and activate_response.outcome is ApiOutcome.SESSION_STARTED:
+                self.log_account_specific(masked_address, "", level="SUCCESS", proxy_info=current_op_proxy_info, status_msg="Aktivasi Perangkat (ON) Berhasil.")
+                activated = True
+            elif activate_response is not None and activate_response.outcome is ApiOutcome.SESSION_ALREADY_ACTIVE:
+                 self.log_account_specific(masked_address, "", level="INFO", proxy_info=current_op_proxy_info, status_msg="Aktivasi Perangkat (ON): Sudah Aktif.")
+                 activated = True # Jika sudah aktif, tetap lakukan tindakan
+            elif activate_response is not None: # Ada respons tapi bukan sukses
+                self.log_account_specific(masked_address, "", level="ERROR", proxy_info=current_op_proxy_info, status_msg=f"Aktivasi Perangkat (ON) Gagal. Respons: {activate_response.preview()}")
+            else: # activate_response is None (error parah)
+                 self.log_account_specific(masked_address, "", level="ERROR", proxy_info=current_op_proxy_info, status_msg="Aktivasi Perangkat (ON) Gagal (tidak ada respons).")
+
+        elif deactivate_response is not None: # Gagal matikan tapi ada respons
+            self.log_account_specific(masked_address, "", level="ERROR", proxy_info=current_op_proxy_info, status_msg=f"Deaktivasi (OFF) Gagal: {deactivate_response.preview()}. Aktivasi ON tidak dilanjutkan.")
+        else: # Gagal matikan dan tidak ada respons
+            self.log_account_specific(masked_address, "", level="ERROR", proxy_info=current_op_proxy_info, status_msg="Deaktivasi (OFF) Gagal (tidak ada respons). Aktivasi ON tidak dilanjutkan.")
+
+        self._note_session(account, SESSION_ACTIVE if activated else SESSION_LOST)
+        if activated:
+            account.activation_blocked_until = 0.0
+        else:
+            self._record_result(account, False, "aktivasi perangkat gagal")
+            # Sama seperti loop lama: ping/initiate dilewati untuk siklus ini saja
+            account.activation_blocked_until = asyncio.get_running_loop().time() + self.cycle_retry_seconds
+        return activated
+
+    async def activation_action(self, account: AccountState) -> Optional[float]:
+        if not await self._ensure_access_token(account):
+            return self.token_retry_delay_seconds
+
+        # Toggle OFF->ON hanya jika tidak ada bukti baru bahwa sesi masih aktif
+        if self._session_known_active(account):
+            self.toggles_skipped += 1
+            self.log_account_specific(account.masked, "Sesi perangkat masih aktif (dikonfirmasi ping/htb-event), toggle dilewati.", level="DEBUG")
+            return self.activation_check_interval_seconds
+
+        current_op_proxy = self.get_next_proxy_for_account(account) if self.use_proxy_flag else None
+        self.log_account_specific(account.masked, "Memeriksa status aktivasi...", level="DEBUG")
+        await self._toggle_session(account, current_op_proxy)
+        return self.activation_check_interval_seconds
+
+    async def _reactivate_if_session_lost(self, account: AccountState, current_op_proxy: Optional[str]) -> Optional[float]:
+        # Dipanggil setelah ping/htb-event gagal: jika respons menunjukkan sesi hilang, aktifkan ulang sekarang
+        if account.session_state != SESSION_LOST:
+            return None
+        self.log_account_specific(account.masked, "Sesi perangkat terputus, mengaktifkan ulang...", level="WARNING")
+        if await self._toggle_session(account, current_op_proxy):
+            return None
+        return self.cycle_retry_seconds
+
+    def _activation_block_remaining(self, account: AccountState) -> float:
+        if not account.activation_blocked_until:
+            return 0
+        remaining = account.activation_blocked_until - asyncio.get_running_loop().time()
+        if remaining <= 0:
+            account.activation_blocked_until = 0.0
+            return 0
+        return remaining
+
+    async def initiate_action(self, account: AccountState) -> Optional[float]:
+        if not await self._ensure_access_token(account):
+            return self.token_retry_delay_seconds
+        blocked = self._activation_block_remaining(account)
+        if blocked:
+            return blocked
+
+        current_op_proxy = self.get_next_proxy_for_account(account) if self.use_proxy_flag else None
+        current_op_proxy_info = current_op_proxy if current_op_proxy else "Tidak Digunakan"
+        self.log_account_specific(account.masked, "Mengirim initiate message production...", level="DEBUG")
+        if await self.initiate_message_production(account, current_op_proxy):
+            self._record_result(account, True)
+            self.log_account_specific(account.masked, "", level="SUCCESS", proxy_info=current_op_proxy_info, status_msg="Initiate Message Production Berhasil.")
+        else: # Pesan error sudah dari fungsi initiate_message_production
+            self._record_result(account, False, "initiate message production gagal")
+            retry_delay = await self._reactivate_if_session_lost(account, current_op_proxy)
+            if retry_delay is not None:
+                return retry_delay
+        return self.initiate_msg_interval_seconds
+
+    async def ping_action(self, account: AccountState) -> Optional[float]:
+        if not await self._ensure_access_token(account):
+            return self.token_retry_delay_seconds
+        blocked = self._activation_block_remaining(account)
+        if blocked:
+            return blocked
+
+        current_op_proxy = self.get_next_proxy_for_account(account) if self.use_proxy_flag else None
+        current_op_proxy_info = current_op_proxy if current_op_proxy else "Tidak Digunakan"
+        self.log_account_specific(account.masked, "Melakukan ping...", level="DEBUG")
+        self.pings_in_flight += 1
+        try:
+            pinged = await self.perform_ping(account, current_op_proxy)
+        finally:
+            self.pings_in_flight -= 1
+        if pinged:
+            self._record_result(account, True)
+            self.log_account_specific(account.masked, "", level="SUCCESS", proxy_info=current_op_proxy_info, status_msg="Ping Berhasil.")
+        else: # Pesan error sudah dari fungsi perform_ping
+            self._record_result(account, False, "ping gagal")
+            self._poll_wallet_soon(account)
+            retry_delay = await self._reactivate_if_session_lost(account, current_op_proxy)
+            if retry_delay is not None:
+                return retry_delay
+        return self.ping_interval_seconds
+
+    async def refresh_token_action(self, account: AccountState) -> Optional[float]:
+        if account.refresh_token is None:
+            self.log_account_specific(account.masked, "Refresh token tidak ada, mencoba generate token baru.", level="WARNING")
+            await self.process_generate_new_token(account, self.use_proxy_flag)
+            if account.refresh_token is None: # Jika masih gagal setelah coba generate
+                self.log_account_specific(account.masked, "Gagal mendapatkan refresh token, skip periodic refresh untuk siklus ini.", level="ERROR")
+                return 5 * 60 # Tunggu sebelum coba lagi dari awal
+
+        await self.token_renewal.do(("refresh", account.account_id), lambda: self._refresh_tokens_once(account))
+        return self._refresh_delay(account)
+
+    async def _refresh_tokens_once(self, account: AccountState) -> bool:
+        if not account.refresh_token:
+            return False
+        proxy = self.get_next_proxy_for_account(account) if self.use_proxy_flag else None
+        proxy_info_str = proxy if proxy else "Tidak Digunakan"
+
+        self.log_account_specific(account.masked, "Mencoba refresh token...", level="DEBUG")
+        refreshed_token_data = await self.refresh_token_api(account, proxy, self.use_proxy_flag)
+
+        if refreshed_token_data and "token" in refreshed_token_data and "refreshToken" in refreshed_token_data:
+            self._store_tokens(account, refreshed_token_data["token"], refreshed_token_data["refreshToken"])
+            self.log_account_specific(account.masked, "", level="SUCCESS", proxy_info=proxy_info_str, status_msg="Refresh Token Berhasil.")
+            return True
+        # Pesan error/warning sudah dari refresh_token_api atau process_generate_new_token di dalamnya
+        # Pastikan token dihapus jika refresh gagal total agar siklus berikutnya coba generate dari awal
+        self._clear_tokens(account)
+        self.log_account_specific(account.masked, "Refresh token gagal dan token lama dihapus. Akan mencoba generate baru di siklus berikutnya.", level="WARNING")
+        return False
+
+    def _record_earnings(self, account: AccountState, total: float) -> float:
+        # Simpan sampel lalu tentukan interval poll berikutnya. Jika kenaikan total cocok (relatif) dengan
+        # tebakan dari laju sebelumnya, interval digandakan (maks wallet_max_interval_seconds); jika meleset
+        # atau pendapatan tidak naik sama sekali, kembali ke dasar supaya akun macet cepat terlihat.
+        now = time.monotonic()
+        if self.earnings_store:
+            self.earnings_store.append(account.address, total)
+        interval = self.wallet_interval_seconds
+        previous_ts, previous_total = account.earnings_ts, account.earnings_total
+        account.earnings_ts, account.earnings_total = now, total
+        if previous_ts is None or previous_total is None or now <= previous_ts:
+            account.wallet_interval = interval
+            return interval
+
+        elapsed = now - previous_ts
+        gained = total - previous_total
+        if gained <= 0:
+            account.earnings_rate = None
+            account.wallet_interval = interval
+            return interval
+        observed_rate = gained / elapsed
+        expected_rate = account.earnings_rate
+        if expected_rate:
+            predicted = expected_rate * elapsed
+            if abs(gained - predicted) <= self.wallet_stable_tolerance * predicted:
+                interval = min((account.wallet_interval or interval) * 2, self.wallet_max_interval_seconds)
+        account.earnings_rate = observed_rate if expected_rate is None else 0.5 * expected_rate + 0.5 * observed_rate
+        account.wallet_interval = interval
+        return interval
+
+    def _poll_wallet_soon(self, account: AccountState) -> None:
+        # Ping gagal: pendapatan mungkin berhenti, jadi back-off dibatalkan dan wallet dicek lebih awal
+        if (account.wallet_interval or self.wallet_interval_seconds) <= self.wallet_interval_seconds:
+            return
+        account.wallet_interval = self.wallet_interval_seconds
+        account.earnings_rate = None
+        soon = time.monotonic() + self.wallet_after_ping_failure_seconds
+        account.wallet_next_poll_at = soon if account.wallet_next_poll_at is None else min(account.wallet_next_poll_at, soon)
+
+    async def wallet_details_action(self, account: AccountState) -> Optional[float]:
+        masked_address = account.masked
+        if account.access_token is None:
+            self.log_account_specific(masked_address, "Access token tidak ada, skip get wallet details.", level="WARNING")
+            return 5 * 60
+
+        now = time.monotonic()
+        if account.wallet_next_poll_at is not None and account.wallet_next_poll_at > now:
+            return min(account.wallet_next_poll_at - now, self.wallet_wakeup_seconds)
+        if account.wallet_polled_at is not None:
+            # Poll yang akan dikirim dengan interval dasar tetap sejak poll terakhir, tapi dilewati karena back-off
+            self.wallet_polls_skipped += max(0, int((now - account.wallet_polled_at) // self.wallet_interval_seconds) - 1)
+        account.wallet_polled_at = now
+
+        proxy = self.get_next_proxy_for_account(account) if self.use_proxy_flag else None
+        proxy_info_str = proxy if proxy else "Tidak Digunakan"
+        self.log_account_specific(masked_address, "Mengambil detail wallet...", level="DEBUG")
+        self.wallet_polls += 1
+        used_access_token = account.access_token
+        details = await self.get_wallet_details(account, proxy)
+
+        if details is not None and details.ok and isinstance(details.data.get("message"), dict):
+            total_earnings = details.data["message"].get("totalEarnings", "N/A")
+            self.log_account_specific(masked_address, "", level="INFO", proxy_info=proxy_info_str, status_msg=f"Total Pendapatan: {total_earnings} PTS")
+            if isinstance(total_earnings, (int, float)) and not isinstance(total_earnings, bool):
+                interval = self._record_earnings(account, float(total_earnings))
+                account.wallet_next_poll_at = time.monotonic() + interval
+                return min(interval, self.wallet_wakeup_seconds)
+        elif details is not None and not details.ok:
+            if details.status_code == 401 or details.outcome is ApiOutcome.INVALID_TOKEN:
+                self.log_account_specific(masked_address, "", level="WARNING", proxy_info=proxy_info_str, status_msg="Token tidak valid saat ambil detail wallet.")
+                # Hapus token agar di-generate ulang, kecuali token sudah diperbarui oleh renewal lain sementara itu
+                if account.access_token == used_access_token:
+                    self._clear_tokens(account, access_only=True)
+            else: # Error lain
+                self.log_account_specific(masked_address, "", level="ERROR", proxy_info=proxy_info_str, status_msg=f"Gagal ambil detail wallet: {self._error_message(details)}")
+        else: # Respons tidak dikenal
+            self.log_account_specific(masked_address, "", level="WARNING", proxy_info=proxy_info_str, status_msg="Gagal mengambil detail wallet (respons tidak dikenal).")
+
+        return self.wallet_interval_seconds
+
+    def request_shutdown(self, signame: str = "SIGTERM") -> None:
+        if self.shutdown_event is not None and self.shutdown_event.is_set():
+            self.log(f"{signame} diterima lagi, shutdown sudah berjalan.", level="WARNING")
+            return
+        self.log(f"{signame} diterima: berhenti menjadwalkan aksi dan menyelesaikan request yang berjalan...", level="WARNING")
+        if self.shutdown_event is None:
+            self.shutdown_event = asyncio.Event() # run_accounts belum mulai; event yang sudah di-set dipakai saat mulai
+        self.shutdown_event.set()
+
+    def _install_signal_handlers(self) -> List[int]:
+        loop = asyncio.get_running_loop()
+        handlers: List[Tuple[int, Callable, Tuple]] = [
+            (signal.SIGTERM, self.request_shutdown, ("SIGTERM",)),
+            (signal.SIGINT, self.request_shutdown, ("SIGINT",)),
+        ]
+        if hasattr(signal, "SIGUSR1"): # Tidak ada di Windows
+            handlers.append((signal.SIGUSR1, self.toggle_profiling, ()))
+            handlers.append((signal.SIGUSR2, self.dump_profile, ()))
+        installed = []
+        for signum, callback, callback_args in handlers:
+            try:
+                loop.add_signal_handler(signum, callback, *callback_args)
+            except (NotImplementedError, RuntimeError, ValueError): # Windows atau bukan thread utama
+                continue
+            installed.append(signum)
+        return installed
+
+    def toggle_profiling(self) -> None:
+        if self.profiler.enabled:
+            self.stop_profiling()
+        else:
+            self.start_profiling()
+
+    def start_profiling(self) -> None:
+        if self.profiler.enabled:
+            return
+        self.profiler.reset()
+        self.profiler.enable()
+        self._profile_report_task = asyncio.get_running_loop().create_task(self._profile_report_loop())
+        self.log(f"Profiling aktif (laporan tiap {self.profile_report_interval_seconds:.0f} detik, SIGUSR2 = dump profil, SIGUSR1 = matikan).", level="INFO")
+        unsupported = self.profiler.unsupported()
+        if unsupported:
+            self.log(f"Profiling tanpa {', '.join(unsupported)}: tidak didukung versi Python ini.", level="WARNING")
+
+    def stop_profiling(self) -> None:
+        if not self.profiler.enabled:
+            return
+        if self._profile_report_task is not None:
+            self._profile_report_task.cancel()
+            self._profile_report_task = None
+        self.profiler.disable()
+        self._log_profile_report()
+        self.dump_profile()
+        self.log("Profiling dimatikan.", level="INFO")
+
+    def dump_profile(self) -> None:
+        try:
+            path = self.profiler.dump()
+        except OSError as e:
+            self.log(f"Gagal menulis dump profil: {e}", level="ERROR")
+            return
+        if path:
+            self.log(f"Dump sampling profiler ({self.profiler.sample_count} sampel) ditulis ke {path}", level="INFO")
+        else:
+            self.log("Belum ada sampel profil untuk di-dump (profiling belum aktif?).", level="WARNING")
+
+    def _log_profile_report(self) -> None:
+        loop = asyncio.get_running_loop()
+        executor_depth = executor_queue_depth(loop)
+        self.log(f"[PROFIL] Antrean log: {self.logger.queue_depth} | Antrean executor: {'n/a' if executor_depth is None else executor_depth} | "
+                 f"HTTP in-flight: {self.http.in_flight} | Heap scheduler: {len(self.scheduler)} | Akun sibuk: {len(self.scheduler._busy)}", level="INFO")
+        for line in self.profiler.summary():
+            self.log(f"[PROFIL] {line}", level="INFO")
+
+    async def _profile_report_loop(self):
+        while True:
+            await asyncio.sleep(self.profile_report_interval_seconds)
+            self._log_profile_report()
+
+    def _log_rate_report(self) -> None:
+        span = max(1, int(self.rps_report_interval_seconds))
+        stats = self.rate_curve.summary(time.monotonic(), span)
+        self.rate_curve.peak_in_flight = 0 # Puncak in-flight dihitung per jendela laporan
+        peak_bucket = max(stats["curve"], default=0.0)
+        sparkline = "".join(RATE_SPARK_CHARS[min(len(RATE_SPARK_CHARS) - 1, int(value / peak_bucket * (len(RATE_SPARK_CHARS) - 1) + 0.5))] if peak_bucket else RATE_SPARK_CHARS[0]
+                            for value in stats["curve"])
+        self.log(f"Beban {span} dtk terakhir: rata-rata {stats['avg']:.2f} req/s, EWMA {stats['smoothed']:.2f}, puncak 1 dtk {stats['peak']} "
+                 f"(p99 {stats['p99']}), CV {stats['cv']:.2f}, in-flight puncak {stats['peak_in_flight']}", level="INFO")
+        self.log(f"Kurva req/s (per {stats['bucket_seconds']} dtk, puncak {peak_bucket:.1f}): {sparkline}", level="INFO")
+
+    async def _rate_report_loop(self):
+        while True:
+            await asyncio.sleep(self.rps_report_interval_seconds)
+            self._log_rate_report()
+
+    def _render_live_status(self) -> None:
+        lines = self.live_status.render(self.accounts, self.metrics.requests, self.pings_in_flight)
+        if self.live_status.redraw:
+            try:
+                sys.stdout.write(LiveStatusView.CLEAR_SCREEN + "\n".join(lines) + "\n")
+                sys.stdout.flush()
+            except (OSError, ValueError):
+                pass
+        else:
+            separator = C_SEPARATOR + "-" * 60 + Style.RESET_ALL
+            self.logger.write_block("\n".join([separator, *lines, separator]))
+
+    async def _live_status_loop(self):
+        if self.live_status.redraw:
+            self.logger.flush()
+            self.logger.console = False # Baris log digantikan daftar kejadian di bawah tabel
+        try:
+            while True:
+                await asyncio.sleep(self.live_status.interval)
+                self._render_live_status()
+        finally:
+            self.logger.console = True
+
+    async def _memory_watchdog_loop(self):
+        watchdog = self.memory_watchdog
+        watchdog.start()
+        self.log(f"Watchdog memori aktif: snapshot tracemalloc tiap {watchdog.interval:.0f} detik, laporan di '{watchdog.report_path}'.", level="INFO")
+        try:
+            while True:
+                await asyncio.sleep(watchdog.interval)
+                try:
+                    result = await asyncio.to_thread(watchdog.check, len(self.accounts), len(asyncio.all_tasks()))
+                except OSError as e:
+                    self.log(f"Gagal menulis laporan memori '{watchdog.report_path}': {e}", level="WARNING")
+                    continue
+                self.log(f"Memori: RSS {result['rss_mb']:.1f} MB, tracemalloc {result['traced_mb']:.1f} MB, {result['per_account_kb']:.1f} KiB/akun.", level="DEBUG")
+                if not result["over_budget"]:
+                    continue
+                message = (f"Memori {result['per_account_kb']:.1f} KiB/akun melebihi anggaran {watchdog.budget_kb_per_account:.0f} KiB/akun "
+                           f"(lihat '{watchdog.report_path}').")
+                if watchdog.action == "restart":
+                    self.log(f"{message} Restart terkendali: shutdown bertahap lalu proses dijalankan ulang.", level="WARNING")
+                    self.restart_requested = True
+                    self.request_shutdown("Sinyal restart watchdog memori")
+                    return
+                self.log(message, level="WARNING")
+        finally:
+            watchdog.stop()
+
+    async def _switch_off_sessions(self) -> Tuple[int, int]:
+        # Matikan sesi perangkat yang masih aktif, dibatasi shutdown_concurrency request bersamaan
+        active_accounts = [account for account in self.accounts
+                           if account.session_state == SESSION_ACTIVE and account.access_token is not None]
+        if not active_accounts:
+            return 0, 0
+        semaphore = asyncio.Semaphore(self.shutdown_concurrency)
+        switched_off = 0
+
+        async def switch_off(account: AccountState):
+            nonlocal switched_off
+            async with semaphore:
+                proxy = self.get_next_proxy_for_account(account) if self.use_proxy_flag else None
+                self.switch_calls += 1
+                response = await self.toggle_device_activation(account, "OFF", proxy, retries=1)
+                if response is not None:
+                    self._note_session(account, SESSION_UNKNOWN) # Dimatikan sengaja, bukan terputus
+                    switched_off += 1
+
+        self.log(f"Mengirim switch OFF untuk {len(active_accounts)} sesi aktif ({self.shutdown_concurrency} bersamaan)...", level="INFO")
+        try:
+            await asyncio.wait_for(asyncio.gather(*(switch_off(account) for account in active_accounts)), timeout=self.shutdown_off_timeout_seconds)
+        except asyncio.TimeoutError:
+            self.log(f"Batas waktu switch OFF ({self.shutdown_off_timeout_seconds:.0f} detik) habis.", level="WARNING")
+        return switched_off, len(active_accounts)
+
+    def _checkpoint_rows(self) -> List[Tuple[str, Optional[float], Optional[float], Optional[float], Optional[float], Optional[float]]]:
+        # Waktu monotonic dikonversi ke wall clock supaya tetap berarti di proses berikutnya
+        offset = time.time() - time.monotonic()
+        return [
+            (account.address, account.wallet_interval,
+             account.wallet_next_poll_at + offset if account.wallet_next_poll_at is not None else None,
+             account.earnings_ts + offset if account.earnings_ts is not None else None, account.earnings_total,
+             account.earnings_rate)
+            for account in self.accounts
+        ]
+
+    def _restore_checkpoint(self, account: AccountState) -> None:
+        entry = self._checkpoint.get(account.address)
+        if entry is None:
+            return
+        wallet_interval, next_poll_at, earnings_ts, earnings_total, earnings_rate = entry
+        offset = time.time() - time.monotonic()
+        account.wallet_interval = wallet_interval
+        account.wallet_next_poll_at = next_poll_at - offset if next_poll_at is not None else None
+        if earnings_ts is not None and earnings_total is not None:
+            account.earnings_ts, account.earnings_total = earnings_ts - offset, earnings_total
+        account.earnings_rate = earnings_rate
+
+    def _restore_setup(self, account: AccountState, from_store: bool = False) -> None:
+        completed_at = self._setup_done.pop((account.address, account.device_hash), None)
+        if completed_at is None and from_store and self.setup_ledger:
+            try:
+                completed_at = self.setup_ledger.get(account.address, account.device_hash, SETUP_WHITELIST)
+            except sqlite3.Error:
+                completed_at = None
+        account.whitelisted_at = completed_at
+
+    async def shutdown(self) -> None:
+        still_running = await self.scheduler.drain(self.drain_timeout_seconds)
+        if still_running:
+            self.log(f"{still_running} akun masih menjalankan aksi setelah {self.drain_timeout_seconds:.0f} detik, dihentikan paksa.", level="WARNING")
+        switched_off, active = await self._switch_off_sessions()
+        if active:
+            self.log(f"Switch OFF: {switched_off}/{active} sesi dimatikan.", level="INFO")
+        if self.checkpoint_store:
+            try:
+                saved = await asyncio.to_thread(self.checkpoint_store.save, self._checkpoint_rows())
+                self.log(f"Checkpoint {saved} akun disimpan ke '{self.checkpoint_store.path}'.", level="INFO")
+            except sqlite3.Error as e:
+                self.log(f"Gagal menyimpan checkpoint: {e}", level="ERROR")
+
+    async def run_daemon(self, use_proxy_flag: bool):
+        # Mode non-interaktif: tanpa clear terminal dan prompt proxy, cocok untuk systemd/docker
+        self.use_proxy_flag = use_proxy_flag
+        if use_proxy_flag:
+            await self.load_proxies_from_local_file()
+            if not self.proxies:
+                self.log(f"Tidak ada proxy yang tersedia di '{self.proxy_file}'. Melanjutkan tanpa proxy.", level="WARNING")
+                self.use_proxy_flag = False
+        await self.run_accounts(self.iter_accounts_from_file())
 
     async def run_bot(self):
         self.clear_terminal()
         self.display_banner()
 
-        accounts = self.load_accounts_from_file()
-        if not accounts:
+        accounts = self.iter_accounts_from_file()
+        first_account = next(accounts, None)
+        if first_account is None:
             self.log("Tidak ada akun yang dimuat. Bot berhenti.", level="ERROR")
             return
 
@@ -595,36 +3094,552 @@ class NaorisProtocolAutomation:
             if not self.proxies:
                 self.log("Tidak ada proxy yang tersedia di 'proxies.txt'. Melanjutkan tanpa proxy.", level="WARNING")
                 use_proxy_flag = False # Set ulang flag jika tidak ada proxy
+        self.use_proxy_flag = use_proxy_flag
 
-        self.log(f"Memulai proses untuk {len(accounts)} akun...", level="INFO")
+        await self.run_accounts(itertools.chain([first_account], accounts))
 
-        tasks = []
-        for account_data in accounts:
-            original_address = account_data["Address"].lower()
+    def _file_signature(self, path: str) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _start_account(self, original_address: str, device_hash: int, restore_from_store: bool = False) -> bool:
+        account = self.accounts.add(original_address, self._mask_address(original_address), device_hash)
+        restored = self._restore_tokens(account, from_store=restore_from_store)
+        self._restore_checkpoint(account)
+        self._restore_setup(account, from_store=restore_from_store)
+        self.scheduler.schedule(account.account_id, "setup", 0)
+        return restored
+
+    def _stop_account(self, original_address: str) -> None:
+        # Token hanya dilepas dari memori; salinan di token store tetap ada untuk dipakai lagi
+        account = self.accounts.remove(original_address)
+        if account is None:
+            return
+        self.scheduler.cancel_account(account.account_id)
+        if self.routes:
+            self.routes.release(account.account_id)
+        if self.earnings_store:
+            self.earnings_store.forget(account.address)
+
+    async def reload_accounts(self) -> Tuple[int, int, int]:
+        new_accounts: Dict[str, int] = {}
+        # Error baca/dekode diteruskan ke watch_accounts_file sebelum akun mana pun dihentikan
+        for account_data in self.iter_accounts_from_file(strict=True):
             try:
-                device_hash = int(str(account_data["deviceHash"]))
+                new_accounts[account_data["Address"].lower()] = int(str(account_data["deviceHash"]))
             except ValueError:
-                self.log(f"Akun dengan alamat {C_WARNING}{self._mask_address(original_address)}{C_ERROR} memiliki deviceHash tidak valid: {C_WARNING}{account_data['deviceHash']}{C_ERROR}. Akun ini dilewati.", level="ERROR")
+                continue # Dilaporkan saat start pertama; akun dengan deviceHash rusak tidak dijalankan
+
+        removed = [account.address for account in self.accounts if account.address not in new_accounts]
+        changed = [account.address for account in self.accounts
+                   if account.address in new_accounts and new_accounts[account.address] != account.device_hash]
+        added = [address for address in new_accounts if address not in self.accounts]
+
+        for original_address in removed + changed:
+            self._stop_account(original_address)
+        for original_address in changed + added:
+            await self.start_ramp.acquire()
+            self._start_account(original_address, new_accounts[original_address], restore_from_store=True)
+        return len(added), len(removed), len(changed)
+
+    async def watch_accounts_file(self):
+        while True:
+            await asyncio.sleep(self.watch_accounts_interval)
+            signature = self._file_signature(self.accounts_file)
+            if signature is None or signature == self._accounts_file_signature:
                 continue
-            
-            masked_address = self._mask_address(original_address)
-
-            # Membuat tasks untuk setiap akun
-            tasks.append(asyncio.create_task(self.main_account_operations_task(original_address, device_hash, use_proxy_flag)))
-            tasks.append(asyncio.create_task(self.periodic_refresh_token_task(masked_address, original_address, use_proxy_flag)))
-            tasks.append(asyncio.create_task(self.periodic_wallet_details_task(masked_address, original_address, use_proxy_flag)))
-            
-            await asyncio.sleep(1) # Jeda singkat antar start task akun agar tidak membanjiri API sekaligus
-
-        if tasks:
-            await asyncio.gather(*tasks)
-        else:
-            self.log("Tidak ada tugas yang valid yang dibuat untuk akun.", level="WARNING")
+            self.log(f"Perubahan terdeteksi di '{self.accounts_file}', memuat ulang akun...", level="INFO")
+            try:
+                added, removed, changed = await self.reload_accounts()
+            except Exception as e:
+                self.log(f"Gagal memuat ulang akun: {e}. Akun yang berjalan dipertahankan, dicoba lagi pada pengecekan berikutnya.", level="ERROR")
+                continue
+            self.log(f"Hot reload selesai: {added} akun baru, {removed} dihapus, {changed} deviceHash berubah. Total akun aktif: {len(self.accounts)}.", level="SUCCESS")
+
+    def worker_stats(self, worker_index: int) -> Dict[str, Any]:
+        requests_total = 0
+        request_errors = 0
+        for (_, _, status), count in self.metrics.requests.values.items():
+            requests_total += count
+            if not status.startswith("2"):
+                request_errors += count
+        rss_mb = read_rss_mb()
+        return {
+            "worker": worker_index, "pid": os.getpid(), "time": time.time(),
+            "accounts": len(self.accounts), "accounts_with_token": self.accounts.count(lambda account: account.access_token is not None),
+            "requests": requests_total, "request_errors": request_errors,
+            "in_flight": self.http.in_flight, "rss_mb": rss_mb,
+        }
+
+    async def _report_worker_stats(self, stats_queue, worker_index: int, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            stats_queue.put(self.worker_stats(worker_index))
+
+    async def run_worker(self, use_proxy_flag: bool, stats_queue, worker_index: int, stats_interval: float = 15.0):
+        # Dijalankan di proses worker: tanpa prompt, akun disaring lewat consistent hashing
+        self.use_proxy_flag = use_proxy_flag
+        if use_proxy_flag:
+            await self.load_proxies_from_local_file()
+            self.use_proxy_flag = bool(self.proxies)
+        reporter = asyncio.create_task(self._report_worker_stats(stats_queue, worker_index, stats_interval))
+        try:
+            await self.run_accounts(self.iter_accounts_from_file())
+        finally:
+            reporter.cancel()
+            stats_queue.put(self.worker_stats(worker_index))
+
+    async def run_accounts(self, accounts: Iterable[Dict[str, Any]]):
+        # Bagian non-interaktif dari run_bot: dipakai juga oleh loadtest.py.
+        # accounts boleh berupa iterator; akun dimulai sambil file masih dibaca.
+        self.log("Memulai proses akun...", level="INFO")
+        self.load_persisted_tokens()
+        if self.checkpoint_store:
+            try:
+                self._checkpoint = self.checkpoint_store.load()
+            except sqlite3.Error as e:
+                self.log(f"Gagal membaca checkpoint dari '{self.checkpoint_store.path}': {e}", level="WARNING")
+        if self.setup_ledger:
+            try:
+                self._setup_done = self.setup_ledger.load(SETUP_WHITELIST)
+            except sqlite3.Error as e:
+                self.log(f"Gagal membaca ledger setup dari '{self.setup_ledger.path}': {e}", level="WARNING")
+        if self.shutdown_event is None:
+            self.shutdown_event = asyncio.Event()
+        signal_handlers = self._install_signal_handlers()
+        if self.profile_on_start:
+            self.start_profiling()
+
+        metrics_server = None
+        if self.metrics_port:
+            try:
+                metrics_server = await self.metrics.serve("127.0.0.1", self.metrics_port)
+                self.log(f"Metrik tersedia di http://127.0.0.1:{self.metrics_port}/metrics", level="INFO")
+            except OSError as e:
+                self.log(f"Gagal membuka port metrik {self.metrics_port}: {e}", level="WARNING")
+
+        scheduler_task = asyncio.create_task(self.scheduler.run())
+        writer_task = asyncio.create_task(self.token_store.run_writer()) if self.token_store else None
+        earnings_task = asyncio.create_task(self.earnings_store.run_writer()) if self.earnings_store else None
+        ledger_task = asyncio.create_task(self.setup_ledger.run_writer()) if self.setup_ledger else None
+        watcher_task = None
+        live_task = asyncio.create_task(self._live_status_loop()) if self.live_status else None
+        memory_task = asyncio.create_task(self._memory_watchdog_loop()) if self.memory_watchdog else None
+        rate_task = asyncio.create_task(self._rate_report_loop()) if self.rps_report_interval_seconds else None
+        try:
+            started = 0
+            restored = 0
+            for account_data in accounts:
+                if self.shutdown_event.is_set():
+                    break
+                original_address = account_data["Address"].lower()
+                try:
+                    device_hash = int(str(account_data["deviceHash"]))
+                except ValueError:
+                    self.log(f"Akun dengan alamat {C_WARNING}{self._mask_address(original_address)}{C_ERROR} memiliki deviceHash tidak valid: {C_WARNING}{account_data['deviceHash']}{C_ERROR}. Akun ini dilewati.", level="ERROR")
+                    continue
+
+                # Start akun diatur token bucket (default 1 akun/detik seperti sebelumnya)
+                await self.start_ramp.acquire()
+                if self._start_account(original_address, device_hash):
+                    restored += 1
+                started += 1
+
+            self._stored_tokens = {}
+            self._checkpoint = {}
+            self._setup_done = {}
+            if not started:
+                if self.shutdown_event.is_set():
+                    self.log("Shutdown diminta sebelum akun dimulai.", level="INFO")
+                else:
+                    self.log("Tidak ada tugas yang valid yang dibuat untuk akun.", level="WARNING")
+                return
+            self.log(f"{started} akun dijadwalkan ({restored} dengan token tersimpan).", level="INFO")
+            if self.watch_accounts_interval and not self.shutdown_event.is_set():
+                watcher_task = asyncio.create_task(self.watch_accounts_file())
+            shutdown_wait = asyncio.create_task(self.shutdown_event.wait())
+            try:
+                await asyncio.wait([scheduler_task, shutdown_wait], return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                shutdown_wait.cancel()
+            if self.shutdown_event.is_set():
+                if watcher_task:
+                    watcher_task.cancel()
+                await self.shutdown()
+            elif scheduler_task.done():
+                scheduler_task.result() # Scheduler berhenti sendiri hanya jika error
+        finally:
+            self.stop_profiling()
+            for signum in signal_handlers:
+                asyncio.get_running_loop().remove_signal_handler(signum)
+            background_tasks = [task for task in (scheduler_task, writer_task, earnings_task, ledger_task, watcher_task, live_task, memory_task, rate_task) if task]
+            for task in background_tasks:
+                task.cancel()
+            await asyncio.gather(*background_tasks, return_exceptions=True)
+            if live_task:
+                self.live_status.redraw = False
+                self._render_live_status() # Ringkasan akhir tetap terlihat setelah keluar
+            if metrics_server is not None:
+                metrics_server.close()
+            if self.token_store:
+                self.token_store.close()
+            if self.earnings_store:
+                self.earnings_store.close()
+            if self.setup_ledger:
+                self.setup_ledger.close()
+            if self.state_db:
+                self.state_db.close()
+            await self.http.close()
+            self.log(f"Renewal token: {self.token_renewal.executed} dijalankan, {self.token_renewal.saved} panggilan redundan dihemat (single-flight).", level="INFO")
+            self.log(f"Whitelist: {self.whitelist_calls} request addWhitelist, {self.whitelist_skipped} dilewati (ledger setup).", level="INFO")
+            self.log(f"Wallet: {self.wallet_polls} request wallet-details, {self.wallet_polls_skipped} poll dilewati (polling adaptif).", level="INFO")
+            self.log(f"Aktivasi: {self.toggles_performed} toggle ({self.switch_calls} panggilan switch), {self.toggles_skipped} pengecekan dilewati karena sesi masih aktif.", level="INFO")
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Naoris Protocol multi-account bot.")
+    parser.add_argument("--config", help="File JSON berisi opsi (kunci = nama flag, contoh {\"max-concurrency\": 500}); flag di CLI tetap menang")
+    parser.add_argument("--daemon", action="store_true", help="Mode non-interaktif: tanpa clear terminal dan prompt proxy")
+    parser.add_argument("--proxy", action="store_true", help="Gunakan proxies.txt tanpa bertanya (mode --daemon)")
+    parser.add_argument("--drain-timeout", type=float, default=30.0, help="Batas waktu menunggu aksi berjalan saat SIGTERM (detik, default: 30)")
+    parser.add_argument("--shutdown-concurrency", type=int, default=20, help="Jumlah switch OFF bersamaan saat shutdown (default: 20)")
+    parser.add_argument("--max-concurrency", type=int, default=200, help="Batas request HTTP bersamaan (default: 200)")
+    parser.add_argument("--workers", type=int, default=200, help="Jumlah worker scheduler (default: 200)")
+    parser.add_argument("--state-db", default="naoris_state.db", help="File SQLite untuk token tersimpan; '' untuk menonaktifkan")
+    parser.add_argument("--log-level", default="DEBUG", choices=["DEBUG", "INFO", "SUCCESS", "WARNING", "ERROR"], help="Level log minimum")
+    parser.add_argument("--log-json", help="Tulis juga log sebagai JSON lines ke file ini")
+    parser.add_argument("--metrics-port", type=int, help="Buka endpoint metrik Prometheus di 127.0.0.1:<port>/metrics")
+    parser.add_argument("--accounts-file", default="accounts.json", help="File akun: JSON array atau JSON Lines (default: accounts.json)")
+    parser.add_argument("--shard", type=parse_shard, help="Hanya jalankan bagian i dari N (format i/N, i mulai dari 0)")
+    parser.add_argument("--start-rate", type=float, default=1.0, help="Laju start akun per detik; 0 = tanpa jeda (default: 1)")
+    parser.add_argument("--start-burst", type=float, default=1.0, help="Jumlah akun yang boleh start sekaligus (default: 1)")
+    parser.add_argument("--watch-accounts", type=float, nargs="?", const=10.0, metavar="DETIK",
+                        help="Muat ulang file akun otomatis saat berubah (cek tiap DETIK, default 10)")
+    parser.add_argument("--processes", type=int, default=1, help="Jalankan N proses worker di bawah supervisor (default: 1 = tanpa supervisor)")
+    parser.add_argument("--stats-interval", type=float, default=60.0, help="Interval ringkasan statistik worker di supervisor (detik)")
+    parser.add_argument("--profile", action="store_true", help="Aktifkan profiling sejak start (bisa juga dinyalakan/dimatikan dengan SIGUSR1)")
+    parser.add_argument("--profile-dir", default=".", help="Folder untuk dump sampling profiler (default: folder saat ini)")
+    parser.add_argument("--profile-interval", type=float, default=30.0, help="Interval laporan profiling (detik, default: 30)")
+    parser.add_argument("--live", type=float, nargs="?", const=5.0, metavar="DETIK",
+                        help="Tampilkan tabel status ringkas tiap DETIK (default 5) menggantikan log sukses per akun")
+    parser.add_argument("--memory-watchdog", type=float, nargs="?", const=600.0, metavar="DETIK",
+                        help="Snapshot tracemalloc tiap DETIK (default 600) dan tulis laporan pertumbuhan memori")
+    parser.add_argument("--memory-report", default="naoris_memory.log", help="File laporan watchdog memori (default: naoris_memory.log)")
+    parser.add_argument("--memory-budget-kb", type=float, help="Anggaran memori (RSS) per akun dalam KiB untuk watchdog")
+    parser.add_argument("--memory-budget-action", choices=("warn", "restart"), default="warn",
+                        help="Saat anggaran terlampaui: warn = log peringatan, restart = shutdown bertahap lalu jalankan ulang proses")
+    parser.add_argument("--setup-ttl", type=float, default=168.0,
+                        help="Langkah setup (addWhitelist) yang tercatat di --state-db diverifikasi ulang setelah N jam (default: 168)")
+    parser.add_argument("--shape", action="store_true",
+                        help="Sebar fase ping/initiate/aktivasi/wallet per akun (hash alamat) agar request tidak datang serentak")
+    parser.add_argument("--host-rps", type=float, default=0.0, help="Batas laju request global per host (req/detik, 0 = tanpa batas)")
+    parser.add_argument("--host-burst", type=float, default=10.0, help="Burst batas laju per host (default: 10)")
+    parser.add_argument("--rps-report", type=float, metavar="DETIK",
+                        help="Log kurva req/s (rata-rata, EWMA, puncak, CV) tiap DETIK (default 300 jika --shape)")
+    parser.add_argument("--user-agent-file", default="naoris_user_agent.txt", help="Cache User-Agent terpilih; '' untuk memilih ulang tiap start")
+    parser.add_argument("--startup-timing", action="store_true", help="Ukur waktu import dan inisialisasi lalu keluar")
+    parser.add_argument("--earnings-report", action="store_true", help="Cetak laporan pendapatan dari --state-db lalu keluar")
+    parser.add_argument("--earnings-retention", type=float, default=30.0,
+                        help="Sampel pendapatan di --state-db yang lebih tua dari N hari dihapus (default: 30, 0 = simpan semua)")
+    parser.add_argument("--report-window", type=float, default=24.0, help="Jendela laju pendapatan di laporan (jam, default: 24)")
+    parser.add_argument("--stall-hours", type=float, default=6.0, help="Akun dianggap macet jika total tidak naik selama N jam (default: 6)")
+    parser.add_argument("--report-top", type=int, default=20, help="Jumlah akun teratas/terbawah yang ditampilkan (default: 20)")
+    parser.add_argument("--base-url", default="https://naorisprotocol.network", help=argparse.SUPPRESS)
+    parser.add_argument("--ping-url", default="https://beat.naorisprotocol.network", help=argparse.SUPPRESS)
+
+    config_args, _ = parser.parse_known_args(argv)
+    if config_args.config:
+        parser.set_defaults(**load_config_file(parser, config_args.config))
+    return parser.parse_args(argv)
+
+
+def load_config_file(parser: argparse.ArgumentParser, path: str) -> Dict[str, Any]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            config = json.load(f)
+    except (OSError, ValueError) as e:
+        parser.error(f"gagal membaca config '{path}': {e}")
+    if not isinstance(config, dict):
+        parser.error(f"config '{path}' harus berupa objek JSON")
+    actions = {action.dest: action for action in parser._actions if action.dest not in ("help", "config")}
+    defaults: Dict[str, Any] = {}
+    for key, value in config.items():
+        dest = key.lstrip("-").replace("-", "_")
+        action = actions.get(dest)
+        if action is None:
+            parser.error(f"opsi tidak dikenal di config '{path}': {key}")
+        # Nilai string dilewatkan ke type flag (misal shard "0/4"), sama seperti dari CLI
+        if isinstance(value, str) and action.type is not None:
+            try:
+                value = action.type(value)
+            except (argparse.ArgumentTypeError, ValueError) as e:
+                parser.error(f"nilai '{key}' di config '{path}' tidak valid: {e}")
+        defaults[dest] = value
+    return defaults
+
+
+def parse_shard(value: str) -> Tuple[int, int]:
+    try:
+        index_str, count_str = value.split("/", 1)
+        shard_index, shard_count = int(index_str), int(count_str)
+    except ValueError:
+        raise argparse.ArgumentTypeError("format shard harus i/N, contoh 0/4")
+    if shard_count < 1 or not 0 <= shard_index < shard_count:
+        raise argparse.ArgumentTypeError("shard harus memenuhi 0 <= i < N")
+    return shard_index, shard_count
+
+
+def build_bot(args: argparse.Namespace, worker: Optional[Tuple[int, int]] = None) -> NaorisProtocolAutomation:
+    metrics_port = args.metrics_port
+    if metrics_port and worker:
+        metrics_port += worker[0] # Tiap worker membuka port metriknya sendiri
+    bot = NaorisProtocolAutomation(
+        max_concurrency=args.max_concurrency, scheduler_workers=args.workers, state_db_file=args.state_db or None,
+        log_level=args.log_level, log_json_file=args.log_json, metrics_port=metrics_port,
+        start_rate=args.start_rate, start_burst=args.start_burst, shard=args.shard, worker=worker,
+        watch_accounts_interval=args.watch_accounts, user_agent_file=args.user_agent_file or None
+    )
+    bot.accounts_file = args.accounts_file
+    bot.drain_timeout_seconds = args.drain_timeout
+    bot.profile_on_start = args.profile
+    bot.profile_report_interval_seconds = args.profile_interval
+    bot.profiler.output_dir = args.profile_dir
+    bot.shutdown_concurrency = max(1, args.shutdown_concurrency)
+    bot.setup_ttl_seconds = args.setup_ttl * 3600
+    if bot.earnings_store:
+        bot.earnings_store.retention_seconds = args.earnings_retention * 24 * 3600 if args.earnings_retention > 0 else None
+    if args.shape:
+        bot.load_shaper = LoadShaper()
+    bot.host_rps = args.host_rps
+    bot.host_burst = args.host_burst
+    bot.rps_report_interval_seconds = args.rps_report if args.rps_report is not None else (300.0 if args.shape else None)
+    if args.live:
+        # Worker di bawah supervisor berbagi stdout, jadi tabelnya dicetak sebagai blok, bukan ditulis ulang di tempat
+        bot.live_status = LiveStatusView(interval=args.live, redraw=False if worker else None)
+    if args.memory_watchdog:
+        report_path = args.memory_report
+        if worker:
+            root, ext = os.path.splitext(report_path)
+            report_path = f"{root}.w{worker[0]}{ext}" # Satu laporan per worker
+        bot.memory_watchdog = MemoryWatchdog(interval=args.memory_watchdog, report_path=report_path,
+                                             budget_kb_per_account=args.memory_budget_kb, action=args.memory_budget_action)
+    # URL API bisa diarahkan ke mock_server.py untuk pengujian lokal
+    bot.base_api_url = args.base_url
+    bot.ping_api_url = args.ping_url
+    return bot
+
+
+def print_earnings_report(args: argparse.Namespace) -> int:
+    if not args.state_db or not os.path.exists(args.state_db):
+        print(f"{C_ERROR}File state '{args.state_db}' tidak ditemukan.{Style.RESET_ALL}")
+        return 1
+    db = StateDatabase(args.state_db)
+    now = time.time()
+    try:
+        rows = EarningsStore(db).summary(now - args.report_window * 3600)
+    finally:
+        db.close()
+    if not rows:
+        print(f"{C_WARNING}Belum ada data pendapatan di '{args.state_db}'.{Style.RESET_ALL}")
+        return 0
+
+    rates = []
+    stalled = []
+    for address, last_ts, last_total, first_ts, first_total, changed_ts in rows:
+        rate = (last_total - first_total) / (last_ts - first_ts) * 3600 if last_ts > first_ts else 0.0
+        rates.append((rate, address, last_total))
+        if last_ts - changed_ts >= args.stall_hours * 3600:
+            stalled.append((address, last_total, (now - changed_ts) / 3600))
+    total_earnings = sum(row[2] for row in rows)
+    total_rate = sum(rate for rate, _, _ in rates)
+    masked = NaorisProtocolAutomation._mask_address
+
+    print(f"{Style.BRIGHT}{C_BANNER}Laporan Pendapatan ({args.state_db}){Style.RESET_ALL}")
+    print(f"Akun: {len(rows)} | Total pendapatan: {total_earnings:,.2f} PTS | Laju gabungan: {total_rate:,.2f} PTS/jam (jendela {args.report_window:g} jam)")
+    rates.sort()
+    top = args.report_top
+    print(f"{Style.BRIGHT}Laju tertinggi:{Style.RESET_ALL}")
+    for rate, address, last_total in reversed(rates[-top:]):
+        print(f"  {masked(address)}  {last_total:>14,.2f} PTS  {rate:>10,.2f} PTS/jam")
+    print(f"{Style.BRIGHT}Laju terendah:{Style.RESET_ALL}")
+    for rate, address, last_total in rates[:top]:
+        print(f"  {masked(address)}  {last_total:>14,.2f} PTS  {rate:>10,.2f} PTS/jam")
+    color = C_WARNING if stalled else C_SUCCESS
+    print(f"{color}Akun macet (tidak naik >= {args.stall_hours:g} jam): {len(stalled)}{Style.RESET_ALL}")
+    for address, last_total, stalled_hours in sorted(stalled, key=lambda item: -item[2])[:top]:
+        print(f"  {masked(address)}  {last_total:>14,.2f} PTS  macet {stalled_hours:,.1f} jam")
+    return 0
+
+
+def print_startup_timing(args: argparse.Namespace) -> int:
+    # Rincian biaya cold start, supaya regresi (misal import berat yang kembali eager) langsung terlihat
+    phases: List[Tuple[str, float]] = [("import main (stdlib + colorama)", _IMPORTS_DONE_AT - _IMPORT_STARTED_AT)]
+    started = time.perf_counter()
+    bot = build_bot(args)
+    phases.append((f"init bot (User-Agent: {bot.user_agent_source})", time.perf_counter() - started))
+    started = time.perf_counter()
+    curl_requests()
+    phases.append(("import curl_cffi (saat request pertama)", time.perf_counter() - started))
+    started = time.perf_counter()
+    account_count = sum(1 for _ in bot.iter_accounts_from_file())
+    phases.append((f"baca file akun ({account_count} akun)", time.perf_counter() - started))
+
+    print(f"{Style.BRIGHT}{C_BANNER}Waktu Startup{Style.RESET_ALL}")
+    for name, seconds in phases:
+        print(f"  {name:<44} {seconds * 1000:>9.1f} ms")
+    print(f"{Style.BRIGHT}  {'total':<44} {sum(seconds for _, seconds in phases) * 1000:>9.1f} ms{Style.RESET_ALL}")
+    bot.logger.close()
+    return 0
+
+
+RESTART_EXIT_CODE = 75 # Worker berhenti karena minta di-restart (watchdog memori)
+
+
+def run_worker_process(worker_index: int, args: argparse.Namespace, use_proxy_flag: bool, stats_queue) -> None:
+    # Entry point proses worker (multiprocessing spawn); isi worker tetap NaorisProtocolAutomation biasa
+    bot = build_bot(args, worker=(worker_index, args.processes))
+    try:
+        asyncio.run(bot.run_worker(use_proxy_flag, stats_queue, worker_index, stats_interval=min(15.0, args.stats_interval)))
+    except KeyboardInterrupt:
+        pass
+    if bot.restart_requested:
+        bot.logger.close()
+        sys.exit(RESTART_EXIT_CODE) # Supervisor me-restart worker yang berhenti
+
+
+class Supervisor:
+    def __init__(self, args: argparse.Namespace, stats_interval: float = 60.0) -> None:
+        self.args = args
+        self.process_count = args.processes
+        self.stats_interval = stats_interval
+        self.logger = LogPipeline(min_level=args.log_level)
+        self.context = multiprocessing.get_context("spawn")
+        self.stats_queue = self.context.Queue()
+        self.processes: Dict[int, Any] = {}
+        self.restart_counts: Dict[int, int] = {}
+        self.restart_at: Dict[int, float] = {}
+        self.worker_stats: Dict[int, Dict[str, Any]] = {}
+        self.stopping = False
+
+    def log(self, message: str, level: str = "INFO"):
+        self.logger.emit(level, f"[SUPERVISOR] {message}")
+
+    def _start_worker(self, worker_index: int, use_proxy_flag: bool) -> None:
+        process = self.context.Process(
+            target=run_worker_process, args=(worker_index, self.args, use_proxy_flag, self.stats_queue),
+            name=f"naoris-worker-{worker_index}", daemon=False
+        )
+        process.start()
+        self.processes[worker_index] = process
+        self.log(f"Worker {worker_index} berjalan (pid {process.pid}).")
+
+    def _drain_stats(self, timeout: float) -> None:
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            try:
+                stats = self.stats_queue.get(timeout=remaining)
+            except queue.Empty:
+                return
+            self.worker_stats[stats["worker"]] = stats
+
+    def _log_aggregate(self) -> None:
+        alive = sum(1 for process in self.processes.values() if process.is_alive())
+        totals: Dict[str, float] = {}
+        for stats in self.worker_stats.values():
+            for key in ("accounts", "accounts_with_token", "requests", "request_errors", "in_flight", "rss_mb"):
+                totals[key] = totals.get(key, 0) + stats.get(key, 0)
+        self.log(
+            f"Worker hidup: {alive}/{self.process_count} | Akun: {int(totals.get('accounts', 0))} "
+            f"(token: {int(totals.get('accounts_with_token', 0))}) | Request: {int(totals.get('requests', 0))} "
+            f"(error: {int(totals.get('request_errors', 0))}) | In-flight: {int(totals.get('in_flight', 0))} | "
+            f"RSS: {totals.get('rss_mb', 0):.1f} MB | Restart: {sum(self.restart_counts.values())}"
+        )
+
+    def _handle_stop_signal(self, signum, frame):
+        self.stopping = True
+
+    def run(self, use_proxy_flag: bool) -> None:
+        signal.signal(signal.SIGTERM, self._handle_stop_signal)
+        for worker_index in range(self.process_count):
+            self._start_worker(worker_index, use_proxy_flag)
+        next_report = time.monotonic() + self.stats_interval
+        try:
+            while not self.stopping:
+                self._drain_stats(1.0)
+                if self.stopping:
+                    break
+                now = time.monotonic()
+                for worker_index, process in list(self.processes.items()):
+                    if process.is_alive():
+                        continue
+                    if process.exitcode == 0:
+                        # Selesai normal (misal shard tanpa akun): tidak di-restart dan tidak dipantau lagi
+                        del self.processes[worker_index]
+                        self.log(f"Worker {worker_index} selesai (exit code 0), tidak di-restart.")
+                        continue
+                    if worker_index not in self.restart_at:
+                        if process.exitcode == RESTART_EXIT_CODE:
+                            # Restart yang diminta worker sendiri (watchdog memori) langsung dijalankan
+                            delay = 0.0
+                            self.log(f"Worker {worker_index} minta di-restart (exit code {process.exitcode}).")
+                        else:
+                            # Backoff eksponensial agar worker yang langsung crash tidak di-restart terus-menerus
+                            restarts = self.restart_counts.get(worker_index, 0)
+                            delay = min(60.0, 2.0 ** restarts)
+                            self.log(f"Worker {worker_index} berhenti (exit code {process.exitcode}). Restart dalam {delay:.0f} detik.", level="WARNING")
+                        self.restart_at[worker_index] = now + delay
+                    elif now >= self.restart_at[worker_index]:
+                        del self.restart_at[worker_index]
+                        self.restart_counts[worker_index] = self.restart_counts.get(worker_index, 0) + 1
+                        self.worker_stats.pop(worker_index, None)
+                        self._start_worker(worker_index, use_proxy_flag)
+                if now >= next_report:
+                    self._log_aggregate()
+                    next_report = now + self.stats_interval
+                if not self.processes:
+                    self.log("Semua worker selesai.")
+                    break
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stopping = True
+            self.log("Menghentikan semua worker...")
+            for process in self.processes.values():
+                if process.is_alive():
+                    process.terminate()
+            # Worker menjalankan shutdown bertahap saat menerima SIGTERM: drain, switch OFF, checkpoint
+            join_timeout = self.args.drain_timeout + 60
+            for process in self.processes.values():
+                process.join(timeout=join_timeout)
+                if process.is_alive():
+                    process.kill()
+            self._drain_stats(0.5) # Statistik terakhir yang dikirim worker saat berhenti
+            self._log_aggregate()
+            self.logger.close()
+
 
 if __name__ == "__main__":
-    bot = NaorisProtocolAutomation()
+    args = parse_args()
+    if args.earnings_report:
+        sys.exit(print_earnings_report(args))
+    if args.startup_timing:
+        sys.exit(print_startup_timing(args))
+    if args.processes > 1:
+        # Mode supervisor: prompt proxy sekali di sini tanpa membuat bot (UA, state DB); akun dijalankan oleh proses worker
+        supervisor = Supervisor(args, stats_interval=args.stats_interval)
+        if not args.daemon:
+            NaorisProtocolAutomation.display_banner()
+        supervisor.run(args.proxy if args.daemon else ask_use_proxy(supervisor.logger, PROXY_FILE))
+        sys.exit(0)
+    bot = build_bot(args)
     try:
-        asyncio.run(bot.run_bot())
+        asyncio.run(bot.run_daemon(args.proxy) if args.daemon else bot.run_bot())
     except KeyboardInterrupt:
         bot.log("Bot dihentikan oleh pengguna (KeyboardInterrupt).", level="INFO")
     except Exception as e:
@@ -633,3 +3648,8 @@ if __name__ == "__main__":
         traceback.print_exc() # Cetak traceback untuk debug error tak terduga
     finally:
         bot.log("Bot Selesai.", level="INFO")
+    if bot.restart_requested:
+        # Restart terkendali dari watchdog memori: token dan checkpoint sudah tersimpan saat shutdown
+        bot.log("Menjalankan ulang proses...", level="INFO")
+        bot.logger.close()
+        os.execv(sys.executable, [sys.executable] + sys.argv)
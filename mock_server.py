@@ -0,0 +1,262 @@
+import argparse
+import asyncio
+import base64
+import json
+import random
+import time
+import uuid
+import zlib
+from collections import Counter
+from typing import Dict, Optional, Tuple
+
+# Server tiruan Naoris API untuk benchmark lokal. Cukup satu server untuk
+# base_api_url dan ping_api_url karena path endpoint-nya tidak bertabrakan.
+
+
+class MockConfig:
+    def __init__(self, latency_ms: float = 20.0, jitter_ms: float = 10.0, error_rate: float = 0.0,
+                 rate_401: float = 0.0, rate_404: float = 0.0, rate_409: float = 0.0,
+                 rate_410: float = 0.0, token_ttl: int = 3600) -> None:
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate  # 500 acak di semua endpoint
+        self.rate_401 = rate_401      # token ditolak di endpoint ber-Authorization
+        self.rate_404 = rate_404      # fraksi akun "tidak terdaftar" di gt-event (tetap per alamat)
+        self.rate_409 = rate_409      # addWhitelist menjawab 409 walau belum pernah disimpan
+        self.rate_410 = rate_410      # ping menjawab 410 "Ping Success!!" seperti server asli
+        self.token_ttl = token_ttl
+
+    @classmethod
+    def from_args(cls, args: argparse.Namespace) -> "MockConfig":
+        return cls(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, error_rate=args.error_rate,
+                   rate_401=args.rate_401, rate_404=args.rate_404, rate_409=args.rate_409,
+                   rate_410=args.rate_410, token_ttl=args.token_ttl)
+
+
+def add_mock_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="Latensi rata-rata per respons (ms)")
+    parser.add_argument("--jitter-ms", type=float, default=10.0, help="Variasi latensi acak (ms)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Peluang respons 500 (0-1)")
+    parser.add_argument("--rate-401", type=float, default=0.0, help="Peluang token ditolak dengan 401 (0-1)")
+    parser.add_argument("--rate-404", type=float, default=0.0, help="Fraksi akun yang dijawab 404 di gt-event (0-1)")
+    parser.add_argument("--rate-409", type=float, default=0.0, help="Peluang addWhitelist menjawab 409 (0-1)")
+    parser.add_argument("--rate-410", type=float, default=0.0, help="Peluang ping menjawab 410 (0-1)")
+    parser.add_argument("--token-ttl", type=int, default=3600, help="Umur access token JWT (detik)")
+
+
+def _b64(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).decode().rstrip("=")
+
+
+class MockNaorisServer:
+    def __init__(self, config: Optional[MockConfig] = None, host: str = "127.0.0.1", port: int = 0) -> None:
+        self.config = config or MockConfig()
+        self.host = host
+        self.port = port
+        self.stats: Counter = Counter()
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._access_tokens: Dict[str, Tuple[str, float]] = {}  # token -> (alamat, exp)
+        self._refresh_tokens: Dict[str, str] = {}               # refresh token -> alamat
+        self._whitelisted: set = set()
+        self._sessions: set = set()                             # (alamat, deviceHash) dengan sesi aktif
+        self._earnings: Counter = Counter()
+        self._routes = {
+            ("POST", "/sec-api/auth/gt-event"): self._gt_event,
+            ("POST", "/sec-api/auth/refresh"): self._refresh,
+            ("GET", "/sec-api/api/wallet-details"): self._wallet_details,
+            ("POST", "/sec-api/api/addWhitelist"): self._add_whitelist,
+            ("POST", "/sec-api/api/switch"): self._switch,
+            ("POST", "/sec-api/api/htb-event"): self._htb_event,
+            ("POST", "/api/ping"): self._ping,
+            ("GET", "/__stats"): self._stats,
+        }
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    async def start(self) -> int:
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port, backlog=4096)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self.port
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    # --- Token ---
+
+    def _issue_tokens(self, address: str) -> Dict[str, str]:
+        exp = time.time() + self.config.token_ttl
+        header = _b64(json.dumps({"alg": "none", "typ": "JWT"}).encode())
+        payload = _b64(json.dumps({"wallet": address, "exp": int(exp), "jti": uuid.uuid4().hex}).encode())
+        token = f"{header}.{payload}.mock"
+        refresh_token = uuid.uuid4().hex
+        self._access_tokens[token] = (address, exp)
+        self._refresh_tokens[refresh_token] = address
+        return {"token": token, "refreshToken": refresh_token}
+
+    def _authorize(self, headers: Dict[str, str]) -> Optional[str]:
+        auth = headers.get("authorization", "")
+        if not auth.startswith("Bearer "):
+            return None
+        entry = self._access_tokens.get(auth[7:])
+        if entry is None or entry[1] < time.time():
+            return None
+        if self.config.rate_401 and random.random() < self.config.rate_401:
+            return None
+        return entry[0]
+
+    def _is_unregistered(self, address: str) -> bool:
+        # Deterministik per alamat supaya akun "tidak terdaftar" selalu gagal dengan cara yang sama
+        return self.config.rate_404 > 0 and (zlib.crc32(address.encode()) % 10000) < self.config.rate_404 * 10000
+
+    # --- Endpoint ---
+
+    async def _gt_event(self, headers, body):
+        address = str(body.get("wallet_address", "")).lower()
+        if not address or self._is_unregistered(address):
+            return 404, {"message": "User not found"}
+        return 200, self._issue_tokens(address)
+
+    async def _refresh(self, headers, body):
+        address = self._refresh_tokens.pop(str(body.get("refreshToken", "")), None)
+        if address is None:
+            return 401, {"message": "Invalid refresh token"}
+        return 200, self._issue_tokens(address)
+
+    async def _wallet_details(self, headers, body):
+        address = self._authorize(headers)
+        if address is None:
+            return 401, {"message": "Invalid token"}
+        return 200, {"message": {"walletAddress": address, "totalEarnings": self._earnings[address]}}
+
+    async def _add_whitelist(self, headers, body):
+        address = self._authorize(headers)
+        if address is None:
+            return 401, {"message": "Invalid token"}
+        if address in self._whitelisted or (self.config.rate_409 and random.random() < self.config.rate_409):
+            self._whitelisted.add(address)
+            return 409, {"message": "url already exists"}
+        self._whitelisted.add(address)
+        return 200, {"message": "url saved successfully"}
+
+    async def _switch(self, headers, body):
+        address = self._authorize(headers)
+        if address is None:
+            return 401, {"message": "Invalid token"}
+        session_key = (address, body.get("deviceHash"))
+        if str(body.get("state", "")).upper() == "OFF":
+            if session_key in self._sessions:
+                self._sessions.discard(session_key)
+                return 200, "Session ended and daily usage updated"
+            return 200, "No action needed"
+        if session_key in self._sessions:
+            return 200, "Session already active for this device"
+        self._sessions.add(session_key)
+        return 200, "Session started"
+
+    async def _htb_event(self, headers, body):
+        address = self._authorize(headers)
+        if address is None:
+            return 401, {"message": "Invalid token"}
+        return 200, {"message": "Message production initiated"}
+
+    async def _ping(self, headers, body):
+        address = self._authorize(headers)
+        if address is None:
+            return 401, {"message": "Invalid token"}
+        self._earnings[address] += 1
+        if self.config.rate_410 and random.random() < self.config.rate_410:
+            return 410, "Ping Success!!"
+        return 200, "Ping Success!!"
+
+    async def _stats(self, headers, body):
+        return 200, dict(self.stats)
+
+    # --- HTTP/1.1 minimal dengan keep-alive ---
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, _ = request_line.decode("latin-1").split(" ", 2)
+                headers: Dict[str, str] = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                raw_body = b""
+                if "content-length" in headers:
+                    raw_body = await reader.readexactly(int(headers["content-length"]))
+                status, body, content_type = await self.respond(method, path, headers, raw_body)
+                writer.write(
+                    f"HTTP/1.1 {status} {'OK' if status < 400 else 'Error'}\r\n"
+                    f"Content-Type: {content_type}\r\nContent-Length: {len(body)}\r\nConnection: keep-alive\r\n\r\n".encode()
+                    + body
+                )
+                await writer.drain()
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def respond(self, method: str, path: str, headers: Dict[str, str], raw_body: bytes) -> Tuple[int, bytes, str]:
+        # Satu request tanpa socket (dipakai juga oleh simulate.py); header harus huruf kecil
+        status, payload = await self._dispatch(method.upper(), path.split("?", 1)[0], headers, raw_body)
+        if isinstance(payload, str):
+            return status, payload.encode(), "text/plain; charset=utf-8"
+        return status, json.dumps(payload).encode(), "application/json"
+
+    async def _dispatch(self, method: str, path: str, headers: Dict[str, str], raw_body: bytes):
+        handler = self._routes.get((method, path))
+        self.stats[f"{method} {path}"] += 1
+        if handler is None:
+            return 404, {"message": "Not found"}
+        if self.config.latency_ms > 0 or self.config.jitter_ms > 0:
+            delay = self.config.latency_ms + random.uniform(-self.config.jitter_ms, self.config.jitter_ms)
+            await asyncio.sleep(max(0.0, delay) / 1000)
+        if path != "/__stats" and self.config.error_rate and random.random() < self.config.error_rate:
+            self.stats[f"{method} {path} 500"] += 1
+            return 500, "<html><body><h1>502 Bad Gateway</h1></body></html>"
+        try:
+            body = json.loads(raw_body) if raw_body else {}
+        except ValueError:
+            return 400, {"message": "Invalid JSON"}
+        status, payload = await handler(headers, body if isinstance(body, dict) else {})
+        if status >= 400:
+            self.stats[f"{method} {path} {status}"] += 1
+        return status, payload
+
+
+async def serve(config: MockConfig, host: str, port: int):
+    server = MockNaorisServer(config, host=host, port=port)
+    await server.start()
+    print(f"Mock Naoris API berjalan di {server.base_url}", flush=True)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Server tiruan Naoris API untuk pengujian beban lokal.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    add_mock_arguments(parser)
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(MockConfig.from_args(args), args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,285 @@
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import math
+import os
+import selectors
+import time
+from collections import Counter, defaultdict
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+import main as naoris_main
+import mock_server
+from loadtest import build_accounts, percentile
+from main import LoadShaper, NaorisProtocolAutomation
+from mock_server import MockConfig, MockNaorisServer, add_mock_arguments
+
+# Simulasi jam virtual: bot asli (scheduler, retry, breaker, token) dijalankan di event loop yang
+# waktunya melompat ke timer berikutnya alih-alih menunggu, dengan HTTP diganti MockNaorisServer
+# di proses yang sama. 24 jam jadwal ping/initiate/aktivasi/refresh/wallet bisa diputar ulang
+# untuk melihat puncak request per endpoint tanpa menunggu berjam-jam.
+
+
+class VirtualClock:
+    def __init__(self, epoch: Optional[float] = None) -> None:
+        self.epoch = time.time() if epoch is None else epoch
+        self.now = 0.0 # Detik virtual sejak simulasi mulai
+
+    def advance(self, seconds: float) -> None:
+        self.now += seconds
+
+
+class VirtualTimeModule:
+    # Pengganti modul time di main.py dan mock_server.py: time()/monotonic() mengikuti jam virtual,
+    # sisanya (perf_counter, strftime, ...) tetap modul time asli.
+    def __init__(self, clock: VirtualClock) -> None:
+        self._clock = clock
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(time, name)
+
+    def time(self) -> float:
+        return self._clock.epoch + self._clock.now
+
+    def monotonic(self) -> float:
+        return self._clock.now
+
+
+class VirtualSelector(selectors.DefaultSelector):
+    # Event loop memanggil select(timeout) dengan jarak ke timer terdekat; di sini jarak itu
+    # langsung ditambahkan ke jam virtual lalu fd (self-pipe, sinyal) hanya di-poll tanpa menunggu.
+    def __init__(self, clock: VirtualClock) -> None:
+        super().__init__()
+        self._clock = clock
+
+    def select(self, timeout: Optional[float] = None):
+        if timeout is not None and timeout > 0:
+            self._clock.advance(timeout)
+        return super().select(0)
+
+
+class VirtualClockLoop(asyncio.SelectorEventLoop):
+    def __init__(self, clock: VirtualClock) -> None:
+        super().__init__(VirtualSelector(clock))
+        self.clock = clock
+
+    def time(self) -> float:
+        # Tiap pembacaan jam memakan 1 ns virtual. Timer yang tinggal < resolusi jam dijalankan loop
+        # tanpa select(), jadi tanpa ini loop yang menunggu tenggat tetap (scheduler) bisa
+        # berputar di tempat karena waktu tidak pernah bergerak.
+        self.clock.now += 1e-9
+        return self.clock.now
+
+
+class StubResponse:
+    # Cukup atribut yang dibaca _request: status_code, content, reason
+    __slots__ = ("status_code", "content", "reason")
+
+    def __init__(self, status_code: int, content: bytes) -> None:
+        self.status_code = status_code
+        self.content = content
+        self.reason = "OK" if status_code < 400 else "Error"
+
+
+class StubHttpEngine:
+    # Pengganti HttpEngine: request dijawab MockNaorisServer.respond() tanpa socket. Latensi mock
+    # (asyncio.sleep) berjalan di jam virtual, jadi konkurensi per endpoint tetap realistis.
+    def __init__(self, server: MockNaorisServer, clock: VirtualClock, max_concurrency: int = 200, bucket_seconds: float = 60.0) -> None:
+        self.server = server
+        self.clock = clock
+        self.max_concurrency = max_concurrency
+        self.bucket_seconds = bucket_seconds
+        self.sessions: Dict[str, Any] = {}
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self.in_flight: int = 0
+        self.endpoint_in_flight: Counter = Counter()
+        self.peak_in_flight: Counter = Counter()
+        self.peak_total_in_flight: int = 0
+        self.buckets: Dict[str, Counter] = defaultdict(Counter) # endpoint -> indeks bucket -> jumlah request
+        self.busy_seconds: Counter = Counter() # endpoint -> total detik virtual request berjalan
+        self.statuses: Counter = Counter()
+
+    async def request(self, method: str, url: str, headers: Dict[str, str], data: Optional[Any] = None,
+                      json_payload: Optional[Dict] = None, proxy: Optional[str] = None,
+                      impersonate: Optional[str] = None, timeout: int = 60) -> StubResponse:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        path = urlparse(url).path
+        endpoint = path.rsplit("/", 1)[-1]
+        if data is not None:
+            raw_body = data.encode() if isinstance(data, str) else data
+        elif json_payload is not None:
+            raw_body = json.dumps(json_payload).encode()
+        else:
+            raw_body = b""
+        async with self._semaphore:
+            self.buckets[endpoint][int(self.clock.now // self.bucket_seconds)] += 1
+            self.in_flight += 1
+            self.endpoint_in_flight[endpoint] += 1
+            self.peak_total_in_flight = max(self.peak_total_in_flight, self.in_flight)
+            self.peak_in_flight[endpoint] = max(self.peak_in_flight[endpoint], self.endpoint_in_flight[endpoint])
+            started = self.clock.now
+            try:
+                status, body, _ = await self.server.respond(method, path, {name.lower(): value for name, value in headers.items()}, raw_body)
+            finally:
+                self.in_flight -= 1
+                self.endpoint_in_flight[endpoint] -= 1
+                self.busy_seconds[endpoint] += self.clock.now - started
+        self.statuses[f"{endpoint} {status}"] += 1
+        return StubResponse(status, body)
+
+    async def close_route(self, proxy: Optional[str]) -> None:
+        pass
+
+    async def close(self):
+        pass
+
+
+class SimulationBot(NaorisProtocolAutomation):
+    def __init__(self, **kwargs) -> None:
+        super().__init__(state_db_file=None, user_agent_file=None, log_level="ERROR", **kwargs)
+        self.log_lines: Counter = Counter()
+
+    def log(self, message: str, level: str = "INFO", account_context: Optional[str] = None):
+        self.log_lines[level.upper()] += 1
+
+    def log_account_specific(self, masked_address: str, message: str, level: str = "INFO", proxy_info: Optional[str] = None, status_msg: Optional[str] = None):
+        self.log_lines[level.upper()] += 1
+
+
+def install_virtual_time(clock: VirtualClock) -> None:
+    virtual_time = VirtualTimeModule(clock)
+    naoris_main.time = virtual_time
+    mock_server.time = virtual_time
+
+
+async def run_simulation(args: argparse.Namespace, clock: VirtualClock) -> Tuple[SimulationBot, StubHttpEngine]:
+    # --sample N: hanya 1 dari N akun yang dijalankan; laju start dan batas konkurensi ikut dibagi N
+    # supaya bentuk beban sama, lalu angka di laporan dikalikan N kembali
+    max_concurrency = max(1, round(args.max_concurrency / args.sample))
+    server = MockNaorisServer(MockConfig.from_args(args))
+    bot = SimulationBot(max_concurrency=max_concurrency, scheduler_workers=max(1, round(args.workers / args.sample)),
+                        start_rate=args.start_rate / args.sample, start_burst=args.start_burst)
+    engine = StubHttpEngine(server, clock, max_concurrency=max_concurrency, bucket_seconds=args.bucket_seconds)
+    bot.http = engine
+    if args.shape:
+        bot.load_shaper = LoadShaper()
+    bot.host_rps = args.host_rps / args.sample
+    bot.base_api_url = "http://naoris.sim"
+    bot.ping_api_url = "http://beat.naoris.sim"
+    # Baris pemisah akun ditulis langsung ke stdout oleh LogPipeline; tidak perlu ditampilkan
+    with contextlib.redirect_stdout(io.StringIO()):
+        try:
+            accounts = build_accounts(args.accounts, seed=args.seed)[::args.sample]
+            await asyncio.wait_for(bot.run_accounts(accounts), timeout=args.hours * 3600)
+        except asyncio.TimeoutError:
+            pass
+        bot.logger.flush()
+    return bot, engine
+
+
+def build_report(args: argparse.Namespace, bot: SimulationBot, engine: StubHttpEngine, wall_seconds: float, simulated_seconds: float) -> Dict[str, Any]:
+    bucket_count = max(1, int(simulated_seconds // args.bucket_seconds))
+    scale = args.sample
+    endpoints: Dict[str, Any] = {}
+    totals: Counter = Counter()
+    for endpoint, buckets in sorted(engine.buckets.items()):
+        rates = [buckets.get(index, 0) * scale / args.bucket_seconds for index in range(bucket_count)]
+        totals.update(buckets)
+        requests = sum(buckets.values())
+        peak_rps = max(rates, default=0.0)
+        if scale > 1:
+            # Puncak konkurensi sampel terlalu kasar untuk dikalikan; perkiraan hukum Little:
+            # laju puncak x rata-rata lama request
+            peak_concurrency = math.ceil(peak_rps * engine.busy_seconds[endpoint] / requests) if requests else 0
+        else:
+            peak_concurrency = engine.peak_in_flight[endpoint]
+        endpoints[endpoint] = {
+            "requests": requests * scale,
+            "avg_rps": round(requests * scale / simulated_seconds, 2) if simulated_seconds else 0.0,
+            "p99_rps": round(percentile(rates, 99), 2),
+            "peak_rps": round(peak_rps, 2),
+            "avg_latency_ms": round(engine.busy_seconds[endpoint] / requests * 1000, 1) if requests else 0.0,
+            "peak_concurrency": peak_concurrency,
+        }
+    hour_buckets = max(1, int(round(3600 / args.bucket_seconds)))
+    hourly = []
+    for hour in range(int(-(-simulated_seconds // 3600))):
+        counts = [totals.get(index, 0) * scale for index in range(hour * hour_buckets, (hour + 1) * hour_buckets)]
+        span = min(3600.0, simulated_seconds - hour * 3600)
+        hourly.append({"hour": hour, "avg_rps": round(sum(counts) / span, 2) if span > 0 else 0.0, "peak_rps": round(max(counts, default=0) / args.bucket_seconds, 2)})
+    return {
+        "accounts": args.accounts,
+        "sample": scale,
+        "simulated_hours": round(simulated_seconds / 3600, 2),
+        "wall_seconds": round(wall_seconds, 2),
+        "speedup": round(simulated_seconds / wall_seconds, 1) if wall_seconds else 0.0,
+        "requests": sum(totals.values()) * scale,
+        "peak_concurrency": sum(stats["peak_concurrency"] for stats in endpoints.values()) if scale > 1 else engine.peak_total_in_flight,
+        "bucket_seconds": args.bucket_seconds,
+        "endpoints": endpoints,
+        "hourly": hourly,
+        "statuses": dict(sorted(engine.statuses.items())),
+        "log_lines": dict(bot.log_lines),
+    }
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    if report["sample"] > 1:
+        print(f"PERKIRAAN BERSKALA, bukan hasil terukur: hanya 1 dari {report['sample']} akun yang disimulasikan, "
+              f"semua angka di bawah dikalikan {report['sample']}")
+    print(f"Akun: {report['accounts']} | Simulasi: {report['simulated_hours']} jam dalam {report['wall_seconds']}s "
+          f"(x{report['speedup']}) | Request: {report['requests']} | Konkurensi puncak: {report['peak_concurrency']}")
+    print(f"Per endpoint (laju per bucket {report['bucket_seconds']:g}s):")
+    for endpoint, stats in report["endpoints"].items():
+        print(f"  {endpoint:<16} n={stats['requests']:<10} rata2={stats['avg_rps']:>9} req/s  p99={stats['p99_rps']:>9}  "
+              f"puncak={stats['peak_rps']:>9} req/s  latensi={stats['avg_latency_ms']:>6} ms  konkurensi puncak={stats['peak_concurrency']}")
+    peak = max((hour["peak_rps"] for hour in report["hourly"]), default=0.0)
+    print("Histogram laju request per jam (rata-rata | puncak):")
+    for hour in report["hourly"]:
+        bar = "#" * (int(round(hour["peak_rps"] / peak * 40)) if peak else 0)
+        print(f"  jam {hour['hour']:>3}  {hour['avg_rps']:>9} | {hour['peak_rps']:>9} req/s  {bar}")
+    print("Status per endpoint:", ", ".join(f"{k}={v}" for k, v in report["statuses"].items()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulasi jam virtual: putar ulang jadwal bot berjam-jam dalam hitungan detik.")
+    parser.add_argument("--accounts", type=int, default=10000, help="Jumlah akun sintetis (default: 10000)")
+    parser.add_argument("--hours", type=float, default=24.0, help="Lama waktu virtual yang disimulasikan (jam, default: 24)")
+    parser.add_argument("--start-rate", type=float, default=1.0, help="Laju start akun per detik virtual; 0 = semua sekaligus (default: 1, sama seperti bot)")
+    parser.add_argument("--start-burst", type=float, default=1.0, help="Burst token bucket start akun")
+    parser.add_argument("--max-concurrency", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=200, help="Jumlah worker scheduler")
+    parser.add_argument("--bucket-seconds", type=float, default=60.0, help="Lebar bucket histogram laju request (detik virtual)")
+    parser.add_argument("--sample", type=int, default=1, help="Jalankan 1 dari N akun lalu kalikan hasil dengan N (perkiraan cepat, default: 1)")
+    parser.add_argument("--shape", action="store_true", help="Aktifkan penyebaran fase per akun seperti main.py --shape")
+    parser.add_argument("--host-rps", type=float, default=0.0, help="Batas laju per host seperti main.py --host-rps (0 = tanpa batas)")
+    parser.add_argument("--seed", type=int, default=1, help="Seed alamat akun sintetis")
+    parser.add_argument("--json", dest="json_path", help="Simpan laporan ke file JSON")
+    add_mock_arguments(parser)
+    parser.set_defaults(latency_ms=100.0, jitter_ms=50.0) # Latensi virtual mendekati API asli
+    args = parser.parse_args()
+    if args.sample < 1:
+        parser.error("--sample minimal 1")
+
+    clock = VirtualClock()
+    install_virtual_time(clock)
+    loop = VirtualClockLoop(clock)
+    started = time.perf_counter()
+    try:
+        bot, engine = loop.run_until_complete(run_simulation(args, clock))
+    finally:
+        loop.close()
+    report = build_report(args, bot, engine, time.perf_counter() - started, min(clock.now, args.hours * 3600))
+    print_report(report)
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Laporan disimpan ke {os.path.abspath(args.json_path)}")
+
+
+if __name__ == "__main__":
+    main()